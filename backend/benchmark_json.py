@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of JSON encoding for the largest list endpoints.
+
+Compares, per request, the previous path (FastAPI's jsonable_encoder + stdlib json, as used for
+plain dict responses) with encode_json (orjson, one native pass) on synthetic payloads shaped
+like GET /payments, GET /leases and GET /properties.
+
+Usage: python benchmark_json.py [rows]
+"""
+import os
+import sys
+import json
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmark')
+
+from fastapi.encoders import jsonable_encoder
+from server import encode_json
+
+
+def make_payments(rows: int) -> list:
+    return [{
+        "id": str(uuid.uuid4()),
+        "lease_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "amount": 850.0 + i % 7,
+        "payment_date": f"2025-{i % 12 + 1:02d}-05",
+        "period_month": i % 12 + 1,
+        "period_year": 2025,
+        "payment_method": "virement",
+        "status": "paid",
+        "notes": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "property_name": f"Appartement {i % 40}",
+        "property_address": f"{i % 40} rue de la République",
+        "tenant_name": f"Camille Martin{i % 40}"
+    } for i in range(rows)]
+
+
+def make_leases(rows: int) -> list:
+    return [{
+        "id": str(uuid.uuid4()),
+        "property_id": str(uuid.uuid4()),
+        "tenant_id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "start_date": "2024-01-01",
+        "end_date": None,
+        "rent_amount": 850.0,
+        "charges": 50.0,
+        "deposit": 850.0,
+        "payment_day": 5,
+        "notes": "Bail meublé",
+        "is_active": True,
+        "ledger_through": "2025-10",
+        "created_at": datetime.now(timezone.utc),
+        "property_name": f"Appartement {i}",
+        "property_address": f"{i} rue de la République",
+        "tenant_name": f"Camille Martin{i}"
+    } for i in range(rows)]
+
+
+def make_properties(rows: int) -> list:
+    return [{
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "name": f"Appartement {i}",
+        "address": f"{i} rue de la République",
+        "city": "Lyon",
+        "postal_code": "69002",
+        "property_type": "apartment",
+        "surface": 42.5,
+        "rooms": 2,
+        "rent_amount": 850.0,
+        "charges": 50.0,
+        "description": "Appartement lumineux proche des commerces et des transports",
+        "image_url": None,
+        "purchase_price": 180000.0,
+        "annual_costs": 1500.0,
+        "is_occupied": bool(i % 3),
+        "current_tenant_id": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "thumbnail_url": None
+    } for i in range(rows)]
+
+
+def stdlib_encode(value) -> bytes:
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"{'endpoint':<12}{'rows':>7}{'stdlib µs':>12}{'orjson µs':>12}{'saved µs':>12}{'speed-up':>10}")
+    for name, make in (("/payments", make_payments), ("/leases", make_leases), ("/properties", make_properties)):
+        payload = make(rows)
+        assert json.loads(encode_json(payload)) == json.loads(stdlib_encode(payload))
+        number = max(1, 20000 // rows)
+        before = min(timeit.repeat(lambda: stdlib_encode(payload), number=number, repeat=5)) / number * 1e6
+        after = min(timeit.repeat(lambda: encode_json(payload), number=number, repeat=5)) / number * 1e6
+        print(f"{name:<12}{rows:>7}{before:>12.0f}{after:>12.0f}{before - after:>12.0f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,61 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, BackgroundTasks, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, BackgroundTasks, UploadFile, File, Form, Request, Response, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, ORJSONResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import WriteConcern, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, ValidationError
 from typing import List, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, date, timezone, timedelta
 import jwt
 from passlib.context import CryptContext
 import io
+import csv
+import zipfile
+import gzip
+import zlib
+import brotli
+import zstandard
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 import asyncio
+import bisect
+import numpy as np
 import shutil
 import base64
 from pywebpush import webpush, WebPushException
 import json
+import orjson
+import re
+import calendar
+import difflib
+import unicodedata
+import xml.etree.ElementTree as ET
+import hashlib
+import functools
+import inspect
+from collections import OrderedDict, Counter
+from contextvars import ContextVar
+import threading
+import weakref
+import hmac
+import secrets
+import email.utils
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -34,10 +64,147 @@ load_dotenv(ROOT_DIR / '.env')
 UPLOADS_DIR = ROOT_DIR / 'uploads'
 UPLOADS_DIR.mkdir(exist_ok=True)
 
+# Partial files of resumable (chunked) uploads
+PARTIAL_UPLOADS_DIR = UPLOADS_DIR / 'partial'
+PARTIAL_UPLOADS_DIR.mkdir(exist_ok=True)
+
+# Chunked upload configuration
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+MAX_CHUNKED_UPLOAD_SIZE = int(os.environ.get('MAX_CHUNKED_UPLOAD_SIZE', 500 * 1024 * 1024))
+UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24))
+
+# Worker processes for CPU-bound tasks (renditions, PDF receipts)
+PROCESS_POOL_WORKERS = int(os.environ.get('PROCESS_POOL_WORKERS', os.cpu_count() or 2))
+
+# Receipts rendered per worker call in batch runs
+RECEIPT_BATCH_SIZE = 25
+
+# Thumbnails / previews of image and PDF documents
+RENDITIONS_DIR = UPLOADS_DIR / 'renditions'
+RENDITIONS_DIR.mkdir(exist_ok=True)
+
+# Rendered quittances, named "<payment id>_<content hash>.pdf"
+RECEIPTS_DIR = UPLOADS_DIR / 'receipts'
+RECEIPTS_DIR.mkdir(exist_ok=True)
+RENDITION_SIZES = {"thumb": 320, "medium": 1280}  # Max side in pixels
+RENDITION_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "image/bmp", "image/tiff", "application/pdf"}
+# A rendition claimed longer ago than this was interrupted (restart) and may be claimed again
+RENDITION_CLAIM_TIMEOUT = timedelta(minutes=30)
+
+# Maximum rows accepted by one bulk payment import
+MAX_BULK_PAYMENTS = int(os.environ.get('MAX_BULK_PAYMENTS', 10000))
+
+# Portfolio imports: rows validated/inserted per chunk, file size limit, stored row errors
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+MAX_IMPORT_SIZE = int(os.environ.get('MAX_IMPORT_SIZE', 50 * 1024 * 1024))
+IMPORT_MAX_ERRORS = 1000
+
+# Bank reconciliation: max days between due date and credit, min match score, unmatched credits returned
+RECONCILIATION_DATE_WINDOW_DAYS = int(os.environ.get('RECONCILIATION_DATE_WINDOW_DAYS', 10))
+RECONCILIATION_MIN_SCORE = float(os.environ.get('RECONCILIATION_MIN_SCORE', 0.35))
+RECONCILIATION_MAX_UNMATCHED = 500
+
+# Batch size of cascade deletions and orphan sweeps
+CASCADE_BATCH_SIZE = int(os.environ.get('CASCADE_BATCH_SIZE', 500))
+
+# Audit log writer: batch size, flush interval (seconds) and write concern ("0", "1", "majority")
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 100))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))
+AUDIT_WRITE_CONCERN = os.environ.get('AUDIT_WRITE_CONCERN', '1')
+AUDIT_MAX_PENDING = 10000
+
+# Audit log retention: 0 keeps everything; "ttl" lets MongoDB expire entries,
+# "archive" moves them to monthly gzip JSONL files in AUDIT_ARCHIVE_DIR
+AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 0))
+AUDIT_RETENTION_MODE = os.environ.get('AUDIT_RETENTION_MODE', 'archive')
+AUDIT_ARCHIVE_DIR = Path(os.environ.get('AUDIT_ARCHIVE_DIR', ROOT_DIR / 'archives' / 'audit'))
+AUDIT_MAX_PAGE_SIZE = 500
+AUDIT_EXPORT_BATCH_SIZE = 2000
+
+# Mongo command monitoring: per-request budget (0 disables the warning) and number of identical
+# find_one shapes in one request reported as a probable N+1
+QUERY_MONITORING = os.environ.get('QUERY_MONITORING', 'true').lower() == 'true'
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 30))
+QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 5))
+# Emails of the operators allowed to read the per-route statistics (none by default)
+QUERY_STATS_OPERATORS = {
+    email.strip().lower() for email in os.environ.get('QUERY_STATS_OPERATORS', '').split(',') if email.strip()
+}
+
+# ==================== QUERY MONITORING ====================
+
+# Stats of the request being served (None outside requests). Motor runs pymongo in worker threads
+# with a copy of the caller's context, so the command listener sees the request's object.
+request_query_stats: ContextVar = ContextVar("request_query_stats", default=None)
+
+def filter_shape(value):
+    """A filter with its values replaced by "?": {"id": "a"} and {"id": "b"} share a shape"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [filter_shape(item) for item in value]
+    return "?"
+
+class RequestQueryStats:
+    """Mongo commands issued while serving one request"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()  # Commands of one request may run concurrently in worker threads
+        self.closed = False
+        self.count = 0
+        self.duration_ms = 0.0
+        self.collections = Counter()
+        self.find_one_shapes = Counter()
+    
+    def add_command(self, collection: str, find_one_shape: Optional[str]):
+        with self.lock:
+            if self.closed:
+                return
+            self.count += 1
+            self.collections[collection] += 1
+            if find_one_shape:
+                self.find_one_shapes[find_one_shape] += 1
+    
+    def add_duration(self, duration_micros: int):
+        with self.lock:
+            if not self.closed:
+                self.duration_ms += duration_micros / 1000
+    
+    def close(self):
+        # Background tasks run after the response: their commands are not charged to the request
+        with self.lock:
+            self.closed = True
+
+class QueryMonitor(monitoring.CommandListener):
+    """Charges every Mongo command to the request being served"""
+    
+    def started(self, event):
+        stats = request_query_stats.get()
+        if stats is None:
+            return
+        command = event.command
+        target = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command_name
+        shape = None
+        # find_one is a find limited to a single document in a single batch
+        if event.command_name == "find" and command.get("limit") == 1 and command.get("singleBatch"):
+            shape = f"{collection} {json.dumps(filter_shape(command.get('filter', {})), sort_keys=True)}"
+        stats.add_command(collection, shape)
+    
+    def succeeded(self, event):
+        stats = request_query_stats.get()
+        if stats is not None:
+            stats.add_duration(event.duration_micros)
+    
+    def failed(self, event):
+        self.succeeded(event)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[QueryMonitor()] if QUERY_MONITORING else [])
 db = client[os.environ['DB_NAME']]
+# Multi-document transactions: "auto" detects a replica set / sharded cluster, "false" disables them
+MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', 'auto').lower()
 
 # Scheduler for automated reminders
 scheduler = AsyncIOScheduler()
@@ -59,7 +226,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 # Create the main app
-app = FastAPI(title="RentMaestro API")
+app = FastAPI(title="RentMaestro API", default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -99,6 +266,8 @@ class PropertyBase(BaseModel):
     charges: float = 0
     description: Optional[str] = None
     image_url: Optional[str] = None
+    purchase_price: Optional[float] = None  # For yield analytics
+    annual_costs: Optional[float] = None  # Landlord costs per year (property tax, insurance...)
 
 class PropertyCreate(PropertyBase):
     pass
@@ -150,6 +319,10 @@ class Lease(LeaseBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     is_active: bool = True
+    # Display fields, copied from the property and tenant (see DISPLAY FIELDS)
+    property_name: Optional[str] = None
+    property_address: Optional[str] = None
+    tenant_name: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class PaymentBase(BaseModel):
@@ -169,6 +342,10 @@ class Payment(PaymentBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     status: str = "paid"  # paid, pending, late
+    # Display fields, copied from the lease
+    property_name: Optional[str] = None
+    property_address: Optional[str] = None
+    tenant_name: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class VacancyBase(BaseModel):
@@ -239,18 +416,57 @@ class Document(DocumentBase):
     filename: str
     file_size: int
     mime_type: str
+    checksum: Optional[str] = None  # sha256 hex digest
+    renditions: Optional[dict] = None  # {size: {format: filename}}
+    rendition_status: Optional[str] = None  # pending, processing, ready, none, failed
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+# Resumable upload session model (chunked uploads of large documents)
+class UploadSessionCreate(DocumentBase):
+    filename: str  # Original file name, used for the extension
+    mime_type: str = "application/octet-stream"
+    total_size: int
+    chunk_size: Optional[int] = None
+    checksum: Optional[str] = None  # Expected sha256 hex digest of the whole file
+
+class UploadSession(UploadSessionCreate):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    chunk_size: int
+    total_chunks: int
+    received_chunks: List[int] = []
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class ImportJob(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    filename: str
+    entity_type: Optional[str] = None  # CSV only: properties, tenants or leases
+    status: str = "pending"  # pending, running, completed, failed
+    processed_rows: int = 0
+    counts: dict = {}  # {entity: {rows, created, errors}}
+    errors: List[dict] = []  # [{sheet, row, error}], first IMPORT_MAX_ERRORS only
+    error: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[str] = None
+
+class ProposalConfirm(BaseModel):
+    proposal_ids: List[str]
 
 # Calendar event model
 class CalendarEvent(BaseModel):
     id: str
     title: str
     date: str
-    type: str  # payment_due, lease_end, vacancy_start
+    type: str  # payment_due, payment_done, lease_end, vacancy
     related_id: Optional[str] = None
     property_name: Optional[str] = None
     tenant_name: Optional[str] = None
     amount: Optional[float] = None
+    is_paid: Optional[bool] = None  # Payment events only
 
 # Team/Organization model for multi-user collaboration
 class TeamBase(BaseModel):
@@ -307,6 +523,51 @@ class AuditLog(BaseModel):
     changes: Optional[dict] = None  # For updates: {field: {old: x, new: y}}
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Response schemas of hot endpoints: they document the contract, the cached responses are
+# encoded straight from the dicts by orjson (see encode_json)
+class RevenuePoint(BaseModel):
+    month: str
+    amount: float
+
+class DashboardStats(BaseModel):
+    total_properties: int
+    occupied_properties: int
+    vacant_properties: int
+    total_tenants: int
+    active_leases: int
+    total_monthly_rent: float
+    total_collected: float
+    pending_amount: float
+    active_vacancies: int
+    occupancy_rate: float
+    revenue_chart: List[RevenuePoint]
+    unread_notifications: int
+
+class CalendarMonth(BaseModel):
+    events: List[CalendarEvent]
+    month: int
+    year: int
+
+class CalendarRange(BaseModel):
+    events: List[CalendarEvent]
+    from_: str = Field(alias="from")
+    to: str
+
+# ==================== PROCESS POOL ====================
+
+# CPU-bound work (image renditions, PDF rendering) never runs in request handlers
+_process_pool = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # "spawn": never fork the event loop, Mongo client and scheduler threads into workers
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
 # ==================== AUTH HELPERS ====================
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -338,6 +599,89 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 # ==================== AUDIT LOG HELPER ====================
 
+class AuditLogWriter:
+    """In-process audit queue flushed with insert_many.
+    
+    Entries are flushed when AUDIT_BATCH_SIZE entries are pending or every
+    AUDIT_FLUSH_INTERVAL seconds, and on shutdown. Until the writer is started
+    (scripts, tests without lifespan) entries are inserted directly.
+    """
+    
+    def __init__(self, batch_size: int, flush_interval: float, write_concern: WriteConcern):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_concern = write_concern
+        self.pending = []
+        self._wakeup = None
+        self._task = None
+        self._lock = None
+        self._stopping = False
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            # Not cancelled: a batch in flight would be lost with the cancelled insert_many
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+    
+    async def add(self, log_dict: dict):
+        if not self.running:
+            await db.audit_logs.with_options(write_concern=self.write_concern).insert_one(log_dict)
+            return
+        self.pending.append(log_dict)
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+    
+    async def flush(self):
+        """Write all pending entries (also used before reads, for read-your-writes)"""
+        # Locked before checking: a batch taken by another flush is only written once it returns
+        async with (self._lock or asyncio.Lock()):
+            batch, self.pending = self.pending, []
+            if not batch:
+                return
+            try:
+                await db.audit_logs.with_options(write_concern=self.write_concern).insert_many(batch, ordered=False)
+                return
+            except BulkWriteError as e:
+                # insert_many set an _id on every entry: on retry, already written ones fail as duplicates
+                failed = {
+                    error['index'] for error in e.details.get('writeErrors', [])
+                    if error.get('code') != 11000
+                }
+                batch = [entry for i, entry in enumerate(batch) if i in failed]
+            except Exception as e:
+                logger.error(f"Audit log flush failed ({len(batch)} entries): {e}")
+            if batch:
+                # Keep entries for the next flush, without growing unbounded
+                self.pending = (batch + self.pending)[-AUDIT_MAX_PENDING:]
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+audit_writer = AuditLogWriter(
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL,
+    write_concern=WriteConcern(w=int(AUDIT_WRITE_CONCERN) if AUDIT_WRITE_CONCERN.isdigit() else AUDIT_WRITE_CONCERN)
+)
+
 async def create_audit_log(
     user_id: str,
     user_name: str,
@@ -348,8 +692,10 @@ async def create_audit_log(
     team_id: str = None,
     changes: dict = None
 ):
-    """Create an audit log entry for tracking changes"""
-    log = AuditLog(
+    """Queue an audit log entry for tracking changes"""
+    # Fields are trusted (built by the routes): skip validation on the request path
+    log = AuditLog.model_construct(
+        id=str(uuid.uuid4()),
         user_id=user_id,
         user_name=user_name,
         team_id=team_id,
@@ -357,11 +703,11 @@ async def create_audit_log(
         entity_type=entity_type,
         entity_id=entity_id,
         entity_name=entity_name,
-        changes=changes
+        changes=changes,
+        created_at=datetime.now(timezone.utc)
     )
-    log_dict = log.model_dump()
-    log_dict['created_at'] = log_dict['created_at'].isoformat()
-    await db.audit_logs.insert_one(log_dict)
+    # created_at stays a datetime: stored as a BSON date for sorting and TTL retention
+    await audit_writer.add(dict(log))
     return log
 
 def get_changes(old_data: dict, new_data: dict, fields_to_track: list) -> dict:
@@ -374,6 +720,106 @@ def get_changes(old_data: dict, new_data: dict, fields_to_track: list) -> dict:
             changes[field] = {"old": old_val, "new": new_val}
     return changes if changes else None
 
+# ==================== RESPONSE CACHE ====================
+
+# Read-heavy endpoints (dashboard, lists, calendar, analytics) are served from an in-process LRU.
+# Entries are keyed by (user, endpoint, params, day) and remember the generation of each collection
+# ("tag") they were computed from; writes bump the user's generations, so stale entries are never
+# served again. With RESPONSE_CACHE_BACKEND=mongo the generations are shared through Mongo and every
+# worker sees every write; the default local store is only consistent with a single worker.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '2048'))
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'local')
+
+class LocalGenerationStore:
+    """Per-user generation counters kept in this process"""
+    
+    def __init__(self):
+        self.counters = {}
+        # Counters restart at 0 with the process: ETags from a previous process must not match
+        self.epoch = uuid.uuid4().hex
+    
+    async def get(self, user_id: str) -> dict:
+        return self.counters.get(user_id, {})
+    
+    async def bump(self, user_id: str, tags: tuple):
+        counters = self.counters.setdefault(user_id, {})
+        for tag in tags:
+            counters[tag] = counters.get(tag, 0) + 1
+
+class MongoGenerationStore:
+    """Per-user generation counters shared by all workers (one document per user)"""
+    
+    epoch = "shared"
+    
+    async def get(self, user_id: str) -> dict:
+        return await db.cache_generations.find_one({"user_id": user_id}, {"_id": 0, "user_id": 0}) or {}
+    
+    async def bump(self, user_id: str, tags: tuple):
+        await db.cache_generations.update_one(
+            {"user_id": user_id}, {"$inc": {tag: 1 for tag in tags}}, upsert=True
+        )
+
+generation_store = MongoGenerationStore() if RESPONSE_CACHE_BACKEND == "mongo" else LocalGenerationStore()
+response_cache = OrderedDict()  # (user_id, endpoint, params, day) -> (generations, JSON body)
+
+def encode_json(value) -> bytes:
+    """JSON in one native pass: orjson handles dicts, datetimes and numpy values itself, and only
+    falls back to jsonable_encoder for other types (e.g. Pydantic models)"""
+    return orjson.dumps(value, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def cached_response(*tags: str, model: Optional[type] = None):
+    """Cache an endpoint's encoded JSON per user until one of the tagged collections changes.
+    
+    The endpoint must take current_user and only hashable parameters. Responses carry an ETag
+    derived from the generations, so a matching If-None-Match is answered with a 304 before the
+    endpoint runs: unchanged data costs neither the Mongo queries nor the JSON encoding.
+    The cached Response bypasses the route's response_model: pass the schema as model to have
+    the value validated and serialised by it (natively, by pydantic-core).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(cache_request: Request, **kwargs):
+            user_id = kwargs['current_user']['id']
+            params = tuple(sorted((name, value) for name, value in kwargs.items() if name != 'current_user'))
+            key = (user_id, func.__name__, params, datetime.now(timezone.utc).date())
+            generations = await generation_store.get(user_id)
+            # Read before computing: a write landing meanwhile makes this entry stale at once
+            snapshot = tuple(generations.get(tag, 0) for tag in tags)
+            etag = f'"{hashlib.sha256(repr((generation_store.epoch, key, snapshot)).encode()).hexdigest()[:32]}"'
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if etag_matches(cache_request, etag):
+                return Response(status_code=304, headers=headers)
+            
+            entry = response_cache.get(key)
+            if entry and entry[0] == snapshot:
+                response_cache.move_to_end(key)
+                body = entry[1]
+            else:
+                value = await func(**kwargs)
+                body = model.model_validate(value).model_dump_json(by_alias=True).encode() if model else encode_json(value)
+                response_cache[key] = (snapshot, body)
+                response_cache.move_to_end(key)
+                while len(response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                    response_cache.popitem(last=False)
+            return Response(content=body, media_type="application/json", headers=headers)
+        
+        # FastAPI reads the endpoint's parameters plus the request used for If-None-Match
+        signature = inspect.signature(func)
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("cache_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+        ])
+        return wrapper
+    return decorator
+
+async def mark_changed(user_id: str, *tags: str):
+    """Write-through invalidation after a write to the tagged collections of a user"""
+    await generation_store.bump(user_id, tags)
+    if {"properties", "leases", "payments"} & set(tags):
+        await invalidate_forecast(user_id)
+    if {"properties", "tenants", "leases", "payments", "vacancies"} & set(tags):
+        invalidate_calendar_feed(user_id)
+
 # ==================== AUTH ROUTES ====================
 
 @api_router.post("/auth/register", response_model=Token)
@@ -425,6 +871,7 @@ async def create_property(property_data: PropertyCreate, current_user: dict = De
     doc = property_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.properties.insert_one(doc)
+    await mark_changed(current_user['id'], "properties")
     
     # Audit log
     await create_audit_log(
@@ -439,8 +886,26 @@ async def create_property(property_data: PropertyCreate, current_user: dict = De
     return {"id": property_obj.id, "message": "Bien créé avec succès"}
 
 @api_router.get("/properties", response_model=List[dict])
+@cached_response("properties", "documents")
 async def get_properties(current_user: dict = Depends(get_current_user)):
     properties = await db.properties.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
+    
+    # Thumbnail of the latest photo uploaded for each property (single query)
+    photos = await db.documents.find(
+        {
+            "user_id": current_user['id'],
+            "related_type": "property",
+            "related_id": {"$in": [p['id'] for p in properties]},
+            "rendition_status": "ready"
+        },
+        {"_id": 0, "id": 1, "related_id": 1, "renditions": 1}
+    ).sort("created_at", -1).to_list(1000)
+    thumbnails = {}
+    for photo in photos:
+        thumbnails.setdefault(photo['related_id'], get_rendition_urls(photo))
+    for property_doc in properties:
+        property_doc['image_renditions'] = thumbnails.get(property_doc['id'])
+    
     return properties
 
 @api_router.get("/properties/{property_id}", response_model=dict)
@@ -453,7 +918,12 @@ async def get_property(property_id: str, current_user: dict = Depends(get_curren
     return property_doc
 
 @api_router.put("/properties/{property_id}", response_model=dict)
-async def update_property(property_id: str, property_data: PropertyCreate, current_user: dict = Depends(get_current_user)):
+async def update_property(
+    property_id: str,
+    property_data: PropertyCreate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
     # Get old data for audit
     old_property = await db.properties.find_one({"id": property_id, "user_id": current_user['id']}, {"_id": 0})
     if not old_property:
@@ -463,10 +933,15 @@ async def update_property(property_id: str, property_data: PropertyCreate, curre
         {"id": property_id, "user_id": current_user['id']},
         {"$set": property_data.model_dump()}
     )
+    await invalidate_receipts({"user_id": current_user['id'], "property_id": property_id})
+    await mark_changed(current_user['id'], "properties")
+    if (old_property['name'], old_property.get('address')) != (property_data.name, property_data.address):
+        background_tasks.add_task(propagate_display_fields, current_user['id'], "property_id", property_id)
     
     # Audit log
     changes = get_changes(old_property, property_data.model_dump(), 
-        ['name', 'address', 'city', 'postal_code', 'property_type', 'surface', 'rooms', 'rent_amount', 'charges'])
+        ['name', 'address', 'city', 'postal_code', 'property_type', 'surface', 'rooms', 'rent_amount', 'charges',
+         'purchase_price', 'annual_costs'])
     if changes:
         await create_audit_log(
             user_id=current_user['id'],
@@ -481,12 +956,16 @@ async def update_property(property_id: str, property_data: PropertyCreate, curre
     return {"message": "Bien mis à jour avec succès"}
 
 @api_router.delete("/properties/{property_id}")
-async def delete_property(property_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_property(property_id: str, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
     property_doc = await db.properties.find_one({"id": property_id, "user_id": current_user['id']}, {"_id": 0})
     if not property_doc:
         raise HTTPException(status_code=404, detail="Bien non trouvé")
     
     await db.properties.delete_one({"id": property_id, "user_id": current_user['id']})
+    await mark_changed(current_user['id'], "properties")
+    
+    # Leases, payments, vacancies and documents are removed in the background
+    background_tasks.add_task(cascade_delete, "property", property_id, current_user['id'])
     
     # Audit log
     await create_audit_log(
@@ -508,6 +987,7 @@ async def create_tenant(tenant_data: TenantCreate, current_user: dict = Depends(
     doc = tenant_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.tenants.insert_one(doc)
+    await mark_changed(current_user['id'], "tenants")
     
     # Audit log
     await create_audit_log(
@@ -522,6 +1002,7 @@ async def create_tenant(tenant_data: TenantCreate, current_user: dict = Depends(
     return {"id": tenant_obj.id, "message": "Locataire créé avec succès"}
 
 @api_router.get("/tenants", response_model=List[dict])
+@cached_response("tenants")
 async def get_tenants(current_user: dict = Depends(get_current_user)):
     tenants = await db.tenants.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
     return tenants
@@ -536,7 +1017,12 @@ async def get_tenant(tenant_id: str, current_user: dict = Depends(get_current_us
     return tenant_doc
 
 @api_router.put("/tenants/{tenant_id}", response_model=dict)
-async def update_tenant(tenant_id: str, tenant_data: TenantCreate, current_user: dict = Depends(get_current_user)):
+async def update_tenant(
+    tenant_id: str,
+    tenant_data: TenantCreate,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
     old_tenant = await db.tenants.find_one({"id": tenant_id, "user_id": current_user['id']}, {"_id": 0})
     if not old_tenant:
         raise HTTPException(status_code=404, detail="Locataire non trouvé")
@@ -545,6 +1031,10 @@ async def update_tenant(tenant_id: str, tenant_data: TenantCreate, current_user:
         {"id": tenant_id, "user_id": current_user['id']},
         {"$set": tenant_data.model_dump()}
     )
+    await invalidate_receipts({"user_id": current_user['id'], "tenant_id": tenant_id})
+    await mark_changed(current_user['id'], "tenants")
+    if (old_tenant['first_name'], old_tenant['last_name']) != (tenant_data.first_name, tenant_data.last_name):
+        background_tasks.add_task(propagate_display_fields, current_user['id'], "tenant_id", tenant_id)
     
     # Audit log
     changes = get_changes(old_tenant, tenant_data.model_dump(),
@@ -563,12 +1053,16 @@ async def update_tenant(tenant_id: str, tenant_data: TenantCreate, current_user:
     return {"message": "Locataire mis à jour avec succès"}
 
 @api_router.delete("/tenants/{tenant_id}")
-async def delete_tenant(tenant_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_tenant(tenant_id: str, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
     tenant_doc = await db.tenants.find_one({"id": tenant_id, "user_id": current_user['id']}, {"_id": 0})
     if not tenant_doc:
         raise HTTPException(status_code=404, detail="Locataire non trouvé")
     
     await db.tenants.delete_one({"id": tenant_id, "user_id": current_user['id']})
+    await mark_changed(current_user['id'], "tenants")
+    
+    # Leases, payments and documents are removed in the background
+    background_tasks.add_task(cascade_delete, "tenant", tenant_id, current_user['id'])
     
     # Audit log
     await create_audit_log(
@@ -582,54 +1076,196 @@ async def delete_tenant(tenant_id: str, current_user: dict = Depends(get_current
     
     return {"message": "Locataire supprimé avec succès"}
 
+# ==================== DISPLAY FIELDS ====================
+
+# Leases and payments carry a copy of the names shown in lists, written with the document and
+# refreshed in the background when a property or tenant is renamed: list endpoints then read a
+# single collection instead of fetching the property and tenant of every row.
+DISPLAY_FIELDS = ("property_name", "property_address", "tenant_name")
+
+def lease_display_fields(property_doc: Optional[dict], tenant_doc: Optional[dict]) -> dict:
+    return {
+        "property_name": property_doc['name'] if property_doc else None,
+        "property_address": property_doc.get('address') if property_doc else None,
+        "tenant_name": f"{tenant_doc['first_name']} {tenant_doc['last_name']}" if tenant_doc else None,
+    }
+
+def copy_display_fields(lease: Optional[dict]) -> dict:
+    """Display fields of a payment, taken from its lease"""
+    return {field: lease.get(field) if lease else None for field in DISPLAY_FIELDS}
+
+async def load_lease_display_fields(leases: list) -> dict:
+    """Display fields by lease id, from one properties and one tenants query"""
+    properties = {
+        p['id']: p for p in await db.properties.find(
+            {"id": {"$in": list({lease['property_id'] for lease in leases})}}, {"_id": 0, "id": 1, "name": 1, "address": 1}
+        ).to_list(None)
+    }
+    tenants = {
+        t['id']: t for t in await db.tenants.find(
+            {"id": {"$in": list({lease['tenant_id'] for lease in leases})}}, {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+        ).to_list(None)
+    }
+    return {
+        lease['id']: lease_display_fields(properties.get(lease['property_id']), tenants.get(lease['tenant_id']))
+        for lease in leases
+    }
+
+async def load_payment_display_fields(query: dict) -> dict:
+    """Display fields by lease id for the leases matching a query"""
+    leases = await db.leases.find(query, {"_id": 0, "id": 1, **{field: 1 for field in DISPLAY_FIELDS}}).to_list(None)
+    return {lease['id']: copy_display_fields(lease) for lease in leases}
+
+async def propagate_display_fields(user_id: str, field: str, entity_id: str):
+    """Background task copying the current name of a property or tenant to its leases and payments"""
+    # Re-read rather than passed by the route: out-of-order tasks still converge on the latest name
+    if field == "property_id":
+        property_doc = await db.properties.find_one({"id": entity_id, "user_id": user_id}, {"_id": 0, "name": 1, "address": 1})
+        if not property_doc:
+            return
+        values = {"property_name": property_doc['name'], "property_address": property_doc.get('address')}
+    else:
+        tenant_doc = await db.tenants.find_one({"id": entity_id, "user_id": user_id}, {"_id": 0, "first_name": 1, "last_name": 1})
+        if not tenant_doc:
+            return
+        values = {"tenant_name": f"{tenant_doc['first_name']} {tenant_doc['last_name']}"}
+    
+    await db.leases.update_many({"user_id": user_id, field: entity_id}, {"$set": values})
+    lease_ids = await db.leases.distinct("id", {"user_id": user_id, field: entity_id})
+    if lease_ids:
+        await db.payments.update_many({"user_id": user_id, "lease_id": {"$in": lease_ids}}, {"$set": values})
+    await mark_changed(user_id, "leases", "payments")
+
+async def migrate_display_fields():
+    """Fill the display fields of leases and payments written before they existed"""
+    migrated = 0
+    while True:
+        leases = await db.leases.find(
+            {"property_name": {"$exists": False}}, {"_id": 0, "id": 1, "property_id": 1, "tenant_id": 1}
+        ).to_list(1000)
+        if not leases:
+            break
+        fields = await load_lease_display_fields(leases)
+        await db.leases.bulk_write([
+            UpdateOne({"id": lease['id']}, {"$set": fields[lease['id']]}) for lease in leases
+        ], ordered=False)
+        migrated += len(leases)
+    while True:
+        payments = await db.payments.find(
+            {"property_name": {"$exists": False}}, {"_id": 0, "id": 1, "lease_id": 1}
+        ).to_list(1000)
+        if not payments:
+            break
+        fields = await load_payment_display_fields({"id": {"$in": list({p['lease_id'] for p in payments})}})
+        await db.payments.bulk_write([
+            UpdateOne({"id": payment['id']}, {"$set": fields.get(payment['lease_id'], copy_display_fields(None))})
+            for payment in payments
+        ], ordered=False)
+        migrated += len(payments)
+    if migrated:
+        logger.info(f"Filled display fields of {migrated} lease(s) and payment(s)")
+
+async def init_display_fields():
+    # Indexes used by the rename propagation
+    await db.leases.create_index([("user_id", 1), ("property_id", 1)])
+    await db.leases.create_index([("user_id", 1), ("tenant_id", 1)])
+    await db.payments.create_index([("user_id", 1), ("lease_id", 1)])
+    await migrate_display_fields()
+
+# ==================== TRANSACTIONS ====================
+
+_transactions_supported = None
+
+async def supports_transactions() -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        if MONGO_TRANSACTIONS in ("false", "0", "off"):
+            _transactions_supported = False
+        else:
+            try:
+                hello = await db.command("hello")
+            except PyMongoError as e:
+                # Unreachable server: not cached, the topology is probed again on the next write
+                logger.warning(f"Could not detect transaction support: {e}")
+                return False
+            _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+            if not _transactions_supported:
+                logger.warning("MongoDB standalone server: multi-document writes are not transactional")
+    return _transactions_supported
+
+async def write_atomically(writes: list):
+    """Run independent writes (callables accepting a session keyword) as a single transaction.
+    
+    Inside a transaction they are sent one after the other, a session not supporting concurrent
+    operations; without transaction support they are sent concurrently.
+    """
+    if not await supports_transactions():
+        await asyncio.gather(*(write() for write in writes))
+        return
+    
+    async def run(session):
+        for write in writes:
+            await write(session=session)
+    
+    # with_transaction retries the whole callback on transient errors
+    async with await db.client.start_session() as session:
+        await session.with_transaction(run)
+
 # ==================== LEASES ROUTES ====================
 
 @api_router.post("/leases", response_model=dict)
 async def create_lease(lease_data: LeaseCreate, current_user: dict = Depends(get_current_user)):
     # Verify property and tenant exist
-    property_doc = await db.properties.find_one({"id": lease_data.property_id, "user_id": current_user['id']})
+    property_doc, tenant_doc = await asyncio.gather(
+        db.properties.find_one({"id": lease_data.property_id, "user_id": current_user['id']}),
+        db.tenants.find_one({"id": lease_data.tenant_id, "user_id": current_user['id']})
+    )
     if not property_doc:
         raise HTTPException(status_code=404, detail="Bien non trouvé")
-    
-    tenant_doc = await db.tenants.find_one({"id": lease_data.tenant_id, "user_id": current_user['id']})
     if not tenant_doc:
         raise HTTPException(status_code=404, detail="Locataire non trouvé")
     
     # Create lease
-    lease_obj = Lease(**lease_data.model_dump(), user_id=current_user['id'])
+    lease_obj = Lease(
+        **lease_data.model_dump(),
+        **lease_display_fields(property_doc, tenant_doc),
+        user_id=current_user['id']
+    )
     doc = lease_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.leases.insert_one(doc)
-    
-    # Update property status
-    await db.properties.update_one(
-        {"id": lease_data.property_id},
-        {"$set": {"is_occupied": True, "current_tenant_id": lease_data.tenant_id}}
-    )
-    
-    # Update tenant current property
-    await db.tenants.update_one(
-        {"id": lease_data.tenant_id},
-        {"$set": {"current_property_id": lease_data.property_id}}
-    )
     
-    # End any active vacancy
-    await db.vacancies.update_many(
-        {"property_id": lease_data.property_id, "is_active": True},
-        {"$set": {"is_active": False, "end_date": lease_data.start_date}}
-    )
+    # Lease, occupancy flags and vacancy end are written together
+    await write_atomically([
+        functools.partial(db.leases.insert_one, doc),
+        functools.partial(
+            db.properties.update_one,
+            {"id": lease_data.property_id},
+            {"$set": {"is_occupied": True, "current_tenant_id": lease_data.tenant_id}}
+        ),
+        functools.partial(
+            db.tenants.update_one,
+            {"id": lease_data.tenant_id},
+            {"$set": {"current_property_id": lease_data.property_id}}
+        ),
+        # End any active vacancy
+        functools.partial(
+            db.vacancies.update_many,
+            {"property_id": lease_data.property_id, "is_active": True},
+            {"$set": {"is_active": False, "end_date": lease_data.start_date}}
+        ),
+    ])
+    
+    await sync_lease_ledger(doc)
+    await mark_changed(current_user['id'], "leases", "properties", "tenants", "vacancies")
     
     return {"id": lease_obj.id, "message": "Bail créé avec succès"}
 
 @api_router.get("/leases", response_model=List[dict])
+@cached_response("leases")
 async def get_leases(current_user: dict = Depends(get_current_user)):
+    # Property and tenant names are stored on the lease (see DISPLAY FIELDS)
     leases = await db.leases.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
-    # Enrich with property and tenant info
-    for lease in leases:
-        property_doc = await db.properties.find_one({"id": lease['property_id']}, {"_id": 0, "name": 1, "address": 1})
-        tenant_doc = await db.tenants.find_one({"id": lease['tenant_id']}, {"_id": 0, "first_name": 1, "last_name": 1})
-        lease['property'] = property_doc
-        lease['tenant'] = tenant_doc
     return leases
 
 @api_router.get("/leases/{lease_id}", response_model=dict)
@@ -647,25 +1283,6 @@ async def terminate_lease(lease_id: str, end_date: str, current_user: dict = Dep
     if not lease_doc:
         raise HTTPException(status_code=404, detail="Bail non trouvé")
     
-    # Update lease
-    await db.leases.update_one(
-        {"id": lease_id},
-        {"$set": {"is_active": False, "end_date": end_date}}
-    )
-    
-    # Update property
-    await db.properties.update_one(
-        {"id": lease_doc['property_id']},
-        {"$set": {"is_occupied": False, "current_tenant_id": None}}
-    )
-    
-    # Update tenant
-    await db.tenants.update_one(
-        {"id": lease_doc['tenant_id']},
-        {"$set": {"current_property_id": None}}
-    )
-    
-    # Create vacancy
     vacancy_obj = Vacancy(
         property_id=lease_doc['property_id'],
         start_date=end_date,
@@ -674,7 +1291,22 @@ async def terminate_lease(lease_id: str, end_date: str, current_user: dict = Dep
     )
     doc = vacancy_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await db.vacancies.insert_one(doc)
+    
+    # Lease end, occupancy flags and the new vacancy are written together
+    await write_atomically([
+        functools.partial(db.leases.update_one, {"id": lease_id}, {"$set": {"is_active": False, "end_date": end_date}}),
+        functools.partial(
+            db.properties.update_one,
+            {"id": lease_doc['property_id']},
+            {"$set": {"is_occupied": False, "current_tenant_id": None}}
+        ),
+        functools.partial(db.tenants.update_one, {"id": lease_doc['tenant_id']}, {"$set": {"current_property_id": None}}),
+        functools.partial(db.vacancies.insert_one, doc),
+    ])
+    
+    # Rent is no longer due after the end date
+    await remove_ledger_entries(lease_id, {"kind": "due", "entry_date": {"$gt": end_date[:10]}})
+    await mark_changed(current_user['id'], "leases", "properties", "tenants", "vacancies")
     
     return {"message": "Bail résilié avec succès"}
 
@@ -687,23 +1319,124 @@ async def create_payment(payment_data: PaymentCreate, current_user: dict = Depen
     if not lease_doc:
         raise HTTPException(status_code=404, detail="Bail non trouvé")
     
-    payment_obj = Payment(**payment_data.model_dump(), user_id=current_user['id'])
+    payment_obj = Payment(**payment_data.model_dump(), **copy_display_fields(lease_doc), user_id=current_user['id'])
     doc = payment_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.payments.insert_one(doc)
+    await post_payments_to_ledger([doc])
+    await mark_changed(current_user['id'], "payments")
     return {"id": payment_obj.id, "message": "Paiement enregistré avec succès"}
 
+async def read_bulk_rows(request: Request) -> list:
+    """Rows of a JSON array or NDJSON body, as (index, dict or parse error) pairs"""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        lines, buffer = [], b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *complete, buffer = buffer.split(b"\n")
+            lines.extend(line for line in complete if line.strip())
+            if len(lines) > MAX_BULK_PAYMENTS:
+                break
+        if buffer.strip():
+            lines.append(buffer)
+        rows = []
+        for line in lines:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(ValueError("JSON invalide"))
+    else:
+        try:
+            rows = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON invalide")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Un tableau de paiements est attendu")
+    
+    if len(rows) > MAX_BULK_PAYMENTS:
+        raise HTTPException(status_code=413, detail=f"Maximum {MAX_BULK_PAYMENTS} paiements par import")
+    return list(enumerate(rows))
+
+@api_router.post("/payments/bulk", response_model=dict)
+async def create_payments_bulk(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """Record many payments at once (JSON array or NDJSON), reporting errors per row"""
+    user_id = current_user['id']
+    rows = await read_bulk_rows(request)
+    errors = []
+    valid = []
+    for index, row in rows:
+        if isinstance(row, Exception):
+            errors.append({"index": index, "error": str(row)})
+            continue
+        try:
+            valid.append((index, PaymentCreate.model_validate(row)))
+        except ValidationError as e:
+            errors.append({"index": index, "error": "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+            )})
+    
+    # Every referenced lease checked (and its display fields loaded) with a single query
+    lease_ids = list({payment.lease_id for _, payment in valid})
+    known_leases = await load_payment_display_fields({"user_id": user_id, "id": {"$in": lease_ids}}) if lease_ids else {}
+    
+    now = datetime.now(timezone.utc).isoformat()
+    docs, doc_rows = [], []
+    for index, payment in valid:
+        if payment.lease_id not in known_leases:
+            errors.append({"index": index, "error": "Bail non trouvé"})
+            continue
+        # Same document as Payment(...).model_dump(), without re-validating
+        docs.append({
+            **payment.model_dump(),
+            **known_leases[payment.lease_id],
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "status": "paid",
+            "created_at": now
+        })
+        doc_rows.append(index)
+    
+    failed = set()
+    if docs:
+        try:
+            await db.payments.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get('writeErrors', []):
+                failed.add(write_error['index'])
+                errors.append({"index": doc_rows[write_error['index']], "error": write_error.get('errmsg', "Erreur d'écriture")})
+    
+    created = [{"index": doc_rows[i], "id": doc['id']} for i, doc in enumerate(docs) if i not in failed]
+    if created:
+        background_tasks.add_task(post_payments_to_ledger, [doc for i, doc in enumerate(docs) if i not in failed])
+        await mark_changed(user_id, "payments")
+        # One audit entry for the whole import
+        await create_audit_log(
+            user_id=user_id,
+            user_name=current_user['name'],
+            action="create",
+            entity_type="payment",
+            entity_id=created[0]['id'],
+            entity_name=f"Import de {len(created)} paiement(s)",
+            changes={"count": {"old": None, "new": len(created)}}
+        )
+    
+    errors.sort(key=lambda error: error['index'])
+    return {
+        "created": created,
+        "errors": errors,
+        "message": f"{len(created)} paiement(s) enregistré(s), {len(errors)} erreur(s)"
+    }
+
 @api_router.get("/payments", response_model=List[dict])
+@cached_response("payments")
 async def get_payments(current_user: dict = Depends(get_current_user)):
+    # Property and tenant names are stored on the payment (see DISPLAY FIELDS)
     payments = await db.payments.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
-    # Enrich with lease info
-    for payment in payments:
-        lease_doc = await db.leases.find_one({"id": payment['lease_id']}, {"_id": 0})
-        if lease_doc:
-            property_doc = await db.properties.find_one({"id": lease_doc['property_id']}, {"_id": 0, "name": 1})
-            tenant_doc = await db.tenants.find_one({"id": lease_doc['tenant_id']}, {"_id": 0, "first_name": 1, "last_name": 1})
-            payment['property'] = property_doc
-            payment['tenant'] = tenant_doc
     return payments
 
 @api_router.get("/payments/lease/{lease_id}", response_model=List[dict])
@@ -715,11 +1448,257 @@ async def get_lease_payments(lease_id: str, current_user: dict = Depends(get_cur
 
 @api_router.delete("/payments/{payment_id}")
 async def delete_payment(payment_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.payments.delete_one({"id": payment_id, "user_id": current_user['id']})
-    if result.deleted_count == 0:
+    payment = await db.payments.find_one_and_delete(
+        {"id": payment_id, "user_id": current_user['id']}, {"_id": 0, "lease_id": 1}
+    )
+    if not payment:
         raise HTTPException(status_code=404, detail="Paiement non trouvé")
+    await remove_ledger_entries(payment['lease_id'], {"source_id": payment_id})
+    await invalidate_receipts({"payment_id": payment_id})
+    await mark_changed(current_user['id'], "payments")
     return {"message": "Paiement supprimé avec succès"}
 
+# ==================== ARREARS LEDGER ====================
+
+# Per-lease ledger: one "due" entry per rent period (+rent+charges) and one "payment" entry
+# per payment (-amount). Each entry stores the running balance after it (> 0: the tenant owes),
+# so the balance as of any date is the last entry before that date.
+
+# Weak values: a lease's lock lives only while a holder or waiter references it
+_ledger_locks = weakref.WeakValueDictionary()
+
+def get_ledger_lock(lease_id: str) -> asyncio.Lock:
+    return _ledger_locks.setdefault(lease_id, asyncio.Lock())
+
+def ledger_sort_key(entry_date: str, kind: str, source_id: str) -> str:
+    # Same day: the rent is due before it is paid
+    return f"{entry_date}|{0 if kind == 'due' else 1}|{source_id}"
+
+def make_ledger_entry(lease: dict, kind: str, source_id: str, entry_date: str, amount: float,
+                      period_year: int, period_month: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": lease['user_id'],
+        "lease_id": lease['id'],
+        "kind": kind,
+        "source_id": source_id,
+        "entry_date": entry_date,
+        "sort_key": ledger_sort_key(entry_date, kind, source_id),
+        "amount": round(amount, 2),
+        "period_year": period_year,
+        "period_month": period_month,
+        "balance": 0.0
+    }
+
+def make_payment_entry(lease: dict, payment: dict) -> dict:
+    return make_ledger_entry(
+        lease, "payment", payment['id'], payment['payment_date'][:10], -payment['amount'],
+        payment['period_year'], payment['period_month']
+    )
+
+def build_due_entries(lease: dict, through: date) -> list:
+    """Rent-due entries of a lease after its last generated period, up to a date"""
+    start = date.fromisoformat(lease['start_date'][:10])
+    if lease.get('ledger_through'):
+        year, month = map(int, lease['ledger_through'].split("-"))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        start = max(start, date(year, month, 1))
+    end = min(through, date.fromisoformat(lease['end_date'][:10])) if lease.get('end_date') else through
+    
+    entries = []
+    for year, month in iter_months(start, end):
+        day = min(lease.get('payment_day') or 1, calendar.monthrange(year, month)[1])
+        due_date = date(year, month, day)
+        if due_date > through:
+            break
+        entries.append(make_ledger_entry(
+            lease, "due", f"due:{lease['id']}:{year}-{month:02d}", due_date.isoformat(),
+            lease['rent_amount'] + lease.get('charges', 0), year, month
+        ))
+    return entries
+
+async def rebalance_ledger(lease_id: str, from_key: str):
+    """Recompute running balances from a position onwards (only the tail after a back-dated change)"""
+    previous = await db.ledger_entries.find_one(
+        {"lease_id": lease_id, "sort_key": {"$lt": from_key}}, {"_id": 0, "balance": 1}, sort=[("sort_key", -1)]
+    )
+    balance = previous['balance'] if previous else 0.0
+    updates = []
+    async for entry in db.ledger_entries.find(
+        {"lease_id": lease_id, "sort_key": {"$gte": from_key}}, {"_id": 0, "id": 1, "amount": 1, "balance": 1}
+    ).sort("sort_key", 1):
+        balance = round(balance + entry['amount'], 2)
+        if entry['balance'] != balance:
+            updates.append(UpdateOne({"id": entry['id']}, {"$set": {"balance": balance}}))
+    if updates:
+        await db.ledger_entries.bulk_write(updates, ordered=False)
+
+async def post_ledger_entries(lease_id: str, entries: list):
+    """Insert entries for one lease (idempotent on source_id) and update the running balances"""
+    if not entries:
+        return
+    async with get_ledger_lock(lease_id):
+        try:
+            await db.ledger_entries.insert_many(entries, ordered=False)
+        except BulkWriteError as e:
+            # Already posted (retries, concurrent sync): the existing entry stands
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+        await rebalance_ledger(lease_id, min(entry['sort_key'] for entry in entries))
+
+async def remove_ledger_entries(lease_id: str, query: dict):
+    async with get_ledger_lock(lease_id):
+        first = await db.ledger_entries.find_one(
+            {**query, "lease_id": lease_id}, {"_id": 0, "sort_key": 1}, sort=[("sort_key", 1)]
+        )
+        if not first:
+            return
+        await db.ledger_entries.delete_many({**query, "lease_id": lease_id})
+        await rebalance_ledger(lease_id, first['sort_key'])
+
+async def sync_lease_ledger(lease: dict, through: date = None):
+    """Generate the missing rent-due entries of a lease; a new ledger also imports existing payments"""
+    through = through or datetime.now(timezone.utc).date()
+    entries = build_due_entries(lease, through)
+    if not lease.get('ledger_through'):
+        payments = await db.payments.find(
+            {"lease_id": lease['id'], "user_id": lease['user_id']},
+            {"_id": 0, "id": 1, "amount": 1, "payment_date": 1, "period_year": 1, "period_month": 1}
+        ).to_list(None)
+        entries += [make_payment_entry(lease, payment) for payment in payments]
+    await post_ledger_entries(lease['id'], entries)
+    
+    dues = [entry for entry in entries if entry['kind'] == "due"]
+    ledger_through = f"{dues[-1]['period_year']}-{dues[-1]['period_month']:02d}" if dues \
+        else lease.get('ledger_through') or ""
+    if ledger_through != lease.get('ledger_through'):
+        await db.leases.update_one({"id": lease['id']}, {"$set": {"ledger_through": ledger_through}})
+        lease['ledger_through'] = ledger_through
+
+async def sync_ledgers(user_id: str = None):
+    """Daily job: rent-due entries of every lease up to today (backfills leases without ledger)"""
+    today = datetime.now(timezone.utc).date()
+    current_period = f"{today.year}-{today.month:02d}"
+    query = {"$or": [
+        {"ledger_through": {"$exists": False}},
+        {"is_active": True, "ledger_through": {"$lt": current_period}}
+    ]}
+    if user_id:
+        query["user_id"] = user_id
+    count = 0
+    async for lease in db.leases.find(query, {"_id": 0}).batch_size(CASCADE_BATCH_SIZE):
+        try:
+            await sync_lease_ledger(lease, today)
+            count += 1
+        except Exception as e:
+            logger.error(f"Ledger sync failed for lease {lease['id']}: {str(e)}")
+    if count:
+        logger.info(f"Ledger synced for {count} lease(s)")
+
+async def post_payments_to_ledger(payments: list):
+    """Add payment entries, grouped per lease"""
+    by_lease = {}
+    for payment in payments:
+        by_lease.setdefault(payment['lease_id'], []).append(payment)
+    leases = await db.leases.find({"id": {"$in": list(by_lease)}}, {"_id": 0}).to_list(None)
+    for lease in leases:
+        if not lease.get('ledger_through'):
+            # No ledger yet: the backfill reads the payments from the collection
+            await sync_lease_ledger(lease)
+        else:
+            await post_ledger_entries(lease['id'], [make_payment_entry(lease, p) for p in by_lease[lease['id']]])
+
+async def ensure_ledger_indexes():
+    await db.ledger_entries.create_index("source_id", unique=True)
+    await db.ledger_entries.create_index([("lease_id", 1), ("sort_key", 1)])
+    await db.ledger_entries.create_index([("user_id", 1), ("lease_id", 1), ("sort_key", -1)])
+
+async def init_ledger():
+    await ensure_ledger_indexes()
+    await sync_ledgers()
+
+def parse_as_of(as_of: Optional[str]) -> str:
+    if not as_of:
+        return datetime.now(timezone.utc).date().isoformat()
+    try:
+        return date.fromisoformat(as_of[:10]).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date invalide")
+
+@api_router.get("/ledger/balances", response_model=dict)
+async def get_ledger_balances(
+    as_of: Optional[str] = None,
+    arrears_only: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Balance of every lease as of a date (default today): the last ledger entry on or before it"""
+    as_of = parse_as_of(as_of)
+    # "|~" sorts after every "<date>|<rank>|<id>" key of that day
+    rows = await db.ledger_entries.aggregate([
+        {"$match": {"user_id": current_user['id'], "sort_key": {"$lte": f"{as_of}|~"}}},
+        {"$sort": {"lease_id": 1, "sort_key": -1}},
+        {"$group": {"_id": "$lease_id", "balance": {"$first": "$balance"}, "last_entry_date": {"$first": "$entry_date"}}}
+    ]).to_list(None)
+    if arrears_only:
+        rows = [row for row in rows if row['balance'] > 0]
+    
+    # Leases carry the property and tenant names (see DISPLAY FIELDS)
+    leases = await db.leases.find(
+        {"id": {"$in": [row['_id'] for row in rows]}}, {"_id": 0, "id": 1, "property_name": 1, "tenant_name": 1}
+    ).to_list(None)
+    leases = {lease['id']: lease for lease in leases}
+    
+    balances = []
+    for row in sorted(rows, key=lambda r: r['balance'], reverse=True):
+        lease = leases.get(row['_id'], {})
+        balances.append({
+            "lease_id": row['_id'],
+            "property_name": lease.get('property_name'),
+            "tenant_name": lease.get('tenant_name'),
+            "balance": row['balance'],
+            "last_entry_date": row['last_entry_date']
+        })
+    return {
+        "as_of": as_of,
+        "balances": balances,
+        "total_arrears": round(sum(b['balance'] for b in balances if b['balance'] > 0), 2)
+    }
+
+@api_router.get("/ledger/leases/{lease_id}", response_model=dict)
+async def get_lease_ledger(
+    lease_id: str,
+    date_from: Optional[str] = None,
+    as_of: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Ledger entries of a lease with their running balance"""
+    lease = await db.leases.find_one({"id": lease_id, "user_id": current_user['id']}, {"_id": 0, "id": 1})
+    if not lease:
+        raise HTTPException(status_code=404, detail="Bail non trouvé")
+    as_of = parse_as_of(as_of)
+    
+    key_range = {"$lte": f"{as_of}|~"}
+    opening = 0.0
+    if date_from:
+        date_from = parse_as_of(date_from)
+        key_range["$gte"] = date_from
+        previous = await db.ledger_entries.find_one(
+            {"lease_id": lease_id, "sort_key": {"$lt": date_from}}, {"_id": 0, "balance": 1}, sort=[("sort_key", -1)]
+        )
+        opening = previous['balance'] if previous else 0.0
+    
+    entries = await db.ledger_entries.find(
+        {"lease_id": lease_id, "sort_key": key_range},
+        {"_id": 0, "user_id": 0, "sort_key": 0}
+    ).sort("sort_key", 1).to_list(None)
+    return {
+        "lease_id": lease_id,
+        "as_of": as_of,
+        "opening_balance": opening,
+        "balance": entries[-1]['balance'] if entries else opening,
+        "entries": entries
+    }
+
 # ==================== VACANCIES ROUTES ====================
 
 @api_router.post("/vacancies", response_model=dict)
@@ -728,9 +1707,11 @@ async def create_vacancy(vacancy_data: VacancyCreate, current_user: dict = Depen
     doc = vacancy_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.vacancies.insert_one(doc)
+    await mark_changed(current_user['id'], "vacancies")
     return {"id": vacancy_obj.id, "message": "Vacance créée avec succès"}
 
 @api_router.get("/vacancies", response_model=List[dict])
+@cached_response("vacancies", "properties")
 async def get_vacancies(current_user: dict = Depends(get_current_user)):
     vacancies = await db.vacancies.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
     # Enrich with property info
@@ -747,6 +1728,7 @@ async def end_vacancy(vacancy_id: str, end_date: str, current_user: dict = Depen
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Vacance non trouvée")
+    await mark_changed(current_user['id'], "vacancies")
     return {"message": "Vacance terminée avec succès"}
 
 # ==================== NOTIFICATIONS ROUTES ====================
@@ -775,6 +1757,7 @@ async def update_notification_settings(settings_data: NotificationSettingsCreate
     return {"message": "Paramètres mis à jour avec succès"}
 
 @api_router.get("/notifications", response_model=List[dict])
+@cached_response("notifications")
 async def get_notifications(current_user: dict = Depends(get_current_user)):
     notifications = await db.notifications.find(
         {"user_id": current_user['id']}, {"_id": 0}
@@ -789,6 +1772,7 @@ async def mark_notification_read(notification_id: str, current_user: dict = Depe
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Notification non trouvée")
+    await mark_changed(current_user['id'], "notifications")
     return {"message": "Notification marquée comme lue"}
 
 @api_router.put("/notifications/read-all")
@@ -797,11 +1781,13 @@ async def mark_all_notifications_read(current_user: dict = Depends(get_current_u
         {"user_id": current_user['id'], "is_read": False},
         {"$set": {"is_read": True}}
     )
+    await mark_changed(current_user['id'], "notifications")
     return {"message": "Toutes les notifications marquées comme lues"}
 
 # ==================== DASHBOARD ROUTES ====================
 
-@api_router.get("/dashboard/stats")
+@api_router.get("/dashboard/stats", response_model=DashboardStats)
+@cached_response("properties", "tenants", "leases", "payments", "vacancies", "notifications", model=DashboardStats)
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
     user_id = current_user['id']
     
@@ -870,130 +1856,917 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         "unread_notifications": unread_notifications
     }
 
-# ==================== RECEIPT (QUITTANCE) GENERATION ====================
+# ==================== OCCUPANCY TIMELINE ====================
 
-@api_router.get("/receipts/{payment_id}")
-async def generate_receipt(payment_id: str, current_user: dict = Depends(get_current_user)):
-    payment = await db.payments.find_one({"id": payment_id, "user_id": current_user['id']}, {"_id": 0})
-    if not payment:
-        raise HTTPException(status_code=404, detail="Paiement non trouvé")
+def build_occupancy_index(lease_property: np.ndarray, lease_start: np.ndarray, lease_end: np.ndarray) -> dict:
+    """Merge each property's leases into sorted, non-overlapping occupied intervals (sweep line).
     
-    lease = await db.leases.find_one({"id": payment['lease_id']}, {"_id": 0})
-    if not lease:
-        raise HTTPException(status_code=404, detail="Bail non trouvé")
+    Days (inclusive bounds, int days since epoch) are shifted by property * offset so every
+    property owns its own segment of a single sorted axis: running maxima and searchsorted
+    then process all properties at once. Returns the merged intervals on that axis, their
+    cumulative lengths and the overlapping lease pairs.
+    """
+    valid = lease_end >= lease_start
+    lease_ids = np.flatnonzero(valid)
+    lease_property, lease_start, lease_end = lease_property[valid], lease_start[valid], lease_end[valid]
+    base = int(lease_start.min()) - 1 if len(lease_start) else 0
+    offset = (int(lease_end.max()) - base + 2) if len(lease_end) else 1
+    
+    order = np.lexsort((lease_start, lease_property))
+    starts = lease_start[order] - base + lease_property[order] * offset
+    ends = lease_end[order] - base + lease_property[order] * offset
+    
+    # Furthest end among the previous leases of the sweep (previous properties end below this segment)
+    running_end = np.maximum.accumulate(ends) if len(ends) else ends
+    previous_end = np.concatenate(([-1], running_end[:-1])) if len(ends) else ends
+    
+    # A lease starting before the previous ones end overlaps the one reaching furthest
+    overlapping = np.flatnonzero(starts <= previous_end)
+    holder = np.maximum.accumulate(np.where(ends == running_end, np.arange(len(ends)), 0)) if len(ends) else ends
+    conflicts = [
+        (int(lease_ids[order[holder[i - 1]]]), int(lease_ids[order[i]]),
+         int(starts[i] - lease_property[order[i]] * offset + base),
+         int(min(ends[i], previous_end[i]) - lease_property[order[i]] * offset + base))
+        for i in overlapping
+    ]
+    
+    # Merged intervals start wherever a lease begins after a gap (adjacent leases are merged)
+    first = np.flatnonzero(starts > previous_end + 1)
+    merged_start = starts[first]
+    merged_end = np.maximum.reduceat(ends, first) if len(first) else ends[:0]
+    lengths = merged_end - merged_start + 1
+    return {
+        "base": base,
+        "offset": offset,
+        "start": merged_start,
+        "end": merged_end,
+        "property": (merged_start // offset).astype(int) if len(first) else merged_start.astype(int),
+        "cumulative": np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(first) else lengths,
+        "conflicts": conflicts,
+    }
+
+def occupied_days_through(index: dict, properties: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Occupied days on the global axis up to each (property, day), inclusive.
     
-    property_doc = await db.properties.find_one({"id": lease['property_id']}, {"_id": 0})
-    tenant = await db.tenants.find_one({"id": lease['tenant_id']}, {"_id": 0})
-    user = await db.users.find_one({"id": current_user['id']}, {"_id": 0, "password": 0})
+    Only differences between two days of the same property are meaningful. Days outside the
+    leases' span are clipped to the property's own segment (never occupied at its bounds), so
+    they cannot land in a neighbouring property's segment.
+    """
+    points = np.clip(days - index['base'], 0, index['offset'] - 1) + properties * index['offset']
+    k = np.searchsorted(index['start'], points, side="right") - 1
+    if not len(index['start']):
+        return np.zeros(points.shape)
+    k_safe = np.maximum(k, 0)
+    within = np.clip(points - index['start'][k_safe] + 1, 0, index['end'][k_safe] - index['start'][k_safe] + 1)
+    return np.where(k >= 0, index['cumulative'][k_safe] + within, 0)
+
+def occupied_days_by_month(index: dict, n_properties: int, month_start: np.ndarray, month_end: np.ndarray) -> np.ndarray:
+    """(property x month) occupied days, from two prefix-sum lookups per cell"""
+    properties = np.arange(n_properties)[:, None]
+    first = month_start.astype(int)[None, :]
+    last = month_end.astype(int)[None, :]
+    return occupied_days_through(index, properties, last) - occupied_days_through(index, properties, first - 1)
+
+def to_iso(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+@api_router.get("/occupancy/timeline")
+@cached_response("properties", "leases")
+async def get_occupancy_timeline(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    property_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Occupied intervals, occupied days per month, vacancy durations and overlapping leases per property"""
+    today = datetime.now(timezone.utc).date()
+    last_month = parse_month(date_to, today)
+    first_month = parse_month(date_from, date(today.year - 1, today.month, 1) + timedelta(days=31))
+    n_months = (last_month.year - first_month.year) * 12 + last_month.month - first_month.month + 1
+    if n_months < 1:
+        raise HTTPException(status_code=400, detail="Période invalide")
+    if n_months > MAX_ANALYTICS_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Période limitée à {MAX_ANALYTICS_MONTHS} mois")
     
-    months_fr = ["", "Janvier", "Février", "Mars", "Avril", "Mai", "Juin", 
-                 "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
+    query = {"user_id": current_user['id']}
+    if property_id:
+        query["id"] = property_id
+    properties = await db.properties.find(query, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    property_index = {p['id']: i for i, p in enumerate(properties)}
+    leases = await db.leases.find(
+        {"user_id": current_user['id'], "property_id": {"$in": list(property_index)}},
+        {"_id": 0, "id": 1, "property_id": 1, "tenant_id": 1, "start_date": 1, "end_date": 1}
+    ).to_list(None)
+    
+    def compute():
+        months = np.datetime64(first_month, "M") + np.arange(n_months)
+        month_start = months.astype("datetime64[D]")
+        month_end = (months + 1).astype("datetime64[D]") - 1
+        # Open-ended leases run up to the end of the range (or today, for current vacancies)
+        horizon = max(np.datetime64(today, "D"), month_end[-1])
+        index = build_occupancy_index(
+            np.array([property_index[l['property_id']] for l in leases], dtype=int),
+            to_days([l['start_date'] for l in leases]).astype(int),
+            to_days([l.get('end_date') or str(horizon) for l in leases]).astype(int)
+        )
+        occupied = occupied_days_by_month(index, len(properties), month_start, month_end)
+        month_days = (month_end - month_start).astype(int) + 1
+        
+        # Vacancies: gaps between consecutive intervals of a property, and after the last one
+        today_axis = np.datetime64(today, "D").astype(int) - index['base']
+        timelines = [{"intervals": [], "vacancies": [], "conflicts": []} for _ in properties]
+        interval_property = index['property']
+        for i, (start, end) in enumerate(zip(index['start'].tolist(), index['end'].tolist())):
+            p = int(interval_property[i])
+            shift = p * index['offset'] - index['base']
+            timelines[p]["intervals"].append({"start": to_iso(start - shift), "end": to_iso(end - shift)})
+            last = i + 1 == len(interval_property) or interval_property[i + 1] != p
+            if not last:
+                gap_start, gap_end = end + 1, int(index['start'][i + 1]) - 1
+                timelines[p]["vacancies"].append({
+                    "start": to_iso(gap_start - shift), "end": to_iso(gap_end - shift),
+                    "days": gap_end - gap_start + 1, "ongoing": False
+                })
+            elif end - p * index['offset'] < today_axis:
+                timelines[p]["vacancies"].append({
+                    "start": to_iso(end + 1 - shift), "end": None,
+                    "days": int(today_axis - (end - p * index['offset'])), "ongoing": True
+                })
+        for first_lease, second_lease, start, end in index['conflicts']:
+            timelines[property_index[leases[second_lease]['property_id']]]["conflicts"].append({
+                "lease_id": leases[first_lease]['id'],
+                "overlapping_lease_id": leases[second_lease]['id'],
+                "start": to_iso(start),
+                "end": to_iso(end)
+            })
+        return months, occupied, month_days, timelines
     
+    months, occupied, month_days, timelines = await asyncio.to_thread(compute)
     return {
-        "receipt": {
-            "id": payment_id,
-            "landlord_name": user['name'],
-            "tenant_name": f"{tenant['first_name']} {tenant['last_name']}",
-            "property_address": f"{property_doc['address']}, {property_doc['postal_code']} {property_doc['city']}",
-            "property_name": property_doc['name'],
-            "period": f"{months_fr[payment['period_month']]} {payment['period_year']}",
-            "rent_amount": lease['rent_amount'],
-            "charges": lease['charges'],
-            "total_amount": payment['amount'],
-            "payment_date": payment['payment_date'],
-            "payment_method": payment['payment_method']
-        }
+        "date_from": first_month.isoformat()[:7],
+        "date_to": last_month.isoformat()[:7],
+        "months": [str(m) for m in months],
+        "properties": [
+            {
+                "property_id": p['id'],
+                "name": p['name'],
+                "occupied_days": occupied[i].astype(int).tolist(),
+                "occupancy_rate": rounded(occupied[i] / month_days * 100),
+                **timelines[i]
+            }
+            for i, p in enumerate(properties)
+        ],
+        "conflicts_count": sum(len(t["conflicts"]) for t in timelines)
     }
 
-# ==================== EXPORT ROUTES ====================
+# ==================== PORTFOLIO ANALYTICS ====================
 
-@api_router.get("/export/payments")
-async def export_payments(year: int = None, current_user: dict = Depends(get_current_user)):
-    query = {"user_id": current_user['id']}
-    if year:
-        query["period_year"] = year
+MAX_ANALYTICS_MONTHS = 120
+
+def parse_month(value: Optional[str], default: date) -> date:
+    if not value:
+        return default.replace(day=1)
+    try:
+        return datetime.strptime(value[:7], "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Mois invalide (format AAAA-MM)")
+
+def to_days(values: list, default: str = None) -> np.ndarray:
+    """ISO date strings to a datetime64[D] array (parsed in C), missing values replaced by default"""
+    return np.array([value[:10] if value else default for value in values], dtype="datetime64[D]")
+
+def rounded(values, digits: int = 2) -> list:
+    """JSON-ready list (NaN as None); scalars give a one-item list"""
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    return [None if np.isnan(v) else v for v in np.round(values, digits).tolist()]
+
+def safe_divide(numerator, denominator) -> np.ndarray:
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+def compute_portfolio_analytics(properties: list, leases: list, payments: list, first_month: date, n_months: int) -> dict:
+    """Monthly portfolio metrics, computed on (lease x month) and (payment) arrays.
     
-    payments = await db.payments.find(query, {"_id": 0}).to_list(10000)
+    Occupancy is derived from the leases: vacancy records only mirror the gaps between them.
+    """
+    months = np.datetime64(first_month, "M") + np.arange(n_months)
+    month_start = months.astype("datetime64[D]")
+    month_days = ((months + 1).astype("datetime64[D]") - month_start).astype(int)
+    month_end = month_start + (month_days - 1)
+    
+    property_index = {p['id']: i for i, p in enumerate(properties)}
+    leases = [l for l in leases if l['property_id'] in property_index]
+    lease_index = {l['id']: i for i, l in enumerate(leases)}
+    payments = [p for p in payments if p['lease_id'] in lease_index]
+    n_properties = len(properties)
+    
+    # Leases: (L,) columns, then (L, M) matrices
+    lease_property = np.array([property_index[l['property_id']] for l in leases], dtype=int)
+    lease_start = to_days([l['start_date'] for l in leases])
+    lease_end = to_days([l.get('end_date') for l in leases], "9999-12-31")
+    lease_rent = np.array([l['rent_amount'] for l in leases], dtype=float)
+    lease_charges = np.array([l.get('charges', 0) for l in leases], dtype=float)
+    lease_day = np.array([l.get('payment_day') or 1 for l in leases], dtype=int)
+    
+    # Overlapping leases on one property count once
+    index = build_occupancy_index(
+        lease_property, lease_start.astype(int), np.minimum(lease_end, month_end[-1]).astype(int)
+    )
+    occupied = occupied_days_by_month(index, n_properties, month_start, month_end)
+    
+    due_date = month_start[None, :] + (np.minimum(lease_day[:, None], month_days[None, :]) - 1)
+    due_mask = (due_date >= lease_start[:, None]) & (due_date <= lease_end[:, None])
+    expected_by_lease = due_mask * (lease_rent + lease_charges)[:, None]
+    
+    # Payments: (N,) columns indexed into the lease/month matrices
+    payment_lease = np.array([lease_index[p['lease_id']] for p in payments], dtype=int)
+    payment_month = np.array(
+        [p['period_year'] * 12 + p['period_month'] - 1 for p in payments], dtype=int
+    ) - (first_month.year * 12 + first_month.month - 1)
+    in_range = (payment_month >= 0) & (payment_month < n_months)
+    payment_lease, payment_month = payment_lease[in_range], payment_month[in_range]
+    payment_amount = np.array([p['amount'] for p in payments], dtype=float)[in_range]
+    payment_date = to_days([p['payment_date'] for p in payments])[in_range]
+    
+    days_late = np.maximum((payment_date - due_date[payment_lease, payment_month]).astype(int), 0)
+    collected = np.bincount(payment_month, weights=payment_amount, minlength=n_months)
+    paid_count = np.bincount(payment_month, minlength=n_months)
+    late_total = np.bincount(payment_month, weights=days_late, minlength=n_months)
+    expected = expected_by_lease.sum(axis=0)
+    
+    # Per property, over the whole range (rent only: charges are passed through)
+    years = n_months / 12
+    rent_share = safe_divide(lease_rent, lease_rent + lease_charges)
+    rent_share = np.nan_to_num(rent_share, nan=1.0)
+    payment_property = lease_property[payment_lease]
+    expected_rent = np.bincount(lease_property, weights=(due_mask * lease_rent[:, None]).sum(axis=1), minlength=n_properties)
+    collected_rent = np.bincount(payment_property, weights=payment_amount * rent_share[payment_lease], minlength=n_properties)
+    property_expected = np.bincount(lease_property, weights=expected_by_lease.sum(axis=1), minlength=n_properties)
+    property_collected = np.bincount(payment_property, weights=payment_amount, minlength=n_properties)
+    
+    price = np.array([p.get('purchase_price') or np.nan for p in properties], dtype=float)
+    costs = np.array([p.get('annual_costs') or 0 for p in properties], dtype=float)
+    gross_yield = safe_divide(expected_rent / years, price) * 100
+    net_yield = safe_divide(collected_rent / years - costs, price) * 100
+    priced = ~np.isnan(price)
+    
+    total_days = n_properties * month_days.sum()
+    return {
+        "months": [str(m) for m in months],
+        "occupancy_rate": rounded(safe_divide(occupied.sum(axis=0), n_properties * month_days) * 100),
+        "expected": rounded(expected),
+        "collected": rounded(collected),
+        "collection_rate": rounded(safe_divide(collected, expected) * 100),
+        "average_days_late": rounded(safe_divide(late_total, paid_count), 1),
+        "summary": {
+            "occupancy_rate": rounded(safe_divide(occupied.sum(), total_days) * 100)[0] if n_properties else None,
+            "collection_rate": rounded(safe_divide(collected.sum(), expected.sum()) * 100)[0],
+            "average_days_late": rounded(safe_divide(days_late.sum(), len(days_late)), 1)[0],
+            "gross_yield": rounded(safe_divide(expected_rent[priced].sum() / years, price[priced].sum()) * 100)[0],
+            "net_yield": rounded(safe_divide(
+                collected_rent[priced].sum() / years - costs[priced].sum(), price[priced].sum()
+            ) * 100)[0],
+        },
+        "properties": [
+            {
+                "property_id": p['id'],
+                "name": p['name'],
+                "occupancy_rate": occupancy,
+                "expected": expected_total,
+                "collected": collected_total,
+                "gross_yield": gross,
+                "net_yield": net
+            }
+            for p, occupancy, expected_total, collected_total, gross, net in zip(
+                properties,
+                rounded(safe_divide(occupied.sum(axis=1), month_days.sum()) * 100),
+                rounded(property_expected),
+                rounded(property_collected),
+                rounded(gross_yield),
+                rounded(net_yield)
+            )
+        ]
+    }
+
+@api_router.get("/analytics/portfolio")
+@cached_response("properties", "leases", "payments")
+async def get_portfolio_analytics(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Occupancy, collection rate, days late (monthly series) and yields per property.
     
-    # Enrich data
-    export_data = []
-    for payment in payments:
-        lease = await db.leases.find_one({"id": payment['lease_id']}, {"_id": 0})
-        if lease:
-            property_doc = await db.properties.find_one({"id": lease['property_id']}, {"_id": 0})
-            tenant = await db.tenants.find_one({"id": lease['tenant_id']}, {"_id": 0})
-            export_data.append({
-                "date": payment['payment_date'],
-                "bien": property_doc['name'] if property_doc else "",
-                "locataire": f"{tenant['first_name']} {tenant['last_name']}" if tenant else "",
-                "periode": f"{payment['period_month']}/{payment['period_year']}",
-                "montant": payment['amount'],
-                "methode": payment['payment_method']
-            })
+    date_from / date_to are months (YYYY-MM), by default the last 12 months.
+    """
+    user_id = current_user['id']
+    today = datetime.now(timezone.utc).date()
+    last_month = parse_month(date_to, today)
+    first_month = parse_month(date_from, date(today.year - 1, today.month, 1) + timedelta(days=31))
+    n_months = (last_month.year - first_month.year) * 12 + last_month.month - first_month.month + 1
+    if n_months < 1:
+        raise HTTPException(status_code=400, detail="Période invalide")
+    if n_months > MAX_ANALYTICS_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Période limitée à {MAX_ANALYTICS_MONTHS} mois")
+    
+    properties = await db.properties.find(
+        {"user_id": user_id}, {"_id": 0, "id": 1, "name": 1, "purchase_price": 1, "annual_costs": 1}
+    ).to_list(None)
+    leases = await db.leases.find(
+        {"user_id": user_id},
+        {"_id": 0, "id": 1, "property_id": 1, "start_date": 1, "end_date": 1, "rent_amount": 1, "charges": 1, "payment_day": 1}
+    ).to_list(None)
+    payments = await db.payments.find(
+        {"user_id": user_id, "period_year": {"$gte": first_month.year, "$lte": last_month.year}},
+        {"_id": 0, "lease_id": 1, "amount": 1, "payment_date": 1, "period_year": 1, "period_month": 1}
+    ).to_list(None)
     
-    return {"payments": export_data}
+    result = await asyncio.to_thread(compute_portfolio_analytics, properties, leases, payments, first_month, n_months)
+    return {"date_from": first_month.isoformat()[:7], "date_to": last_month.isoformat()[:7], **result}
 
-@api_router.get("/export/payments/excel")
-async def export_payments_excel(year: int = None, current_user: dict = Depends(get_current_user)):
-    """Export payments to Excel file"""
-    query = {"user_id": current_user['id']}
-    if year:
-        query["period_year"] = year
-    
-    payments = await db.payments.find(query, {"_id": 0}).sort("payment_date", -1).to_list(10000)
+# ==================== CASH-FLOW FORECAST ====================
+
+FORECAST_MIN_MONTHS = 12
+FORECAST_MAX_MONTHS = 36
+FORECAST_HISTORY_MONTHS = 24  # Window used to measure punctuality
+FORECAST_DEFAULT_VACANCY_DAYS = 30  # Re-letting delay assumed without any vacancy history
+FORECAST_CACHE_TTL_SECONDS = 86400
+
+def compute_cash_flow_forecast(properties: list, leases: list, payments: list, today: date, n_months: int) -> dict:
+    """Projected monthly income from next month on, simulated on (row x month) arrays.
     
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"Paiements {year if year else 'Tous'}"
+    Rows are the current and future leases (until their end date) plus one re-letting row per
+    property, starting after the property's average historical vacancy. Amounts are weighted by
+    the lease's collection rate and shifted by its average payment delay.
+    """
+    today_day = np.datetime64(today, "D")
+    current_month = np.datetime64(today, "M")
+    months = current_month + 1 + np.arange(n_months)
+    month_start = months.astype("datetime64[D]")
+    month_days = ((months + 1).astype("datetime64[D]") - month_start).astype(int)
+    month_end = month_start + (month_days - 1)
+    
+    property_index = {p['id']: i for i, p in enumerate(properties)}
+    leases = [l for l in leases if l['property_id'] in property_index]
+    lease_index = {l['id']: i for i, l in enumerate(leases)}
+    payments = [p for p in payments if p['lease_id'] in lease_index]
+    n_properties, n_leases = len(properties), len(leases)
+    
+    lease_property = np.array([property_index[l['property_id']] for l in leases], dtype=int)
+    lease_start = to_days([l['start_date'] for l in leases])
+    lease_end = to_days([l.get('end_date') for l in leases], "9999-12-31")
+    lease_amount = np.array([l['rent_amount'] + (l.get('charges') or 0) for l in leases], dtype=float)
+    lease_day = np.array([l.get('payment_day') or 1 for l in leases], dtype=int)
+    
+    # Vacancy history: gaps between past occupied intervals of each property
+    index = build_occupancy_index(lease_property, lease_start.astype(int), np.minimum(lease_end, today_day).astype(int))
+    same_property = index['property'][1:] == index['property'][:-1]
+    gaps = (index['start'][1:] - index['end'][:-1] - 1)[same_property]
+    gap_property = index['property'][1:][same_property]
+    gap_count = np.bincount(gap_property, minlength=n_properties)
+    gap_total = np.bincount(gap_property, weights=gaps, minlength=n_properties)
+    average_vacancy = float(gaps.mean()) if len(gaps) else FORECAST_DEFAULT_VACANCY_DAYS
+    vacancy_days = np.where(gap_count > 0, gap_total / np.maximum(gap_count, 1), average_vacancy)
+    
+    # Punctuality over the history window: share of dues collected and days late per lease
+    history_start = current_month - FORECAST_HISTORY_MONTHS
+    due_from = np.maximum(lease_start.astype("datetime64[M]"), history_start)
+    due_to = np.minimum(lease_end.astype("datetime64[M]"), current_month - 1)
+    due_total = np.clip((due_to - due_from).astype(int) + 1, 0, None) * lease_amount
+    payment_lease = np.array([lease_index[p['lease_id']] for p in payments], dtype=int)
+    payment_period = np.array(
+        [f"{p['period_year']:04d}-{p['period_month']:02d}" for p in payments], dtype="datetime64[M]"
+    )
+    in_window = (payment_period >= history_start) & (payment_period < current_month)
+    payment_lease, payment_period = payment_lease[in_window], payment_period[in_window]
+    payment_amount = np.array([p['amount'] for p in payments], dtype=float)[in_window]
+    period_days = ((payment_period + 1).astype("datetime64[D]") - payment_period.astype("datetime64[D]")).astype(int)
+    payment_due = payment_period.astype("datetime64[D]") + (np.minimum(lease_day[payment_lease], period_days) - 1)
+    days_late = np.clip((to_days([p['payment_date'] for p in payments])[in_window] - payment_due).astype(int), 0, None)
+    
+    paid_total = np.bincount(payment_lease, weights=payment_amount, minlength=n_leases)
+    paid_count = np.bincount(payment_lease, minlength=n_leases)
+    late_total = np.bincount(payment_lease, weights=days_late, minlength=n_leases)
+    portfolio_collection = float(np.clip(safe_divide(paid_total.sum(), due_total.sum()), 0, 1)[()])
+    portfolio_collection = 1.0 if np.isnan(portfolio_collection) else portfolio_collection
+    portfolio_delay = float(days_late.mean()) if len(days_late) else 0.0
+    lease_collection = np.where(due_total > 0, np.clip(safe_divide(paid_total, due_total), 0, 1), portfolio_collection)
+    lease_delay = np.where(paid_count > 0, safe_divide(late_total, paid_count), portfolio_delay)
+    
+    # Re-letting: after the last lease of the property ends (or now, if vacant), plus the average vacancy
+    last_end = np.full(n_properties, today_day - 1)
+    np.maximum.at(last_end, lease_property, lease_end)
+    open_ended = last_end == np.datetime64("9999-12-31")
+    relet_start = np.maximum(
+        last_end + np.round(vacancy_days).astype(int), np.where(last_end < today_day, today_day, last_end)
+    ) + 1
+    relet_start = np.where(open_ended, np.datetime64("9999-12-31"), relet_start)
+    
+    # Rows: leases still running after today, then one re-letting row per property
+    future = lease_end > today_day
+    row_property = np.concatenate((lease_property[future], np.arange(n_properties)))
+    row_start = np.concatenate((lease_start[future], relet_start))
+    row_end = np.concatenate((lease_end[future], np.full(n_properties, np.datetime64("9999-12-31"))))
+    row_amount = np.concatenate((
+        lease_amount[future],
+        np.array([p.get('rent_amount', 0) + (p.get('charges') or 0) for p in properties], dtype=float)
+    ))
+    row_day = np.concatenate((lease_day[future], np.ones(n_properties, dtype=int)))
+    row_collection = np.concatenate((lease_collection[future], np.full(n_properties, portfolio_collection)))
+    row_delay = np.concatenate((lease_delay[future], np.full(n_properties, portfolio_delay)))
+    is_relet = np.arange(len(row_property)) >= future.sum()
+    
+    # Dues pro rata of the days let in each month, cashed after the row's average delay
+    overlap = (np.minimum(row_end[:, None], month_end[None, :]) -
+               np.maximum(row_start[:, None], month_start[None, :])).astype(int) + 1
+    due = np.clip(overlap, 0, None) / month_days[None, :] * row_amount[:, None]
+    due_date = month_start[None, :] + (np.minimum(row_day[:, None], month_days[None, :]) - 1)
+    cash_month = ((due_date + np.round(row_delay).astype(int)[:, None]).astype("datetime64[M]") - months[0]).astype(int)
+    cash = due * row_collection[:, None]
+    kept = cash_month < n_months
+    
+    def by_property_month(rows: np.ndarray) -> np.ndarray:
+        mask = kept & rows[:, None]
+        cells = (row_property[:, None] * n_months + cash_month)[mask]
+        return np.bincount(cells, weights=cash[mask], minlength=n_properties * n_months).reshape(n_properties, n_months)
+    
+    relet = by_property_month(is_relet)
+    expected = relet + by_property_month(~is_relet)
+    contractual = np.bincount(
+        np.broadcast_to(np.arange(n_months), due.shape)[~is_relet].ravel(),
+        weights=due[~is_relet].ravel(), minlength=n_months
+    )
     
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="064E3B", end_color="064E3B", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+    return {
+        "months": [str(m) for m in months],
+        "expected": rounded(expected.sum(axis=0)),
+        "contractual": rounded(contractual),
+        "relet": rounded(relet.sum(axis=0)),
+        "total_expected": rounded(expected.sum())[0],
+        "assumptions": {
+            "average_vacancy_days": rounded(average_vacancy, 1)[0],
+            "collection_rate": rounded(portfolio_collection * 100)[0],
+            "average_days_late": rounded(portfolio_delay, 1)[0]
+        },
+        "properties": [
+            {
+                "property_id": p['id'],
+                "name": p['name'],
+                "expected": rounded(expected[i]),
+                "relet_date": None if open_ended[i] else str(relet_start[i]),
+                "vacancy_days": rounded(vacancy_days[i], 1)[0]
+            }
+            for i, p in enumerate(properties)
+        ]
+    }
+
+async def invalidate_forecast(user_id: str):
+    """Bump the user's forecast generation: cached forecasts computed before are ignored"""
+    await db.forecast_cache.update_one(
+        {"user_id": user_id, "key": "generation"}, {"$inc": {"generation": 1}}, upsert=True
+    )
+
+async def ensure_forecast_cache_indexes():
+    await db.forecast_cache.create_index([("user_id", 1), ("key", 1)], unique=True)
+    # The generation document has no created_at and never expires
+    await db.forecast_cache.create_index("created_at", expireAfterSeconds=FORECAST_CACHE_TTL_SECONDS)
+
+@api_router.get("/analytics/forecast")
+async def get_cash_flow_forecast(months: int = 12, current_user: dict = Depends(get_current_user)):
+    """Projected monthly income for the next 12 to 36 months, cached until leases or payments change"""
+    if not FORECAST_MIN_MONTHS <= months <= FORECAST_MAX_MONTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"L'horizon de prévision doit être compris entre {FORECAST_MIN_MONTHS} et {FORECAST_MAX_MONTHS} mois"
+        )
+    user_id = current_user['id']
+    today = datetime.now(timezone.utc).date()
+    key = f"{today.isoformat()}|{months}"
+    
+    cached = await db.forecast_cache.find(
+        {"user_id": user_id, "key": {"$in": [key, "generation"]}}, {"_id": 0}
+    ).to_list(2)
+    entries = {entry['key']: entry for entry in cached}
+    generation = entries.get("generation", {}).get("generation", 0)
+    if key in entries and entries[key]['generation'] == generation:
+        return {**entries[key]['forecast'], "cached": True}
+    
+    properties = await db.properties.find(
+        {"user_id": user_id}, {"_id": 0, "id": 1, "name": 1, "rent_amount": 1, "charges": 1}
+    ).to_list(None)
+    leases = await db.leases.find(
+        {"user_id": user_id},
+        {"_id": 0, "id": 1, "property_id": 1, "start_date": 1, "end_date": 1, "rent_amount": 1, "charges": 1, "payment_day": 1}
+    ).to_list(None)
+    history_year = today.year - FORECAST_HISTORY_MONTHS // 12 - 1
+    payments = await db.payments.find(
+        {"user_id": user_id, "period_year": {"$gte": history_year}},
+        {"_id": 0, "lease_id": 1, "amount": 1, "payment_date": 1, "period_year": 1, "period_month": 1}
+    ).to_list(None)
+    
+    forecast = await asyncio.to_thread(compute_cash_flow_forecast, properties, leases, payments, today, months)
+    # Stored with the generation read above: a change made meanwhile makes it stale at once
+    await db.forecast_cache.update_one(
+        {"user_id": user_id, "key": key},
+        {"$set": {"generation": generation, "forecast": forecast, "created_at": datetime.now(timezone.utc)}},
+        upsert=True
     )
+    return {**forecast, "cached": False}
+
+# ==================== RECEIPT (QUITTANCE) GENERATION ====================
+
+MONTHS_FR = ["", "Janvier", "Février", "Mars", "Avril", "Mai", "Juin",
+             "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
+
+PAYMENT_METHODS_FR = {"virement": "Virement", "cheque": "Chèque", "especes": "Espèces", "cb": "Carte bancaire"}
+
+def build_receipt(payment: dict, lease: dict, property_doc: dict, tenant: dict, landlord_name: str) -> dict:
+    return {
+        "id": payment['id'],
+        "landlord_name": landlord_name,
+        "tenant_name": f"{tenant['first_name']} {tenant['last_name']}",
+        "property_address": f"{property_doc['address']}, {property_doc['postal_code']} {property_doc['city']}",
+        "property_name": property_doc['name'],
+        "period": f"{MONTHS_FR[payment['period_month']]} {payment['period_year']}",
+        "rent_amount": lease['rent_amount'],
+        "charges": lease['charges'],
+        "total_amount": payment['amount'],
+        "payment_date": payment['payment_date'],
+        "payment_method": payment['payment_method']
+    }
+
+@functools.lru_cache(maxsize=1)
+def get_receipt_fonts() -> tuple:
+    """(regular, bold) font names, registered once per worker process.
     
-    # Headers
-    headers = ["Date", "Bien", "Locataire", "Période", "Montant (€)", "Méthode de paiement"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-        cell.border = border
+    Built-in Helvetica needs no loading; RECEIPT_FONT_PATH / RECEIPT_FONT_BOLD_PATH
+    allow a TrueType font instead.
+    """
+    font_path = os.environ.get('RECEIPT_FONT_PATH')
+    bold_path = os.environ.get('RECEIPT_FONT_BOLD_PATH')
+    if not font_path:
+        return "Helvetica", "Helvetica-Bold"
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    pdfmetrics.registerFont(TTFont("ReceiptFont", font_path))
+    pdfmetrics.registerFont(TTFont("ReceiptFont-Bold", bold_path or font_path))
+    return "ReceiptFont", "ReceiptFont-Bold"
+
+def format_euros(amount: float) -> str:
+    return f"{amount:,.2f} €".replace(",", " ").replace(".", ",")
+
+def render_receipt_pdf(receipt: dict) -> bytes:
+    """Render one quittance as PDF (runs in the process pool)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.colors import HexColor
+    from reportlab.pdfgen import canvas
+    
+    regular, bold = get_receipt_fonts()
+    primary = HexColor("#064E3B")
+    muted = HexColor("#78716C")
+    width, height = A4
+    left, right = 60, width - 60
     
-    # Data rows
-    total_amount = 0
-    row = 2
+    output = io.BytesIO()
+    pdf = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    pdf.setTitle(f"Quittance de loyer - {receipt['period']}")
+    pdf.setAuthor(receipt['landlord_name'])
+    
+    pdf.setFillColor(primary)
+    pdf.setFont(bold, 22)
+    pdf.drawCentredString(width / 2, height - 80, "QUITTANCE DE LOYER")
+    pdf.setFont(regular, 12)
+    pdf.setFillColor(muted)
+    pdf.drawCentredString(width / 2, height - 102, f"Période : {receipt['period']}")
+    
+    y = height - 150
+    for title, lines in (
+        ("Bailleur", [receipt['landlord_name']]),
+        ("Locataire", [receipt['tenant_name']]),
+        ("Bien loué", [receipt['property_name'], receipt['property_address']]),
+    ):
+        pdf.setFillColor(primary)
+        pdf.setFont(bold, 12)
+        pdf.drawString(left, y, title)
+        pdf.setStrokeColor(HexColor("#E7E5E4"))
+        pdf.line(left, y - 5, right, y - 5)
+        pdf.setFillColor(HexColor("#000000"))
+        pdf.setFont(regular, 11)
+        for line in lines:
+            y -= 20
+            pdf.drawString(left, y, line)
+        y -= 35
+    
+    pdf.setFillColor(primary)
+    pdf.setFont(bold, 12)
+    pdf.drawString(left, y, "Détail du paiement")
+    pdf.line(left, y - 5, right, y - 5)
+    pdf.setFillColor(HexColor("#000000"))
+    pdf.setFont(regular, 11)
+    for label, value in (
+        ("Loyer", format_euros(receipt['rent_amount'])),
+        ("Charges", format_euros(receipt['charges'])),
+        ("Date de paiement", receipt['payment_date'][:10]),
+        ("Mode de paiement", PAYMENT_METHODS_FR.get(receipt['payment_method'], receipt['payment_method'])),
+    ):
+        y -= 20
+        pdf.drawString(left, y, label)
+        pdf.drawRightString(right, y, value)
+    
+    y -= 50
+    pdf.setFillColor(HexColor("#F5F5F4"))
+    pdf.roundRect(left, y - 15, right - left, 45, 8, stroke=0, fill=1)
+    pdf.setFillColor(primary)
+    pdf.setFont(bold, 16)
+    pdf.drawCentredString(width / 2, y + 2, f"Total reçu : {format_euros(receipt['total_amount'])}")
+    
+    y -= 60
+    pdf.setFillColor(HexColor("#000000"))
+    text = pdf.beginText(left, y)
+    text.setFont(regular, 10)
+    text.setLeading(14)
+    for line in (
+        f"Je soussigné(e) {receipt['landlord_name']}, bailleur du logement désigné ci-dessus, déclare avoir reçu",
+        f"de {receipt['tenant_name']} la somme de {format_euros(receipt['total_amount'])} au titre du loyer et des charges",
+        f"pour la période de {receipt['period']}, et lui en donne quittance, sous réserve de tous mes droits.",
+    ):
+        text.textLine(line)
+    pdf.drawText(text)
+    
+    y -= 90
+    pdf.setFont(regular, 11)
+    pdf.drawString(left, y, "Fait à ________________, le ________________")
+    pdf.drawString(left, y - 25, "Signature du bailleur :")
+    
+    pdf.setFillColor(muted)
+    pdf.setFont(regular, 8)
+    pdf.drawCentredString(
+        width / 2, 50,
+        "Cette quittance annule tous les reçus qui auraient pu être établis précédemment en cas de paiement partiel."
+    )
+    
+    pdf.showPage()
+    pdf.save()
+    return output.getvalue()
+
+def render_receipt_pdfs(receipts: list) -> list:
+    """Render a batch of quittances in one worker call (amortises inter-process overhead)"""
+    return [render_receipt_pdf(receipt) for receipt in receipts]
+
+# Bump when the quittance layout changes so cached renders are rebuilt
+RECEIPT_TEMPLATE_VERSION = 1
+
+def hash_receipt(receipt: dict) -> str:
+    payload = json.dumps(receipt, sort_keys=True, default=str)
+    return hashlib.sha256(f"{RECEIPT_TEMPLATE_VERSION}:{payload}".encode()).hexdigest()
+
+def get_receipt_pdf_path(entry: dict) -> Path:
+    return RECEIPTS_DIR / f"{entry['payment_id']}_{entry['content_hash'][:16]}.pdf"
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for this header)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+async def get_receipt_entry(payment_id: str, current_user: dict) -> dict:
+    """Cached receipt of a payment, built from its lease, property and tenant on a miss.
+    
+    A miss claims the cache entry (build_id) before reading the inputs it is built from. An
+    invalidation landing meanwhile deletes the claim, so the conditional write of the receipt
+    fails: the receipt is served to this request but never cached stale.
+    """
+    entry = await db.receipt_cache.find_one({"payment_id": payment_id, "user_id": current_user['id']}, {"_id": 0})
+    if entry and entry.get('receipt'):
+        return entry
+    
+    payment = await db.payments.find_one({"id": payment_id, "user_id": current_user['id']}, {"_id": 0, "lease_id": 1})
+    if not payment:
+        raise HTTPException(status_code=404, detail="Paiement non trouvé")
+    
+    lease = await db.leases.find_one({"id": payment['lease_id']}, {"_id": 0, "id": 1, "property_id": 1, "tenant_id": 1})
+    if not lease:
+        raise HTTPException(status_code=404, detail="Bail non trouvé")
+    
+    # The claim carries the ids invalidate_receipts matches on
+    entry = {
+        "payment_id": payment_id,
+        "user_id": current_user['id'],
+        "lease_id": lease['id'],
+        "property_id": lease['property_id'],
+        "tenant_id": lease['tenant_id'],
+        "build_id": str(uuid.uuid4()),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.receipt_cache.replace_one({"payment_id": payment_id}, entry, upsert=True)
+    
+    payment, lease, property_doc, tenant = await asyncio.gather(
+        db.payments.find_one({"id": payment_id, "user_id": current_user['id']}, {"_id": 0}),
+        db.leases.find_one({"id": lease['id']}, {"_id": 0}),
+        db.properties.find_one({"id": lease['property_id']}, {"_id": 0}),
+        db.tenants.find_one({"id": lease['tenant_id']}, {"_id": 0})
+    )
+    if not payment or not lease:
+        raise HTTPException(status_code=404, detail="Paiement non trouvé")
+    
+    # current_user already holds the landlord, no need to fetch it again
+    receipt = build_receipt(payment, lease, property_doc, tenant, current_user['name'])
+    content_hash = hash_receipt(receipt)
+    await db.receipt_cache.update_one(
+        {"payment_id": payment_id, "build_id": entry['build_id']},
+        {"$set": {"content_hash": content_hash, "receipt": receipt}, "$unset": {"build_id": ""}}
+    )
+    del entry['build_id']
+    return {**entry, "content_hash": content_hash, "receipt": receipt}
+
+async def invalidate_receipts(query: dict):
+    """Drop cached receipts (and their PDFs) whose inputs changed, and claims of receipts being built"""
+    entries = await db.receipt_cache.find(query, {"_id": 0, "payment_id": 1, "content_hash": 1}).to_list(None)
+    if not entries:
+        return
+    for entry in entries:
+        if entry.get('content_hash'):
+            get_receipt_pdf_path(entry).unlink(missing_ok=True)
+    await db.receipt_cache.delete_many(query)
+
+async def ensure_receipt_cache_indexes():
+    await db.receipt_cache.create_index("payment_id", unique=True)
+    for field in ("lease_id", "property_id", "tenant_id"):
+        await db.receipt_cache.create_index([("user_id", 1), (field, 1)])
+
+def get_receipt_filename(receipt: dict) -> str:
+    name = f"quittance_{receipt['period']}_{receipt['tenant_name']}".replace(" ", "_").replace("/", "-")
+    return f"{name}_{receipt['id'][:8]}.pdf"
+
+@api_router.get("/receipts/batch")
+async def generate_receipts_batch(month: int, year: int, current_user: dict = Depends(get_current_user)):
+    """Every quittance of a month as PDFs in a streamed ZIP, rendered in the process pool"""
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="Mois invalide")
+    
+    user_id = current_user['id']
+    payments = await db.payments.find(
+        {"user_id": user_id, "period_month": month, "period_year": year}, {"_id": 0}
+    ).to_list(None)
+    if not payments:
+        raise HTTPException(status_code=404, detail="Aucun paiement pour cette période")
+    
+    # Related documents in one query per collection
+    leases = await db.leases.find(
+        {"user_id": user_id, "id": {"$in": list({p['lease_id'] for p in payments})}}, {"_id": 0}
+    ).to_list(None)
+    leases = {lease['id']: lease for lease in leases}
+    properties = await db.properties.find(
+        {"id": {"$in": list({l['property_id'] for l in leases.values()})}}, {"_id": 0}
+    ).to_list(None)
+    properties = {p['id']: p for p in properties}
+    tenants = await db.tenants.find(
+        {"id": {"$in": list({l['tenant_id'] for l in leases.values()})}}, {"_id": 0}
+    ).to_list(None)
+    tenants = {t['id']: t for t in tenants}
+    
+    receipts = []
     for payment in payments:
-        lease = await db.leases.find_one({"id": payment['lease_id']}, {"_id": 0})
-        if lease:
-            property_doc = await db.properties.find_one({"id": lease['property_id']}, {"_id": 0})
-            tenant = await db.tenants.find_one({"id": lease['tenant_id']}, {"_id": 0})
-            
-            months_fr = ["", "Janvier", "Février", "Mars", "Avril", "Mai", "Juin", 
-                        "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
-            
-            data = [
-                payment['payment_date'],
-                property_doc['name'] if property_doc else "",
-                f"{tenant['first_name']} {tenant['last_name']}" if tenant else "",
-                f"{months_fr[payment['period_month']]} {payment['period_year']}",
-                payment['amount'],
-                payment['payment_method']
-            ]
-            
-            for col, value in enumerate(data, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.border = border
-                if col == 5:  # Amount column
-                    cell.number_format = '#,##0.00 €'
-                    total_amount += value
-            row += 1
+        lease = leases.get(payment['lease_id'])
+        if lease and lease['property_id'] in properties and lease['tenant_id'] in tenants:
+            receipts.append(build_receipt(
+                payment, lease, properties[lease['property_id']], tenants[lease['tenant_id']], current_user['name']
+            ))
+    
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    batches = [receipts[i:i + RECEIPT_BATCH_SIZE] for i in range(0, len(receipts), RECEIPT_BATCH_SIZE)]
+    
+    async def stream_zip():
+        futures = [loop.run_in_executor(pool, render_receipt_pdfs, batch) for batch in batches]
+        sink = ZipStreamBuffer()
+        with zipfile.ZipFile(sink, mode="w") as archive:
+            # PDFs are already compressed: stored as-is
+            for batch, future in zip(batches, futures):
+                for receipt, content in zip(batch, await future):
+                    archive.writestr(get_receipt_filename(receipt), content, compress_type=zipfile.ZIP_STORED)
+                yield sink.drain()
+        yield sink.drain()
+    
+    filename = f"quittances_{year}_{month:02d}.zip"
+    return StreamingResponse(
+        stream_zip(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@api_router.get("/receipts/{payment_id}")
+async def generate_receipt(
+    payment_id: str,
+    request: Request,
+    format: str = "json",
+    current_user: dict = Depends(get_current_user)
+):
+    """Quittance as JSON or PDF, served from the receipt cache with a strong ETag"""
+    entry = await get_receipt_entry(payment_id, current_user)
+    receipt = entry['receipt']
+    etag = f'"{entry["content_hash"]}-{"pdf" if format == "pdf" else "json"}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    if format == "pdf":
+        headers["Content-Disposition"] = f"attachment; filename={get_receipt_filename(receipt)}"
+        pdf_path = get_receipt_pdf_path(entry)
+        if pdf_path.exists():
+            return FileResponse(pdf_path, media_type="application/pdf", headers=headers)
+        
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(get_process_pool(), render_receipt_pdf, receipt)
+        tmp_path = pdf_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        await asyncio.to_thread(tmp_path.write_bytes, content)
+        os.replace(tmp_path, pdf_path)
+        return Response(content, media_type="application/pdf", headers=headers)
+    
+    return JSONResponse({"receipt": receipt}, headers=headers)
+
+# ==================== EXPORT ROUTES ====================
+
+@api_router.get("/export/payments")
+async def export_payments(year: int = None, current_user: dict = Depends(get_current_user)):
+    query = {"user_id": current_user['id']}
+    if year:
+        query["period_year"] = year
+    
+    payments = await db.payments.find(query, {"_id": 0}).to_list(10000)
+    
+    export_data = [{
+        "date": payment['payment_date'],
+        "bien": payment.get('property_name') or "",
+        "locataire": payment.get('tenant_name') or "",
+        "periode": f"{payment['period_month']}/{payment['period_year']}",
+        "montant": payment['amount'],
+        "methode": payment['payment_method']
+    } for payment in payments]
+    
+    return {"payments": export_data}
+
+@api_router.get("/export/payments/excel")
+async def export_payments_excel(year: int = None, current_user: dict = Depends(get_current_user)):
+    """Export payments to Excel file"""
+    query = {"user_id": current_user['id']}
+    if year:
+        query["period_year"] = year
+    
+    payments = await db.payments.find(query, {"_id": 0}).sort("payment_date", -1).to_list(10000)
+    
+    # Create Excel workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.title = f"Paiements {year if year else 'Tous'}"
+    
+    # Styles
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="064E3B", end_color="064E3B", fill_type="solid")
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    
+    # Headers
+    headers = ["Date", "Bien", "Locataire", "Période", "Montant (€)", "Méthode de paiement"]
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal="center")
+        cell.border = border
+    
+    # Data rows
+    months_fr = ["", "Janvier", "Février", "Mars", "Avril", "Mai", "Juin", 
+                "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
+    total_amount = 0
+    row = 2
+    for payment in payments:
+        data = [
+            payment['payment_date'],
+            payment.get('property_name') or "",
+            payment.get('tenant_name') or "",
+            f"{months_fr[payment['period_month']]} {payment['period_year']}",
+            payment['amount'],
+            payment['payment_method']
+        ]
+        
+        for col, value in enumerate(data, 1):
+            cell = ws.cell(row=row, column=col, value=value)
+            cell.border = border
+            if col == 5:  # Amount column
+                cell.number_format = '#,##0.00 €'
+                total_amount += value
+        row += 1
     
     # Total row
     ws.cell(row=row + 1, column=4, value="TOTAL").font = Font(bold=True)
@@ -1022,6 +2795,671 @@ async def export_payments_excel(year: int = None, current_user: dict = Depends(g
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+# ==================== PORTFOLIO IMPORT ====================
+
+# Sheet names (lowercase) accepted for each entity in an XLSX workbook, in import order:
+# leases reference the properties and tenants imported before them
+IMPORT_SHEETS = {
+    "properties": ("biens", "properties"),
+    "tenants": ("locataires", "tenants"),
+    "leases": ("baux", "leases"),
+}
+IMPORT_ENTITY_NAMES = {"properties": ("property", "bien(s)"), "tenants": ("tenant", "locataire(s)"), "leases": ("lease", "bail/baux")}
+
+def normalize_import_value(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+    return value
+
+def chunk_import_rows(entity_type: str, rows) -> list:
+    """Group (header row + data rows) into chunks of (row number, dict)"""
+    header = [str(cell).strip().lower() if cell is not None else None for cell in next(rows, ())]
+    chunk = []
+    for number, values in enumerate(rows, start=2):
+        row = {}
+        for key, value in zip(header, values):
+            value = normalize_import_value(value)
+            if key and value not in (None, ""):
+                row[key] = value
+        if row:
+            chunk.append((number, row))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            yield entity_type, chunk
+            chunk = []
+    if chunk:
+        yield entity_type, chunk
+
+def sniff_csv_dialect(sample: str):
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        # Irregular files (e.g. bank exports with a preamble): most frequent separator wins
+        class Dialect(csv.excel):
+            delimiter = max(";\t,", key=sample.count)
+        return Dialect
+
+def read_import_chunks(path: Path, entity_type: Optional[str]):
+    """Stream a CSV (single entity) or XLSX (one sheet per entity) file as row chunks"""
+    if path.suffix == ".xlsx":
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheets = {name.strip().lower(): workbook[name] for name in workbook.sheetnames}
+            if not any(alias in sheets for aliases in IMPORT_SHEETS.values() for alias in aliases):
+                expected = ", ".join(" / ".join(aliases) for aliases in IMPORT_SHEETS.values())
+                raise ValueError(f"Aucune feuille reconnue dans le classeur (feuilles attendues : {expected})")
+            for sheet_entity, aliases in IMPORT_SHEETS.items():
+                sheet = next((sheets[alias] for alias in aliases if alias in sheets), None)
+                if sheet is not None:
+                    yield from chunk_import_rows(sheet_entity, sheet.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+        return
+    
+    # Spreadsheet CSV exports are often cp1252 and ';'-separated
+    with open(path, "rb") as f:
+        sample = f.read(64 * 1024)
+    try:
+        sample.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError as e:
+        encoding = "utf-8-sig" if e.start > len(sample) - 4 else "cp1252"
+    with open(path, newline="", encoding=encoding) as f:
+        dialect = sniff_csv_dialect(f.read(8192))
+        f.seek(0)
+        yield from chunk_import_rows(entity_type, csv.reader(f, dialect))
+
+def coerce_import_row(model, row: dict) -> dict:
+    """Cells come back as numbers even for text fields (postal codes, phones)"""
+    for field, info in model.model_fields.items():
+        if field in row and info.annotation in (str, Optional[str], EmailStr) and not isinstance(row[field], str):
+            row[field] = str(row[field])
+    return row
+
+def validate_import_chunk(model, entity_type: str, chunk: list, errors: list) -> list:
+    valid = []
+    for number, row in chunk:
+        ref = row.pop("ref", None)
+        try:
+            valid.append((number, ref, model.model_validate(coerce_import_row(model, row))))
+        except ValidationError as e:
+            errors.append({"sheet": entity_type, "row": number, "error": "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+            )})
+    return valid
+
+async def resolve_import_refs(collection, user_id: str, keys: set, refs: dict, natural_key: str) -> dict:
+    """Map references to ids: refs of this import first, then existing ids or natural keys"""
+    resolved = {key: refs[key] for key in keys if key in refs}
+    missing = [key for key in keys if key not in resolved]
+    if missing:
+        existing = await collection.find(
+            {"user_id": user_id, "$or": [{"id": {"$in": missing}}, {natural_key: {"$in": missing}}]},
+            {"_id": 0, "id": 1, natural_key: 1}
+        ).to_list(None)
+        for doc in existing:
+            for key in (doc['id'], doc.get(natural_key)):
+                if key in missing:
+                    resolved[key] = doc['id']
+    return resolved
+
+async def import_entity_chunk(entity_type: str, chunk: list, refs: dict, user_id: str, errors: list) -> int:
+    """Validate and insert one chunk, returning the number of created documents"""
+    now = datetime.now(timezone.utc).isoformat()
+    
+    if entity_type == "leases":
+        # Cross-sheet references: property_ref / tenant_ref, or existing id, property name, tenant email
+        property_keys = {str(row.get("property_ref", row.get("property_id", ""))) for _, row in chunk}
+        tenant_keys = {str(row.get("tenant_ref", row.get("tenant_id", ""))) for _, row in chunk}
+        properties = await resolve_import_refs(db.properties, user_id, property_keys, refs["properties"], "name")
+        tenants = await resolve_import_refs(db.tenants, user_id, tenant_keys, refs["tenants"], "email")
+        resolved_chunk = []
+        for number, row in chunk:
+            property_key = str(row.pop("property_ref", row.get("property_id", "")))
+            tenant_key = str(row.pop("tenant_ref", row.get("tenant_id", "")))
+            if property_key not in properties:
+                errors.append({"sheet": entity_type, "row": number, "error": f"Bien non trouvé : {property_key}"})
+            elif tenant_key not in tenants:
+                errors.append({"sheet": entity_type, "row": number, "error": f"Locataire non trouvé : {tenant_key}"})
+            else:
+                resolved_chunk.append((number, {**row, "property_id": properties[property_key], "tenant_id": tenants[tenant_key]}))
+        chunk = resolved_chunk
+    
+    model = {"properties": PropertyCreate, "tenants": TenantCreate, "leases": LeaseCreate}[entity_type]
+    extra = {
+        "properties": {"is_occupied": False, "current_tenant_id": None},
+        "tenants": {"current_property_id": None},
+        "leases": {"is_active": True},
+    }[entity_type]
+    
+    docs = []
+    for number, ref, item in validate_import_chunk(model, entity_type, chunk, errors):
+        doc = {**item.model_dump(), **extra, "id": str(uuid.uuid4()), "user_id": user_id, "created_at": now}
+        if ref is not None and entity_type in refs:
+            refs[entity_type][str(ref)] = doc['id']
+        docs.append(doc)
+    if not docs:
+        return 0
+    if entity_type == "leases":
+        display_fields = await load_lease_display_fields(docs)
+        for doc in docs:
+            doc.update(display_fields[doc['id']])
+    
+    await getattr(db, entity_type).insert_many(docs, ordered=False)
+    
+    if entity_type == "leases":
+        # Same side effects as create_lease, in one round trip per collection
+        today = datetime.now(timezone.utc).date().isoformat()
+        current = [lease for lease in docs if not lease.get('end_date') or lease['end_date'] >= today]
+        if current:
+            await db.properties.bulk_write([
+                UpdateOne({"id": lease['property_id']}, {"$set": {"is_occupied": True, "current_tenant_id": lease['tenant_id']}})
+                for lease in current
+            ], ordered=False)
+            await db.tenants.bulk_write([
+                UpdateOne({"id": lease['tenant_id']}, {"$set": {"current_property_id": lease['property_id']}})
+                for lease in current
+            ], ordered=False)
+            await db.vacancies.update_many(
+                {"property_id": {"$in": [lease['property_id'] for lease in current]}, "is_active": True},
+                {"$set": {"is_active": False, "end_date": today}}
+            )
+    return len(docs)
+
+async def run_import_job(job_id: str, path: Path, entity_type: Optional[str], user: dict):
+    """Background task streaming the file chunk by chunk into the collections"""
+    chunks = read_import_chunks(path, entity_type)
+    refs = {"properties": {}, "tenants": {}}
+    created = {}
+    await db.import_jobs.update_one({"id": job_id}, {"$set": {"status": "running"}})
+    try:
+        while True:
+            # openpyxl / csv parsing is blocking: each chunk is read in a thread
+            item = await asyncio.to_thread(next, chunks, None)
+            if item is None:
+                break
+            chunk_entity, chunk = item
+            errors = []
+            count = await import_entity_chunk(chunk_entity, chunk, refs, user['id'], errors)
+            created[chunk_entity] = created.get(chunk_entity, 0) + count
+            await db.import_jobs.update_one({"id": job_id}, {
+                "$inc": {
+                    "processed_rows": len(chunk),
+                    f"counts.{chunk_entity}.rows": len(chunk),
+                    f"counts.{chunk_entity}.created": count,
+                    f"counts.{chunk_entity}.errors": len(errors),
+                },
+                "$push": {"errors": {"$each": errors, "$slice": IMPORT_MAX_ERRORS}},
+                "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+            })
+        status_update = {"status": "completed"}
+    except Exception as e:
+        logger.exception(f"Import {job_id} failed")
+        status_update = {"status": "failed", "error": str(e)}
+    finally:
+        await asyncio.to_thread(chunks.close)
+        path.unlink(missing_ok=True)
+    
+    status_update["finished_at"] = datetime.now(timezone.utc).isoformat()
+    await db.import_jobs.update_one({"id": job_id}, {"$set": status_update})
+    if created.get("leases"):
+        await sync_ledgers(user['id'])
+    if any(created.values()):
+        # Lease imports also update their properties, tenants and vacancies
+        tags = {entity for entity, count in created.items() if count}
+        if "leases" in tags:
+            tags |= {"properties", "tenants", "vacancies"}
+        await mark_changed(user['id'], *tags)
+    
+    # One audit entry per imported entity type
+    for chunk_entity, count in created.items():
+        if count:
+            audit_type, label = IMPORT_ENTITY_NAMES[chunk_entity]
+            await create_audit_log(
+                user_id=user['id'],
+                user_name=user['name'],
+                action="create",
+                entity_type=audit_type,
+                entity_id=job_id,
+                entity_name=f"Import de {count} {label}",
+                changes={"count": {"old": None, "new": count}}
+            )
+
+@api_router.post("/imports", response_model=dict)
+async def create_import(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    entity_type: str = Form(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Import properties, tenants and leases from an XLSX workbook (one sheet each) or a CSV file"""
+    suffix = Path(file.filename or "").suffix.lower()
+    if suffix not in (".csv", ".xlsx"):
+        raise HTTPException(status_code=400, detail="Format non supporté (CSV ou XLSX)")
+    if suffix == ".csv" and entity_type not in IMPORT_SHEETS:
+        raise HTTPException(status_code=400, detail="Type d'import requis pour un CSV (properties, tenants ou leases)")
+    
+    job = ImportJob(user_id=current_user['id'], filename=file.filename, entity_type=entity_type)
+    path = PARTIAL_UPLOADS_DIR / f"import_{job.id}{suffix}"
+    size = 0
+    with open(path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_IMPORT_SIZE:
+                f.close()
+                path.unlink(missing_ok=True)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Fichier trop volumineux (max {MAX_IMPORT_SIZE // (1024 * 1024)}MB)"
+                )
+            f.write(chunk)
+    
+    job_dict = job.model_dump()
+    job_dict['created_at'] = job_dict['created_at'].isoformat()
+    await db.import_jobs.insert_one(job_dict)
+    background_tasks.add_task(run_import_job, job.id, path, entity_type, current_user)
+    
+    return {"id": job.id, "status": job.status, "message": "Import démarré"}
+
+@api_router.get("/imports/{job_id}", response_model=dict)
+async def get_import_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Progress and per-row errors of an import"""
+    job = await db.import_jobs.find_one({"id": job_id, "user_id": current_user['id']}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import non trouvé")
+    return job
+
+# ==================== BANK RECONCILIATION ====================
+
+def normalize_label(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().upper()
+    return re.sub(r"[^A-Z0-9]+", " ", text).strip()
+
+def parse_statement_amount(value: str) -> Optional[float]:
+    """'1 234,56', '1,234.56', '-850.00' or '850,00 EUR' to float"""
+    value = re.sub(r"[^\d,.\-+]", "", value or "")
+    if not value:
+        return None
+    if "," in value and "." in value:
+        # The last separator is the decimal one
+        value = value.replace(".", "").replace(",", ".") if value.rfind(",") > value.rfind(".") else value.replace(",", "")
+    else:
+        value = value.replace(",", ".")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def parse_statement_date(value: str) -> Optional[date]:
+    value = (value or "").strip()
+    for fmt, length in (("%Y-%m-%d", 10), ("%Y%m%d", 8), ("%d/%m/%Y", 10), ("%d/%m/%y", 8), ("%d-%m-%Y", 10), ("%d.%m.%Y", 10)):
+        try:
+            return datetime.strptime(value[:length], fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def parse_camt053(content: bytes) -> list:
+    """Credit entries (Ntry) of an ISO 20022 camt.053 statement, any schema version"""
+    transactions = []
+    for _, elem in ET.iterparse(io.BytesIO(content), events=("end",)):
+        if elem.tag.rsplit("}", 1)[-1] != "Ntry":
+            continue
+        fields = {"Ustrd": [], "Nm": []}
+        amount = indicator = booked = reference = info = None
+        for child in elem.iter():
+            tag = child.tag.rsplit("}", 1)[-1]
+            text = (child.text or "").strip()
+            if tag == "Amt" and amount is None:
+                amount = text
+            elif tag == "CdtDbtInd" and indicator is None:
+                indicator = text
+            elif tag in ("Dt", "DtTm") and booked is None:
+                booked = text
+            elif tag in ("AcctSvcrRef", "EndToEndId") and reference is None:
+                reference = text
+            elif tag == "AddtlNtryInf":
+                info = text
+            elif tag in fields and text:
+                fields[tag].append(text)
+        elem.clear()
+        if indicator != "CRDT":
+            continue
+        transactions.append({
+            "reference": reference,
+            "date": parse_statement_date(booked),
+            "amount": parse_statement_amount(amount),
+            "name": " ".join(fields["Nm"][:1]),
+            "label": " ".join(fields["Ustrd"] + ([info] if info else []))
+        })
+    return transactions
+
+def parse_ofx(content: bytes) -> list:
+    """Credit transactions of an OFX statement (SGML 1.x or XML 2.x)"""
+    text = content.decode("utf-8", errors="replace") if content[:3] == b"\xef\xbb\xbf" or b"UTF-8" in content[:500] \
+        else content.decode("cp1252", errors="replace")
+    transactions = []
+    for block in re.split(r"<STMTTRN>", text, flags=re.IGNORECASE)[1:]:
+        block = re.split(r"</STMTTRN>", block, flags=re.IGNORECASE)[0]
+        values = {tag.upper(): value.strip() for tag, value in re.findall(r"<(\w+)>([^<\r\n]*)", block)}
+        amount = parse_statement_amount(values.get("TRNAMT"))
+        if amount is None or amount <= 0:
+            continue
+        transactions.append({
+            "reference": values.get("FITID"),
+            "date": parse_statement_date(values.get("DTPOSTED", "")[:8]),
+            "amount": amount,
+            "name": values.get("NAME", ""),
+            "label": values.get("MEMO", "")
+        })
+    return transactions
+
+# Lowercase, accent-free header names recognised in CSV statements
+STATEMENT_CSV_COLUMNS = {
+    "date": ("date", "date operation", "date comptable", "date de valeur", "date valeur", "booking date"),
+    "amount": ("montant", "amount", "montant eur", "montant(eur)"),
+    "credit": ("credit", "credit eur", "credit(eur)"),
+    "label": ("libelle", "label", "description", "libelle operation", "detail", "details"),
+    "name": ("nom", "name", "emetteur", "tiers", "payer"),
+    "reference": ("reference", "ref", "id"),
+}
+
+def parse_statement_csv(content: bytes) -> list:
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = content.decode("cp1252")
+    rows = csv.reader(io.StringIO(text), sniff_csv_dialect(text[:8192]))
+    
+    # Banks often put a few account lines before the header
+    columns = {}
+    for header in rows:
+        names = [normalize_label(cell).lower() for cell in header]
+        columns = {
+            key: next((i for i, name in enumerate(names) if name in aliases), None)
+            for key, aliases in STATEMENT_CSV_COLUMNS.items()
+        }
+        if columns["date"] is not None and (columns["amount"] is not None or columns["credit"] is not None):
+            break
+    else:
+        raise HTTPException(status_code=400, detail="Colonnes date et montant introuvables dans le relevé")
+    
+    def cell(row, key):
+        index = columns[key]
+        return row[index] if index is not None and index < len(row) else ""
+    
+    transactions = []
+    for row in rows:
+        amount = parse_statement_amount(cell(row, "credit") if columns["credit"] is not None else cell(row, "amount"))
+        if amount is None or amount <= 0:
+            continue
+        transactions.append({
+            "reference": cell(row, "reference") or None,
+            "date": parse_statement_date(cell(row, "date")),
+            "amount": amount,
+            "name": cell(row, "name"),
+            "label": cell(row, "label")
+        })
+    return transactions
+
+def parse_bank_statement(filename: str, content: bytes) -> list:
+    """Credit transactions of a CAMT.053, OFX or CSV statement"""
+    head = content[:2048].lstrip()
+    if b"camt.053" in head or (head.startswith(b"<?xml") and b"BkToCstmrStmt" in content[:4096]):
+        try:
+            transactions = parse_camt053(content)
+        except ET.ParseError:
+            raise HTTPException(status_code=400, detail="Fichier CAMT.053 invalide")
+    elif b"OFXHEADER" in head or b"<OFX>" in content[:4096].upper():
+        transactions = parse_ofx(content)
+    else:
+        transactions = parse_statement_csv(content)
+    return [t for t in transactions if t["date"] and t["amount"]]
+
+def score_name(tenant_tokens: tuple, label_tokens: set) -> float:
+    """Share of the tenant's name tokens found (exactly or approximately) in the bank label"""
+    if not tenant_tokens or not label_tokens:
+        return 0.0
+    found = 0.0
+    for token in tenant_tokens:
+        if token in label_tokens:
+            found += 1
+        elif len(token) >= 4 and difflib.get_close_matches(token, label_tokens, n=1, cutoff=0.8):
+            found += 0.8
+    return found / len(tenant_tokens)
+
+def match_statement(transactions: list, expectations: dict, tenant_tokens: dict) -> tuple:
+    """Match credits to expected rents, returning (proposals, unmatched transactions).
+    
+    expectations maps amount in cents to [(lease_id, tenant_id, period_year, period_month, due date)]
+    sorted by due date. Candidates are the expectations with the exact amount and a due date within
+    the window, found by bisection so each transaction only visits the rents of its own window;
+    each expectation and each transaction is used at most once, best scores first.
+    """
+    window = timedelta(days=RECONCILIATION_DATE_WINDOW_DAYS)
+    candidates = []
+    for index, transaction in enumerate(transactions):
+        expected = expectations.get(round(transaction["amount"] * 100))
+        if not expected:
+            continue
+        low = bisect.bisect_left(expected, transaction["date"] - window, key=lambda key: key[4])
+        high = bisect.bisect_right(expected, transaction["date"] + window, lo=low, key=lambda key: key[4])
+        if low == high:
+            continue
+        label_tokens = set(normalize_label(f"{transaction['name']} {transaction['label']}").split())
+        for key in expected[low:high]:
+            lease_id, tenant_id, year, month, due = key
+            delta = abs((transaction["date"] - due).days)
+            name_score = score_name(tenant_tokens.get(tenant_id, ()), label_tokens)
+            date_score = 1 - delta / (RECONCILIATION_DATE_WINDOW_DAYS + 1)
+            score = round(0.6 * name_score + 0.4 * date_score, 3)
+            if score >= RECONCILIATION_MIN_SCORE:
+                candidates.append((score, index, key))
+    
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    used_transactions, used_expectations, proposals = set(), set(), []
+    for score, index, key in candidates:
+        if index in used_transactions or key in used_expectations:
+            continue
+        used_transactions.add(index)
+        used_expectations.add(key)
+        proposals.append((index, key, score))
+    
+    unmatched = [t for i, t in enumerate(transactions) if i not in used_transactions]
+    return proposals, unmatched
+
+def iter_months(start: date, end: date):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+async def build_rent_expectations(user_id: str, start: date, end: date) -> tuple:
+    """Unpaid expected rents (index by amount in cents, sorted by due date) between two dates, with tenant name tokens"""
+    leases = await db.leases.find(
+        {"user_id": user_id},
+        {"_id": 0, "id": 1, "tenant_id": 1, "start_date": 1, "end_date": 1, "rent_amount": 1, "charges": 1, "payment_day": 1}
+    ).to_list(None)
+    tenants = await db.tenants.find(
+        {"id": {"$in": list({lease['tenant_id'] for lease in leases})}},
+        {"_id": 0, "id": 1, "first_name": 1, "last_name": 1}
+    ).to_list(None)
+    tenant_tokens = {
+        t['id']: tuple(normalize_label(f"{t['first_name']} {t['last_name']}").split()) for t in tenants
+    }
+    
+    # Periods already paid are not proposed again
+    paid = await db.payments.find(
+        {"user_id": user_id, "period_year": {"$gte": start.year - 1, "$lte": end.year + 1}},
+        {"_id": 0, "lease_id": 1, "period_year": 1, "period_month": 1}
+    ).to_list(None)
+    paid = {(p['lease_id'], p['period_year'], p['period_month']) for p in paid}
+    
+    expectations = {}
+    for lease in leases:
+        lease_start = date.fromisoformat(lease['start_date'][:10])
+        lease_end = date.fromisoformat(lease['end_date'][:10]) if lease.get('end_date') else None
+        amount = round((lease['rent_amount'] + lease.get('charges', 0)) * 100)
+        for year, month in iter_months(max(start, lease_start), min(end, lease_end) if lease_end else end):
+            if (lease['id'], year, month) in paid:
+                continue
+            day = min(lease.get('payment_day') or 1, calendar.monthrange(year, month)[1])
+            expectations.setdefault(amount, []).append((lease['id'], lease['tenant_id'], year, month, date(year, month, day)))
+    for expected in expectations.values():
+        expected.sort(key=lambda key: key[4])
+    return expectations, tenant_tokens
+
+@api_router.post("/reconciliation/statements", response_model=dict)
+async def upload_bank_statement(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    """Match the credits of a bank statement (CAMT.053, OFX, CSV) to expected rents"""
+    content = await file.read()
+    if len(content) > MAX_IMPORT_SIZE:
+        raise HTTPException(status_code=400, detail=f"Fichier trop volumineux (max {MAX_IMPORT_SIZE // (1024 * 1024)}MB)")
+    
+    transactions = await asyncio.to_thread(parse_bank_statement, file.filename or "", content)
+    if not transactions:
+        raise HTTPException(status_code=400, detail="Aucun crédit trouvé dans le relevé")
+    
+    window = timedelta(days=RECONCILIATION_DATE_WINDOW_DAYS)
+    start = min(t["date"] for t in transactions) - window
+    end = max(t["date"] for t in transactions) + window
+    expectations, tenant_tokens = await build_rent_expectations(current_user['id'], start, end)
+    matches, unmatched = await asyncio.to_thread(match_statement, transactions, expectations, tenant_tokens)
+    
+    statement_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    proposals = []
+    for index, (lease_id, _, year, month, _), score in matches:
+        transaction = transactions[index]
+        proposals.append({
+            "id": str(uuid.uuid4()),
+            "statement_id": statement_id,
+            "user_id": current_user['id'],
+            "lease_id": lease_id,
+            "amount": transaction["amount"],
+            "payment_date": transaction["date"].isoformat(),
+            "period_month": month,
+            "period_year": year,
+            "bank_reference": transaction["reference"],
+            "bank_label": f"{transaction['name']} {transaction['label']}".strip(),
+            "score": score,
+            "status": "proposed",
+            "created_at": now
+        })
+    
+    await db.bank_statements.insert_one({
+        "id": statement_id,
+        "user_id": current_user['id'],
+        "filename": file.filename,
+        "credits": len(transactions),
+        "matched": len(proposals),
+        "created_at": now
+    })
+    if proposals:
+        await db.payment_proposals.insert_many([dict(p) for p in proposals], ordered=False)
+    
+    return {
+        "statement_id": statement_id,
+        "credits": len(transactions),
+        "proposals": sorted(proposals, key=lambda p: p['payment_date']),
+        "unmatched": [
+            {**t, "date": t["date"].isoformat()} for t in unmatched[:RECONCILIATION_MAX_UNMATCHED]
+        ],
+        "unmatched_count": len(unmatched)
+    }
+
+@api_router.get("/reconciliation/statements/{statement_id}/proposals", response_model=List[dict])
+async def get_payment_proposals(statement_id: str, current_user: dict = Depends(get_current_user)):
+    return await db.payment_proposals.find(
+        {"statement_id": statement_id, "user_id": current_user['id']}, {"_id": 0}
+    ).sort("payment_date", 1).to_list(None)
+
+@api_router.post("/reconciliation/proposals/confirm", response_model=dict)
+async def confirm_payment_proposals(
+    confirm_data: ProposalConfirm,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """Record the selected proposals as payments (one insert for all)"""
+    user_id = current_user['id']
+    proposals = await db.payment_proposals.find(
+        {"id": {"$in": confirm_data.proposal_ids}, "user_id": user_id, "status": "proposed"}, {"_id": 0}
+    ).to_list(None)
+    if not proposals:
+        raise HTTPException(status_code=404, detail="Aucune proposition à confirmer")
+    
+    # A period may have been paid manually since the statement was matched
+    paid = await db.payments.find(
+        {"user_id": user_id, "lease_id": {"$in": list({p['lease_id'] for p in proposals})}},
+        {"_id": 0, "lease_id": 1, "period_year": 1, "period_month": 1}
+    ).to_list(None)
+    paid = {(p['lease_id'], p['period_year'], p['period_month']) for p in paid}
+    display_fields = await load_payment_display_fields(
+        {"user_id": user_id, "id": {"$in": list({p['lease_id'] for p in proposals})}}
+    )
+    
+    now = datetime.now(timezone.utc).isoformat()
+    docs, updates, skipped = [], [], []
+    for proposal in proposals:
+        period = (proposal['lease_id'], proposal['period_year'], proposal['period_month'])
+        if period in paid:
+            skipped.append(proposal['id'])
+            updates.append(UpdateOne({"id": proposal['id']}, {"$set": {"status": "duplicate"}}))
+            continue
+        paid.add(period)
+        payment_id = str(uuid.uuid4())
+        docs.append({
+            "lease_id": proposal['lease_id'],
+            "amount": proposal['amount'],
+            "payment_date": proposal['payment_date'],
+            "period_month": proposal['period_month'],
+            "period_year": proposal['period_year'],
+            "payment_method": "virement",
+            "notes": f"Rapprochement bancaire : {proposal['bank_label']}"[:500],
+            **display_fields.get(proposal['lease_id'], copy_display_fields(None)),
+            "id": payment_id,
+            "user_id": user_id,
+            "status": "paid",
+            "created_at": now
+        })
+        updates.append(UpdateOne({"id": proposal['id']}, {"$set": {"status": "confirmed", "payment_id": payment_id}}))
+    
+    if docs:
+        await db.payments.insert_many(docs, ordered=False)
+        background_tasks.add_task(post_payments_to_ledger, docs)
+        await mark_changed(user_id, "payments")
+        await create_audit_log(
+            user_id=user_id,
+            user_name=current_user['name'],
+            action="create",
+            entity_type="payment",
+            entity_id=proposals[0]['statement_id'],
+            entity_name=f"Rapprochement bancaire : {len(docs)} paiement(s)",
+            changes={"count": {"old": None, "new": len(docs)}}
+        )
+    await db.payment_proposals.bulk_write(updates, ordered=False)
+    
+    return {
+        "payment_ids": [doc['id'] for doc in docs],
+        "skipped": skipped,
+        "message": f"{len(docs)} paiement(s) enregistré(s)"
+    }
+
+@api_router.delete("/reconciliation/proposals/{proposal_id}")
+async def reject_payment_proposal(proposal_id: str, current_user: dict = Depends(get_current_user)):
+    result = await db.payment_proposals.update_one(
+        {"id": proposal_id, "user_id": current_user['id'], "status": "proposed"},
+        {"$set": {"status": "rejected"}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Proposition non trouvée")
+    return {"message": "Proposition rejetée"}
+
 # ==================== EMAIL REMINDER ROUTES ====================
 
 def send_email_smtp(smtp_email: str, smtp_password: str, to_email: str, subject: str, html_content: str):
@@ -1177,6 +3615,7 @@ async def send_payment_reminders(current_user: dict = Depends(get_current_user))
                     notif_dict = notif.model_dump()
                     notif_dict['created_at'] = notif_dict['created_at'].isoformat()
                     await db.notifications.insert_one(notif_dict)
+                    await mark_changed(current_user['id'], "notifications")
                 else:
                     errors.append(f"Échec pour {tenant['email']}")
     
@@ -1187,6 +3626,7 @@ async def send_payment_reminders(current_user: dict = Depends(get_current_user))
     }
 
 @api_router.get("/reminders/pending")
+@cached_response("leases", "payments", "properties", "tenants")
 async def get_pending_payments(current_user: dict = Depends(get_current_user)):
     """Get list of tenants with pending payments for current month"""
     leases = await db.leases.find({"user_id": current_user['id'], "is_active": True}, {"_id": 0}).to_list(1000)
@@ -1219,10 +3659,163 @@ async def get_pending_payments(current_user: dict = Depends(get_current_user)):
     
     return {"pending": pending, "count": len(pending)}
 
+# ==================== DOCUMENT RENDITIONS ====================
+
+def render_image_renditions(source_path: str, dest_dir: str, base_name: str, mime_type: str) -> dict:
+    """Build thumbnail/medium renditions of an image or of a PDF first page.
+    
+    Runs in the rendition process pool, never in a request handler.
+    Returns {size: {format: filename}}, or {} when the file has no visual preview.
+    """
+    from PIL import Image, ImageOps
+    
+    if mime_type == "application/pdf":
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            return {}
+        pdf = pdfium.PdfDocument(source_path)
+        try:
+            page = pdf[0]
+            # Render the first page just large enough for the biggest rendition
+            width, height = page.get_size()
+            scale = max(RENDITION_SIZES.values()) / max(width, height)
+            image = page.render(scale=scale).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(source_path)
+        # Let the JPEG decoder downscale while decoding (much cheaper than a full decode)
+        image.draft("RGB", (max(RENDITION_SIZES.values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+    
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    
+    renditions = {}
+    for size_name, max_side in sorted(RENDITION_SIZES.items(), key=lambda item: -item[1]):
+        # Renditions are built largest first, each one from the previous to save resampling work
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        renditions[size_name] = {}
+        for fmt, options in (("webp", {"quality": 80, "method": 4}), ("jpeg", {"quality": 82, "progressive": True, "optimize": True})):
+            filename = f"{base_name}_{size_name}.{'jpg' if fmt == 'jpeg' else fmt}"
+            image.save(Path(dest_dir) / filename, fmt.upper(), **options)
+            renditions[size_name][fmt] = filename
+    return renditions
+
+def has_renditions(mime_type: str) -> bool:
+    return mime_type in RENDITION_MIME_TYPES
+
+def sign_rendition_path(document_id: str, size: str, fmt: str) -> str:
+    """Signed URL usable directly in <img src> (no Authorization header).
+    
+    Expiry is rounded to the day so URLs stay stable and browser-cacheable.
+    """
+    expires = int((datetime.now(timezone.utc) + timedelta(days=2)).timestamp()) // 86400 * 86400
+    message = f"{document_id}:{size}:{fmt}:{expires}".encode()
+    sig = hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+    return f"/api/renditions/{document_id}/{size}.{fmt}?expires={expires}&sig={sig}"
+
+def get_rendition_urls(doc: dict) -> Optional[dict]:
+    if not doc.get('renditions'):
+        return None
+    return {
+        size: {fmt: sign_rendition_path(doc['id'], size, fmt) for fmt in formats}
+        for size, formats in doc['renditions'].items()
+    }
+
+def claimable_renditions_query() -> dict:
+    """Documents waiting for renditions, or whose rendering was interrupted"""
+    claim_cutoff = (datetime.now(timezone.utc) - RENDITION_CLAIM_TIMEOUT).isoformat()
+    return {"$or": [
+        {"rendition_status": {"$in": [None, "pending"]}},
+        {"rendition_status": "processing", "rendition_claimed_at": {"$lt": claim_cutoff}}
+    ]}
+
+async def generate_document_renditions(document_id: str):
+    """Background task: render a document's renditions in the process pool"""
+    # Claimed atomically: the upload's task and the catch-up job never render the same document twice
+    doc = await db.documents.find_one_and_update(
+        {"id": document_id, **claimable_renditions_query()},
+        {"$set": {"rendition_status": "processing", "rendition_claimed_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0, "user_id": 1, "filename": 1, "mime_type": 1}
+    )
+    if not doc:
+        return
+    if not has_renditions(doc['mime_type']):
+        await db.documents.update_one({"id": document_id}, {"$set": {"rendition_status": "none"}})
+        return
+    
+    source_path = UPLOADS_DIR / doc['filename']
+    if not source_path.exists():
+        # Settled as failed, otherwise the catch-up job would pick it up on every run
+        logger.warning(f"Rendition skipped for document {document_id}: file {doc['filename']} is missing")
+        await db.documents.update_one({"id": document_id}, {"$set": {"rendition_status": "failed"}})
+        return
+    
+    loop = asyncio.get_running_loop()
+    try:
+        renditions = await loop.run_in_executor(
+            get_process_pool(),
+            render_image_renditions,
+            str(source_path),
+            str(RENDITIONS_DIR),
+            document_id,
+            doc['mime_type']
+        )
+    except Exception as e:
+        logger.error(f"Rendition failed for document {document_id}: {e}")
+        await db.documents.update_one({"id": document_id}, {"$set": {"rendition_status": "failed"}})
+        return
+    
+    await db.documents.update_one(
+        {"id": document_id},
+        {"$set": {"renditions": renditions or None, "rendition_status": "ready" if renditions else "none"}}
+    )
+    await mark_changed(doc['user_id'], "documents")
+
+async def process_pending_renditions():
+    """Background task: catch up renditions lost on restart or never generated (oldest first)"""
+    # Every document leaves the pending state (ready, none or failed), so one pass drains the backlog;
+    # documents claimed meanwhile by their upload's task are skipped by generate_document_renditions
+    async for doc in db.documents.find(
+        {"mime_type": {"$in": list(RENDITION_MIME_TYPES)}, **claimable_renditions_query()},
+        {"_id": 0, "id": 1}
+    ).sort("created_at", 1).batch_size(50):
+        await generate_document_renditions(doc['id'])
+
+def delete_document_files(doc: dict):
+    """Remove a document file and its renditions from disk"""
+    (UPLOADS_DIR / doc['filename']).unlink(missing_ok=True)
+    for formats in (doc.get('renditions') or {}).values():
+        for filename in formats.values():
+            (RENDITIONS_DIR / filename).unlink(missing_ok=True)
+
+@api_router.get("/renditions/{document_id}/{rendition}")
+async def get_rendition(document_id: str, rendition: str, expires: int, sig: str):
+    """Serve a rendition through a signed URL"""
+    size, _, fmt = rendition.partition(".")
+    message = f"{document_id}:{size}:{fmt}:{expires}".encode()
+    expected_sig = hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+    if not hmac.compare_digest(sig, expected_sig) or expires < datetime.now(timezone.utc).timestamp():
+        raise HTTPException(status_code=403, detail="Lien invalide ou expiré")
+    
+    doc = await db.documents.find_one({"id": document_id}, {"_id": 0, "renditions": 1})
+    filename = ((doc or {}).get('renditions') or {}).get(size, {}).get(fmt)
+    if not filename or not (RENDITIONS_DIR / filename).exists():
+        raise HTTPException(status_code=404, detail="Aperçu non trouvé")
+    
+    return FileResponse(
+        RENDITIONS_DIR / filename,
+        media_type=f"image/{fmt}",
+        headers={"Cache-Control": "private, max-age=86400, immutable"}
+    )
+
 # ==================== DOCUMENTS ROUTES ====================
 
 @api_router.post("/documents/upload")
 async def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     name: str = Form(...),
     document_type: str = Form(...),
@@ -1258,13 +3851,336 @@ async def upload_document(
         file_size=len(contents),
         mime_type=file.content_type or "application/octet-stream"
     )
+    if has_renditions(doc.mime_type):
+        doc.rendition_status = "pending"
     
     doc_dict = doc.model_dump()
     doc_dict['created_at'] = doc_dict['created_at'].isoformat()
     await db.documents.insert_one(doc_dict)
     
+    if has_renditions(doc.mime_type):
+        background_tasks.add_task(generate_document_renditions, doc.id)
+    
     return {"id": doc.id, "message": "Document uploadé avec succès"}
 
+# ==================== CHUNKED (RESUMABLE) UPLOADS ====================
+
+def get_partial_upload_path(upload_id: str) -> Path:
+    return PARTIAL_UPLOADS_DIR / f"{upload_id}.part"
+
+def get_expected_chunk_length(session: dict, index: int) -> int:
+    """Size of chunk `index`: chunk_size for all chunks but the last one"""
+    if index < session['total_chunks'] - 1:
+        return session['chunk_size']
+    return session['total_size'] - session['chunk_size'] * (session['total_chunks'] - 1)
+
+def compute_file_sha256(file_path: Path, block_size: int = 1024 * 1024) -> str:
+    """Hash a file block by block, without loading it in memory"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+async def get_upload_session(upload_id: str, user_id: str) -> dict:
+    session = await db.upload_sessions.find_one({"id": upload_id, "user_id": user_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload non trouvé ou expiré")
+    return session
+
+def format_upload_session(session: dict) -> dict:
+    received = set(session['received_chunks'])
+    return {
+        "upload_id": session['id'],
+        "chunk_size": session['chunk_size'],
+        "total_size": session['total_size'],
+        "total_chunks": session['total_chunks'],
+        "received_chunks": sorted(received),
+        "missing_chunks": [i for i in range(session['total_chunks']) if i not in received]
+    }
+
+@api_router.post("/documents/uploads")
+async def create_upload_session(upload_data: UploadSessionCreate, current_user: dict = Depends(get_current_user)):
+    """Start a resumable upload: the file is then sent with one PUT per chunk"""
+    if upload_data.total_size <= 0:
+        raise HTTPException(status_code=400, detail="Taille de fichier invalide")
+    if upload_data.total_size > MAX_CHUNKED_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Fichier trop volumineux (max {MAX_CHUNKED_UPLOAD_SIZE // (1024 * 1024)}MB)"
+        )
+    
+    # Client may suggest a chunk size, kept between 256KB and 32MB
+    chunk_size = upload_data.chunk_size or UPLOAD_CHUNK_SIZE
+    chunk_size = max(256 * 1024, min(chunk_size, 32 * 1024 * 1024))
+    total_chunks = -(-upload_data.total_size // chunk_size)
+    
+    session = UploadSession(
+        **upload_data.model_dump(exclude={"chunk_size"}),
+        user_id=current_user['id'],
+        chunk_size=chunk_size,
+        total_chunks=total_chunks
+    )
+    
+    # Pre-size the (sparse) partial file so chunks can be written at their offset in any order
+    with open(get_partial_upload_path(session.id), "wb") as f:
+        f.truncate(upload_data.total_size)
+    
+    session_dict = session.model_dump()
+    session_dict['created_at'] = session_dict['created_at'].isoformat()
+    session_dict['updated_at'] = session_dict['updated_at'].isoformat()
+    await db.upload_sessions.insert_one(session_dict)
+    
+    return format_upload_session(session_dict)
+
+@api_router.get("/documents/uploads/{upload_id}")
+async def get_upload_status(upload_id: str, current_user: dict = Depends(get_current_user)):
+    """Get received/missing chunks, used to resume an interrupted upload"""
+    session = await get_upload_session(upload_id, current_user['id'])
+    return format_upload_session(session)
+
+@api_router.put("/documents/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(upload_id: str, index: int, request: Request, current_user: dict = Depends(get_current_user)):
+    """Write one chunk (raw request body) at its offset in the partial file"""
+    session = await get_upload_session(upload_id, current_user['id'])
+    if index < 0 or index >= session['total_chunks']:
+        raise HTTPException(status_code=400, detail="Numéro de morceau invalide")
+    
+    file_path = get_partial_upload_path(upload_id)
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Upload non trouvé ou expiré")
+    
+    expected_length = get_expected_chunk_length(session, index)
+    expected_sha256 = request.headers.get("X-Chunk-SHA256")
+    digest = hashlib.sha256()
+    written = 0
+    
+    # Stream the body straight to disk, never holding the whole chunk in memory
+    with open(file_path, "r+b") as f:
+        f.seek(index * session['chunk_size'])
+        async for data in request.stream():
+            written += len(data)
+            if written > expected_length:
+                raise HTTPException(status_code=400, detail="Morceau trop volumineux")
+            digest.update(data)
+            f.write(data)
+    
+    if written != expected_length:
+        raise HTTPException(status_code=400, detail=f"Morceau incomplet ({written}/{expected_length} octets)")
+    if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+        raise HTTPException(status_code=400, detail="Somme de contrôle du morceau invalide")
+    
+    await db.upload_sessions.update_one(
+        {"id": upload_id},
+        {
+            "$addToSet": {"received_chunks": index},
+            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+        }
+    )
+    
+    return {"index": index, "size": written}
+
+@api_router.post("/documents/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    checksum: str = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Verify the assembled file checksum and turn it into a document"""
+    session = await get_upload_session(upload_id, current_user['id'])
+    
+    missing = format_upload_session(session)['missing_chunks']
+    if missing:
+        raise HTTPException(status_code=400, detail=f"{len(missing)} morceau(x) manquant(s)")
+    
+    file_path = get_partial_upload_path(upload_id)
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Upload non trouvé ou expiré")
+    
+    file_sha256 = await asyncio.to_thread(compute_file_sha256, file_path)
+    expected_sha256 = checksum or session.get('checksum')
+    if expected_sha256 and file_sha256 != expected_sha256.lower():
+        raise HTTPException(status_code=400, detail="Somme de contrôle invalide, fichier corrompu")
+    
+    # Claim the session so that a concurrent completion cannot create a second document
+    result = await db.upload_sessions.delete_one({"id": upload_id, "user_id": current_user['id']})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Upload non trouvé ou expiré")
+    
+    unique_filename = f"{uuid.uuid4()}{Path(session['filename']).suffix}"
+    os.replace(file_path, UPLOADS_DIR / unique_filename)
+    
+    doc = Document(
+        name=session['name'],
+        document_type=session['document_type'],
+        related_type=session['related_type'],
+        related_id=session['related_id'],
+        notes=session.get('notes'),
+        user_id=current_user['id'],
+        filename=unique_filename,
+        file_size=session['total_size'],
+        mime_type=session['mime_type'],
+        checksum=file_sha256
+    )
+    if has_renditions(doc.mime_type):
+        doc.rendition_status = "pending"
+    
+    doc_dict = doc.model_dump()
+    doc_dict['created_at'] = doc_dict['created_at'].isoformat()
+    await db.documents.insert_one(doc_dict)
+    
+    if has_renditions(doc.mime_type):
+        background_tasks.add_task(generate_document_renditions, doc.id)
+    
+    return {"id": doc.id, "checksum": file_sha256, "message": "Document uploadé avec succès"}
+
+@api_router.delete("/documents/uploads/{upload_id}")
+async def abort_upload(upload_id: str, current_user: dict = Depends(get_current_user)):
+    """Cancel a resumable upload and drop its partial file"""
+    result = await db.upload_sessions.delete_one({"id": upload_id, "user_id": current_user['id']})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Upload non trouvé ou expiré")
+    
+    get_partial_upload_path(upload_id).unlink(missing_ok=True)
+    
+    return {"message": "Upload annulé"}
+
+async def cleanup_stale_uploads():
+    """Background task removing abandoned partial uploads"""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+    
+    stale_sessions = await db.upload_sessions.find(
+        {"updated_at": {"$lt": cutoff.isoformat()}}, {"_id": 0, "id": 1}
+    ).to_list(None)
+    stale_ids = [s['id'] for s in stale_sessions]
+    if stale_ids:
+        await db.upload_sessions.delete_many({"id": {"$in": stale_ids}})
+    for upload_id in stale_ids:
+        get_partial_upload_path(upload_id).unlink(missing_ok=True)
+    
+    # Partial files left without a session (e.g. crash during completion)
+    orphans = 0
+    for file_path in PARTIAL_UPLOADS_DIR.glob("*.part"):
+        if datetime.fromtimestamp(file_path.stat().st_mtime, timezone.utc) >= cutoff:
+            continue
+        if not await db.upload_sessions.find_one({"id": file_path.stem}, {"_id": 1}):
+            file_path.unlink(missing_ok=True)
+            orphans += 1
+    
+    if stale_ids or orphans:
+        logger.info(f"Removed {len(stale_ids)} stale upload session(s) and {orphans} orphan partial file(s)")
+
+# ==================== DOCUMENT BUNDLE (ZIP) ====================
+
+# Already compressed formats are stored as-is in bundles (deflating them wastes CPU)
+COMPRESSED_MIME_PREFIXES = ("image/", "video/", "audio/", "application/pdf", "application/zip",
+                            "application/vnd.openxmlformats-officedocument")
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink for zipfile: bytes are collected and drained by the generator"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_documents_zip(entries: list, block_size: int = 256 * 1024):
+    """Generate a ZIP archive of (archive_name, file_path, mime_type) entries chunk by chunk.
+    
+    Nothing is buffered beyond one block: zipfile writes local headers and data
+    descriptors to the non-seekable sink, which is drained after each block.
+    """
+    sink = ZipStreamBuffer()
+    with zipfile.ZipFile(sink, mode="w") as archive:
+        for archive_name, file_path, mime_type in entries:
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            zinfo = zipfile.ZipInfo(archive_name, date_time=datetime.fromtimestamp(stat.st_mtime).timetuple()[:6])
+            zinfo.file_size = stat.st_size
+            zinfo.compress_type = (
+                zipfile.ZIP_STORED if mime_type.startswith(COMPRESSED_MIME_PREFIXES) else zipfile.ZIP_DEFLATED
+            )
+            with open(file_path, "rb") as source, archive.open(zinfo, mode="w", force_zip64=stat.st_size > 2**31) as target:
+                for block in iter(lambda: source.read(block_size), b""):
+                    target.write(block)
+                    yield sink.drain()
+            yield sink.drain()
+    # Central directory
+    yield sink.drain()
+
+async def get_bundle_documents(related_type: str, related_id: str, user_id: str) -> list:
+    """Documents of an entity and of the entities of its rental dossier, with their archive folder"""
+    related = [(related_type, related_id)]
+    if related_type == "lease":
+        lease = await db.leases.find_one({"id": related_id, "user_id": user_id}, {"_id": 0})
+        if not lease:
+            raise HTTPException(status_code=404, detail="Bail non trouvé")
+        related += [("property", lease['property_id']), ("tenant", lease['tenant_id'])]
+    elif related_type in ("property", "tenant"):
+        field = "property_id" if related_type == "property" else "tenant_id"
+        leases = await db.leases.find({field: related_id, "user_id": user_id}, {"_id": 0, "id": 1}).to_list(1000)
+        related += [("lease", lease['id']) for lease in leases]
+    else:
+        raise HTTPException(status_code=400, detail="Type d'entité invalide")
+    
+    documents = await db.documents.find(
+        {"user_id": user_id, "$or": [{"related_type": t, "related_id": i} for t, i in related]},
+        {"_id": 0}
+    ).sort("created_at", 1).to_list(10000)
+    return documents
+
+@api_router.get("/documents/bundle")
+async def download_documents_bundle(
+    related_type: str,
+    related_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Download a whole rental dossier as a ZIP streamed on the fly"""
+    documents = await get_bundle_documents(related_type, related_id, current_user['id'])
+    if not documents:
+        raise HTTPException(status_code=404, detail="Aucun document pour ce dossier")
+    
+    folders = {"lease": "Bail", "property": "Bien", "tenant": "Locataire"}
+    entries = []
+    used_names = set()
+    for doc in documents:
+        suffix = Path(doc['filename']).suffix
+        base_name = f"{folders.get(doc['related_type'], 'Autres')}/{doc['name'].replace('/', '-')}"
+        archive_name = f"{base_name}{suffix}"
+        counter = 2
+        while archive_name in used_names:
+            archive_name = f"{base_name} ({counter}){suffix}"
+            counter += 1
+        used_names.add(archive_name)
+        entries.append((archive_name, UPLOADS_DIR / doc['filename'], doc['mime_type']))
+    
+    filename = f"dossier_{related_type}_{datetime.now().strftime('%Y%m%d')}.zip"
+    
+    # Sync generator: StreamingResponse runs it in the threadpool, keeping file I/O off the event loop
+    return StreamingResponse(
+        stream_documents_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @api_router.get("/documents")
 async def get_documents(
     related_type: str = None,
@@ -1279,6 +4195,8 @@ async def get_documents(
         query["related_id"] = related_id
     
     documents = await db.documents.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    for doc in documents:
+        doc['rendition_urls'] = get_rendition_urls(doc)
     return documents
 
 @api_router.get("/documents/{document_id}")
@@ -1289,6 +4207,7 @@ async def get_document(document_id: str, current_user: dict = Depends(get_curren
     )
     if not doc:
         raise HTTPException(status_code=404, detail="Document non trouvé")
+    doc['rendition_urls'] = get_rendition_urls(doc)
     return doc
 
 @api_router.get("/documents/{document_id}/download")
@@ -1319,104 +4238,486 @@ async def delete_document(document_id: str, current_user: dict = Depends(get_cur
     if not doc:
         raise HTTPException(status_code=404, detail="Document non trouvé")
     
-    # Delete file
-    file_path = UPLOADS_DIR / doc['filename']
-    if file_path.exists():
-        file_path.unlink()
+    # Delete file and renditions
+    delete_document_files(doc)
     
     # Delete record
     await db.documents.delete_one({"id": document_id})
+    await mark_changed(current_user['id'], "documents")
     
     return {"message": "Document supprimé avec succès"}
 
-# ==================== CALENDAR ROUTES ====================
+# ==================== CASCADE DELETION & ORPHAN SWEEPER ====================
+
+def chunked(items: list, size: int = None):
+    size = size or CASCADE_BATCH_SIZE
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+async def delete_documents_batch(query: dict) -> int:
+    """Delete matching documents and their files, batch by batch"""
+    deleted, user_ids = 0, set()
+    while True:
+        docs = await db.documents.find(
+            query, {"_id": 0, "id": 1, "user_id": 1, "filename": 1, "renditions": 1}
+        ).to_list(CASCADE_BATCH_SIZE)
+        if not docs:
+            break
+        for doc in docs:
+            await asyncio.to_thread(delete_document_files, doc)
+        user_ids.update(doc['user_id'] for doc in docs)
+        result = await db.documents.delete_many({"id": {"$in": [doc['id'] for doc in docs]}})
+        if result.deleted_count == 0:
+            break
+        deleted += result.deleted_count
+    # Cached property lists carry photo thumbnails
+    for user_id in user_ids:
+        await mark_changed(user_id, "documents")
+    return deleted
+
+async def delete_leases_batch(lease_ids: list, user_id: str) -> dict:
+    """Delete leases with their payments and documents"""
+    counts = {"leases": 0, "payments": 0, "documents": 0}
+    for batch in chunked(lease_ids):
+        payments = await db.payments.delete_many({"user_id": user_id, "lease_id": {"$in": batch}})
+        counts["payments"] += payments.deleted_count
+        await invalidate_receipts({"user_id": user_id, "lease_id": {"$in": batch}})
+        await db.ledger_entries.delete_many({"user_id": user_id, "lease_id": {"$in": batch}})
+        counts["documents"] += await delete_documents_batch(
+            {"user_id": user_id, "related_type": "lease", "related_id": {"$in": batch}}
+        )
+        leases = await db.leases.delete_many({"user_id": user_id, "id": {"$in": batch}})
+        counts["leases"] += leases.deleted_count
+    if lease_ids:
+        await mark_changed(user_id, "leases", "payments")
+    return counts
+
+async def cascade_delete(entity_type: str, entity_id: str, user_id: str):
+    """Background task removing everything that references a deleted entity"""
+    counts = {}
+    
+    if entity_type == "property":
+        leases = await db.leases.find({"user_id": user_id, "property_id": entity_id}, {"_id": 0, "id": 1}).to_list(None)
+        counts.update(await delete_leases_batch([l['id'] for l in leases], user_id))
+        vacancies = await db.vacancies.delete_many({"user_id": user_id, "property_id": entity_id})
+        counts["vacancies"] = vacancies.deleted_count
+        await db.tenants.update_many(
+            {"user_id": user_id, "current_property_id": entity_id},
+            {"$set": {"current_property_id": None}}
+        )
+        await mark_changed(user_id, "vacancies", "tenants")
+        counts["documents"] = counts.get("documents", 0) + await delete_documents_batch(
+            {"user_id": user_id, "related_type": "property", "related_id": entity_id}
+        )
+    
+    elif entity_type == "tenant":
+        leases = await db.leases.find({"user_id": user_id, "tenant_id": entity_id}, {"_id": 0, "id": 1}).to_list(None)
+        counts.update(await delete_leases_batch([l['id'] for l in leases], user_id))
+        await db.properties.update_many(
+            {"user_id": user_id, "current_tenant_id": entity_id},
+            {"$set": {"is_occupied": False, "current_tenant_id": None}}
+        )
+        await mark_changed(user_id, "properties")
+        counts["documents"] = counts.get("documents", 0) + await delete_documents_batch(
+            {"user_id": user_id, "related_type": "tenant", "related_id": entity_id}
+        )
+    
+    elif entity_type == "team":
+        members = await db.team_members.delete_many({"team_id": entity_id})
+        invitations = await db.team_invitations.delete_many({"team_id": entity_id})
+        counts = {"team_members": members.deleted_count, "team_invitations": invitations.deleted_count}
+    
+    logger.info(f"Cascade delete of {entity_type} {entity_id}: {counts}")
+    return counts
 
-@api_router.get("/calendar/events")
-async def get_calendar_events(
-    month: int = None,
-    year: int = None,
-    current_user: dict = Depends(get_current_user)
-):
-    """Get calendar events for a specific month or all upcoming events"""
-    user_id = current_user['id']
-    events = []
+async def sweep_orphans(min_age_hours: int = 1) -> dict:
+    """Reconcile the documents collection with the uploads directory.
     
-    now = datetime.now(timezone.utc)
-    target_month = month or now.month
-    target_year = year or now.year
+    - files in UPLOADS_DIR referenced by no document are removed
+    - renditions of deleted documents and stale receipt PDFs are removed
+    - documents whose related entity no longer exists are removed with their file
+    - documents whose file is missing are reported
+    """
+    report = {"orphan_files": 0, "orphan_renditions": 0, "orphan_receipts": 0, "orphan_documents": 0, "missing_files": 0, "reclaimed_bytes": 0}
+    cutoff = datetime.now(timezone.utc).timestamp() - min_age_hours * 3600
+    
+    # Documents attached to deleted entities
+    for related_type, collection in (("property", db.properties), ("tenant", db.tenants), ("lease", db.leases)):
+        related_ids = await db.documents.distinct("related_id", {"related_type": related_type})
+        for batch in chunked(related_ids):
+            existing = await collection.distinct("id", {"id": {"$in": batch}})
+            missing = list(set(batch) - set(existing))
+            if missing:
+                orphans = await db.documents.find(
+                    {"related_type": related_type, "related_id": {"$in": missing}}, {"_id": 0, "file_size": 1}
+                ).to_list(None)
+                report["reclaimed_bytes"] += sum(doc.get('file_size', 0) for doc in orphans)
+                report["orphan_documents"] += await delete_documents_batch(
+                    {"related_type": related_type, "related_id": {"$in": missing}}
+                )
     
-    # Get active leases for payment due dates
-    leases = await db.leases.find({"user_id": user_id, "is_active": True}, {"_id": 0}).to_list(1000)
+    # Files on disk without a document (skip recent ones: an upload may be in progress)
+    files = [
+        f for f in UPLOADS_DIR.iterdir()
+        if f.is_file() and f.stat().st_mtime < cutoff
+    ]
+    for batch in chunked(files):
+        known = set(await db.documents.distinct("filename", {"filename": {"$in": [f.name for f in batch]}}))
+        for file_path in batch:
+            if file_path.name not in known:
+                report["reclaimed_bytes"] += file_path.stat().st_size
+                file_path.unlink(missing_ok=True)
+                report["orphan_files"] += 1
+    
+    # Renditions are named "<document id>_<size>.<ext>"
+    renditions = [f for f in RENDITIONS_DIR.iterdir() if f.is_file() and f.stat().st_mtime < cutoff]
+    for batch in chunked(renditions):
+        document_ids = {f.name.split("_")[0] for f in batch}
+        known = set(await db.documents.distinct("id", {"id": {"$in": list(document_ids)}}))
+        for file_path in batch:
+            if file_path.name.split("_")[0] not in known:
+                report["reclaimed_bytes"] += file_path.stat().st_size
+                file_path.unlink(missing_ok=True)
+                report["orphan_renditions"] += 1
+    
+    # Receipt PDFs left behind by an invalidation race
+    receipts = [f for f in RECEIPTS_DIR.glob("*.pdf") if f.stat().st_mtime < cutoff]
+    for batch in chunked(receipts):
+        known = {
+            get_receipt_pdf_path(entry).name
+            for entry in await db.receipt_cache.find(
+                {"payment_id": {"$in": [f.name.split("_")[0] for f in batch]}, "content_hash": {"$exists": True}},
+                {"_id": 0, "payment_id": 1, "content_hash": 1}
+            ).to_list(None)
+        }
+        for file_path in batch:
+            if file_path.name not in known:
+                report["reclaimed_bytes"] += file_path.stat().st_size
+                file_path.unlink(missing_ok=True)
+                report["orphan_receipts"] += 1
+    
+    # Documents without file
+    on_disk = {f.name for f in UPLOADS_DIR.iterdir() if f.is_file()}
+    async for doc in db.documents.find({}, {"_id": 0, "filename": 1}).batch_size(CASCADE_BATCH_SIZE):
+        if doc['filename'] not in on_disk:
+            report["missing_files"] += 1
+    
+    await db.maintenance_runs.insert_one({
+        "id": str(uuid.uuid4()),
+        "task": "sweep_orphans",
+        "report": report,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    })
+    logger.info(f"Orphan sweep: {report}")
+    return report
+
+# ==================== CALENDAR ROUTES ====================
+
+MAX_CALENDAR_MONTHS = 12
+
+def to_iso_date(value) -> str:
+    return value[:10] if isinstance(value, str) else value.strftime('%Y-%m-%d')
+
+async def build_calendar_events(user_id: str, months: list) -> list:
+    """Payment-due, lease-end and vacancy events for the given (year, month) list.
     
+    Everything is loaded in one pass: leases (which carry the property and tenant names),
+    vacancies and their properties, and the paid (lease, period) pairs from a single grouped
+    payments query.
+    """
+    leases = await db.leases.find({"user_id": user_id, "is_active": True}, {"_id": 0}).to_list(None)
+    vacancies = await db.vacancies.find({"user_id": user_id, "is_active": True}, {"_id": 0}).to_list(None)
+    
+    properties = {
+        p['id']: p for p in await db.properties.find(
+            {"id": {"$in": list({v['property_id'] for v in vacancies})}}, {"_id": 0, "id": 1, "name": 1}
+        ).to_list(None)
+    } if vacancies else {}
+    years = [year for year, _ in months]
+    paid = {
+        (group['_id']['lease_id'], group['_id']['year'], group['_id']['month'])
+        for group in await db.payments.aggregate([
+            {"$match": {
+                "user_id": user_id,
+                "lease_id": {"$in": [l['id'] for l in leases]},
+                "period_year": {"$gte": min(years), "$lte": max(years)}
+            }},
+            {"$group": {"_id": {"lease_id": "$lease_id", "year": "$period_year", "month": "$period_month"}}}
+        ]).to_list(None)
+    } if leases else set()
+    
+    month_set = set(months)
+    events = []
     for lease in leases:
-        property_doc = await db.properties.find_one({"id": lease['property_id']}, {"_id": 0})
-        tenant = await db.tenants.find_one({"id": lease['tenant_id']}, {"_id": 0})
-        
-        if property_doc and tenant:
-            # Payment due date
-            payment_day = lease.get('payment_day', 1)
-            due_date = f"{target_year}-{target_month:02d}-{payment_day:02d}"
-            
-            # Check if payment exists
-            payment = await db.payments.find_one({
-                "lease_id": lease['id'],
-                "period_month": target_month,
-                "period_year": target_year
-            })
-            
+        property_name, tenant_name = lease.get('property_name'), lease.get('tenant_name')
+        if not (property_name and tenant_name):
+            continue
+        payment_day = lease.get('payment_day', 1)
+        for year, month in months:
+            is_paid = (lease['id'], year, month) in paid
+            day = min(payment_day, calendar.monthrange(year, month)[1])
             events.append({
-                "id": f"payment-{lease['id']}-{target_month}-{target_year}",
-                "title": f"Loyer - {property_doc['name']}",
-                "date": due_date,
-                "type": "payment_due" if not payment else "payment_done",
+                "id": f"payment-{lease['id']}-{month}-{year}",
+                "title": f"Loyer - {property_name}",
+                "date": f"{year}-{month:02d}-{day:02d}",
+                "type": "payment_done" if is_paid else "payment_due",
                 "related_id": lease['id'],
-                "property_name": property_doc['name'],
-                "tenant_name": f"{tenant['first_name']} {tenant['last_name']}",
+                "property_name": property_name,
+                "tenant_name": tenant_name,
                 "amount": lease['rent_amount'] + lease.get('charges', 0),
-                "is_paid": payment is not None
+                "is_paid": is_paid
             })
-            
-            # Lease end date if within next 3 months
-            if lease.get('end_date'):
-                end_date = datetime.fromisoformat(lease['end_date'].replace('Z', '+00:00') if isinstance(lease['end_date'], str) else lease['end_date'].isoformat())
-                if end_date.month == target_month and end_date.year == target_year:
-                    events.append({
-                        "id": f"lease-end-{lease['id']}",
-                        "title": f"Fin de bail - {property_doc['name']}",
-                        "date": lease['end_date'][:10] if isinstance(lease['end_date'], str) else lease['end_date'].strftime('%Y-%m-%d'),
-                        "type": "lease_end",
-                        "related_id": lease['id'],
-                        "property_name": property_doc['name'],
-                        "tenant_name": f"{tenant['first_name']} {tenant['last_name']}",
-                        "amount": None
-                    })
-    
-    # Get active vacancies
-    vacancies = await db.vacancies.find({"user_id": user_id, "is_active": True}, {"_id": 0}).to_list(1000)
-    
-    for vacancy in vacancies:
-        property_doc = await db.properties.find_one({"id": vacancy['property_id']}, {"_id": 0})
-        if property_doc:
-            start_date = vacancy['start_date']
-            if isinstance(start_date, str):
-                start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            else:
-                start_dt = start_date
-            
-            if start_dt.month == target_month and start_dt.year == target_year:
+        
+        if lease.get('end_date'):
+            end_date = to_iso_date(lease['end_date'])
+            if (int(end_date[:4]), int(end_date[5:7])) in month_set:
                 events.append({
-                    "id": f"vacancy-{vacancy['id']}",
-                    "title": f"Vacance - {property_doc['name']}",
-                    "date": start_date[:10] if isinstance(start_date, str) else start_date.strftime('%Y-%m-%d'),
-                    "type": "vacancy",
-                    "related_id": vacancy['id'],
-                    "property_name": property_doc['name'],
-                    "tenant_name": None,
+                    "id": f"lease-end-{lease['id']}",
+                    "title": f"Fin de bail - {property_name}",
+                    "date": end_date,
+                    "type": "lease_end",
+                    "related_id": lease['id'],
+                    "property_name": property_name,
+                    "tenant_name": tenant_name,
                     "amount": None
                 })
     
+    for vacancy in vacancies:
+        property_doc = properties.get(vacancy['property_id'])
+        start_date = to_iso_date(vacancy['start_date'])
+        if property_doc and (int(start_date[:4]), int(start_date[5:7])) in month_set:
+            events.append({
+                "id": f"vacancy-{vacancy['id']}",
+                "title": f"Vacance - {property_doc['name']}",
+                "date": start_date,
+                "type": "vacancy",
+                "related_id": vacancy['id'],
+                "property_name": property_doc['name'],
+                "tenant_name": None,
+                "amount": None
+            })
+    
+    events.sort(key=lambda event: event['date'])
+    return events
+
+@api_router.get("/calendar/events", response_model=CalendarMonth)
+@cached_response("properties", "leases", "payments", "vacancies", model=CalendarMonth)
+async def get_calendar_events(
+    month: int = None,
+    year: int = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get calendar events for a specific month or all upcoming events"""
+    now = datetime.now(timezone.utc)
+    target_month = month or now.month
+    target_year = year or now.year
+    if not 1 <= target_month <= 12:
+        raise HTTPException(status_code=400, detail="Mois invalide")
+    
+    events = await build_calendar_events(current_user['id'], [(target_year, target_month)])
     return {"events": events, "month": target_month, "year": target_year}
 
+@api_router.get("/calendar/range", response_model=CalendarRange)
+@cached_response("properties", "leases", "payments", "vacancies", model=CalendarRange)
+async def get_calendar_range(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Calendar events for every month between from and to (YYYY-MM, at most a year)"""
+    today = datetime.now(timezone.utc).date()
+    first_month = parse_month(date_from, today)
+    last_month = parse_month(date_to, first_month)
+    n_months = (last_month.year - first_month.year) * 12 + last_month.month - first_month.month + 1
+    if n_months < 1:
+        raise HTTPException(status_code=400, detail="Période invalide")
+    if n_months > MAX_CALENDAR_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Période limitée à {MAX_CALENDAR_MONTHS} mois")
+    
+    months = list(iter_months(first_month, last_month))
+    events = await build_calendar_events(current_user['id'], months)
+    return {"events": events, "from": first_month.isoformat()[:7], "to": last_month.isoformat()[:7]}
+
+# Subscription feed: calendar apps poll it every few minutes, so rendered feeds are kept in memory
+# per token and most polls are answered (often with a 304) without touching Mongo. Entries are
+# marked stale by the routes changing leases, payments or vacancies, and revalidated after
+# CALENDAR_FEED_MAX_AGE seconds so changes made through another worker (including a token
+# rotation) show up too: every rebuild resolves the token in Mongo again.
+CALENDAR_FEED_MONTHS_BEFORE = 3
+CALENDAR_FEED_MONTHS_AFTER = 12
+CALENDAR_FEED_MAX_AGE = 300
+CALENDAR_FEED_MAX_ENTRIES = 1024
+calendar_feeds = OrderedDict()  # token -> {"user_id", "window", "body", "etag", "last_modified", "built_at", "stale"}, LRU
+calendar_feed_tokens: dict = {}  # user_id -> current token
+
+def evict_calendar_feed(token: str):
+    entry = calendar_feeds.pop(token, None)
+    if entry and calendar_feed_tokens.get(entry["user_id"]) == token:
+        del calendar_feed_tokens[entry["user_id"]]
+
+def invalidate_calendar_feed(user_id: str):
+    """Mark the user's rendered feed stale: the next poll rebuilds it"""
+    entry = calendar_feeds.get(calendar_feed_tokens.get(user_id))
+    if entry:
+        entry["stale"] = True
+
+def escape_ics_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def fold_ics_line(line: str) -> str:
+    """Split content lines longer than 75 octets (RFC 5545 §3.1)"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not parts else 74), len(encoded))
+        # Never cut inside a UTF-8 sequence
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+    return "\r\n ".join(parts)
+
+def render_calendar_feed(events: list, stamp: datetime) -> bytes:
+    """VCALENDAR with one all-day VEVENT per calendar event"""
+    dtstamp = stamp.strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//RentMaestro//Calendrier//FR",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        "X-WR-CALNAME:RentMaestro",
+        "X-PUBLISHED-TTL:PT15M",
+    ]
+    for event in events:
+        day = date.fromisoformat(event['date'])
+        details = [event['property_name']]
+        if event.get('tenant_name'):
+            details.append(f"Locataire : {event['tenant_name']}")
+        if event.get('amount') is not None:
+            details.append(f"Montant : {format_euros(event['amount'])}")
+        if event['type'] in ("payment_due", "payment_done"):
+            details.append("Payé" if event['is_paid'] else "En attente de paiement")
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{event['id']}@rentmaestro",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{escape_ics_text(event['title'])}",
+            f"DESCRIPTION:{escape_ics_text(chr(10).join(details))}",
+            f"CATEGORIES:{event['type'].upper()}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(fold_ics_line(line) for line in lines) + "\r\n").encode()
+
+def calendar_feed_window(today: date) -> list:
+    """(year, month) pairs covered by the feed, from a few months back to a year ahead"""
+    first = date(today.year, today.month, 1)
+    for _ in range(CALENDAR_FEED_MONTHS_BEFORE):
+        first = (first - timedelta(days=1)).replace(day=1)
+    months = []
+    for year, month in iter_months(first, date(today.year + 2, 1, 1)):
+        months.append((year, month))
+        if len(months) == CALENDAR_FEED_MONTHS_BEFORE + 1 + CALENDAR_FEED_MONTHS_AFTER:
+            break
+    return months
+
+def not_modified_since(request: Request, last_modified: datetime) -> bool:
+    """If-Modified-Since check, only used when no If-None-Match is sent (RFC 9110 §13.1.3)"""
+    header = request.headers.get("if-modified-since")
+    if not header or request.headers.get("if-none-match"):
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return since.tzinfo is not None and since >= last_modified.replace(microsecond=0)
+
+async def ensure_calendar_feed_indexes():
+    await db.users.create_index("calendar_token", unique=True, sparse=True)
+
+async def get_calendar_feed_token(user_id: str, rotate: bool = False) -> str:
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "calendar_token": 1})
+    token = (user or {}).get("calendar_token")
+    if rotate or not token:
+        old_token = calendar_feed_tokens.get(user_id)
+        token = secrets.token_urlsafe(32)
+        # Set before the update is awaited: a rebuild of the old token in flight must not store it back
+        calendar_feed_tokens[user_id] = token
+        calendar_feeds.pop(old_token, None)
+        await db.users.update_one({"id": user_id}, {"$set": {"calendar_token": token}})
+    return token
+
+@api_router.get("/calendar/feed")
+async def get_calendar_feed_url(current_user: dict = Depends(get_current_user)):
+    """Subscription URL of the user's iCalendar feed"""
+    token = await get_calendar_feed_token(current_user['id'])
+    return {"url": f"/api/calendar/feed.ics?token={token}"}
+
+@api_router.post("/calendar/feed/rotate")
+async def rotate_calendar_feed(current_user: dict = Depends(get_current_user)):
+    """Replace the feed token: the previous subscription URL stops working"""
+    token = await get_calendar_feed_token(current_user['id'], rotate=True)
+    return {"url": f"/api/calendar/feed.ics?token={token}"}
+
+@api_router.get("/calendar/feed.ics")
+async def get_calendar_feed(token: str, request: Request):
+    """iCalendar feed (rent due dates, lease ends, vacancies), authenticated by its token"""
+    now = datetime.now(timezone.utc)
+    months = calendar_feed_window(now.date())
+    window = f"{months[0][0]}-{months[0][1]:02d}"
+    entry = calendar_feeds.get(token)
+    fresh = (
+        entry is not None and not entry["stale"] and entry["window"] == window
+        and (now - entry["built_at"]).total_seconds() < CALENDAR_FEED_MAX_AGE
+    )
+    
+    if not fresh:
+        # The token may have been rotated, possibly by another worker
+        user = await db.users.find_one({"calendar_token": token}, {"_id": 0, "id": 1})
+        if not user:
+            evict_calendar_feed(token)
+            raise HTTPException(status_code=404, detail="Calendrier non trouvé")
+        user_id = user['id']
+        known_token = calendar_feed_tokens.get(user_id)
+        events = await build_calendar_events(user_id, months)
+        if calendar_feed_tokens.get(user_id) not in (known_token, token):
+            # Rotated by this worker while the feed was being built
+            evict_calendar_feed(token)
+            raise HTTPException(status_code=404, detail="Calendrier non trouvé")
+        etag = f'"{hashlib.sha256(json.dumps(events, sort_keys=True).encode()).hexdigest()[:32]}"'
+        if entry and entry["etag"] == etag:
+            # Unchanged content keeps its body and Last-Modified, so clients still get 304s
+            entry.update(user_id=user_id, window=window, built_at=now, stale=False)
+        else:
+            entry = {
+                "user_id": user_id, "window": window, "body": render_calendar_feed(events, now), "etag": etag,
+                "last_modified": now, "built_at": now, "stale": False
+            }
+        calendar_feeds[token] = entry
+        calendar_feed_tokens[user_id] = token
+        while len(calendar_feeds) > CALENDAR_FEED_MAX_ENTRIES:
+            evict_calendar_feed(next(iter(calendar_feeds)))
+    calendar_feeds.move_to_end(token)
+    
+    headers = {
+        "ETag": entry["etag"],
+        "Last-Modified": email.utils.format_datetime(entry["last_modified"], usegmt=True),
+        "Cache-Control": "private, no-cache"
+    }
+    if etag_matches(request, entry["etag"]) or not_modified_since(request, entry["last_modified"]):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=entry["body"],
+        media_type="text/calendar; charset=utf-8",
+        headers={**headers, "Content-Disposition": 'inline; filename="rentmaestro.ics"'}
+    )
+
 # ==================== AUTOMATED REMINDERS ====================
 
 async def send_automated_reminders():
@@ -1794,7 +5095,7 @@ async def update_team(team_id: str, team_data: TeamCreate, current_user: dict =
     return {"message": "Équipe mise à jour avec succès"}
 
 @api_router.delete("/teams/{team_id}")
-async def delete_team(team_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_team(team_id: str, background_tasks: BackgroundTasks, current_user: dict = Depends(get_current_user)):
     """Delete a team (owner only)"""
     # Check if user is owner
     membership = await db.team_members.find_one(
@@ -1805,10 +5106,9 @@ async def delete_team(team_id: str, current_user: dict = Depends(get_current_use
     
     team = await db.teams.find_one({"id": team_id}, {"_id": 0})
     
-    # Delete team, members and invitations
+    # Delete team; members and invitations are removed in the background
     await db.teams.delete_one({"id": team_id})
-    await db.team_members.delete_many({"team_id": team_id})
-    await db.team_invitations.delete_many({"team_id": team_id})
+    background_tasks.add_task(cascade_delete, "team", team_id, current_user['id'])
     
     # Audit log
     await create_audit_log(
@@ -2002,41 +5302,494 @@ async def update_member_role(team_id: str, user_id: str, role: str, current_user
 
 # ==================== AUDIT LOG ROUTES ====================
 
+def serialize_audit_log(log: dict) -> dict:
+    """created_at is stored as a BSON date (read back naive UTC): return it as ISO 8601 with offset"""
+    created_at = log.get('created_at')
+    if isinstance(created_at, datetime):
+        log['created_at'] = (created_at if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc)).isoformat()
+    return log
+
+def encode_audit_cursor(log: dict) -> str:
+    return base64.urlsafe_b64encode(f"{log['created_at']}|{log['id']}".encode()).decode()
+
+def decode_audit_cursor(cursor: str) -> dict:
+    """Keyset condition for entries strictly after the cursor in (created_at, id) descending order"""
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        created_at = datetime.fromisoformat(created_at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": log_id}}
+    ]}
+
+async def find_audit_logs_page(query: dict, limit: int, cursor: str, response: Response) -> list:
+    """One keyset page of audit logs; the next page cursor is sent in the X-Next-Cursor header"""
+    limit = max(1, min(limit, AUDIT_MAX_PAGE_SIZE))
+    if cursor:
+        query = {**query, **decode_audit_cursor(cursor)}
+    
+    logs = await db.audit_logs.find(query, {"_id": 0}).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit).to_list(limit)
+    logs = [serialize_audit_log(log) for log in logs]
+    
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = encode_audit_cursor(logs[-1])
+    return logs
+
 @api_router.get("/audit-logs")
 async def get_audit_logs(
+    response: Response,
     entity_type: str = None,
     entity_id: str = None,
     limit: int = 50,
+    cursor: str = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get audit logs for the current user"""
+    await audit_writer.flush()
     query = {"user_id": current_user['id']}
     if entity_type:
         query["entity_type"] = entity_type
     if entity_id:
         query["entity_id"] = entity_id
     
-    logs = await db.audit_logs.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
-    return logs
+    return await find_audit_logs_page(query, limit, cursor, response)
 
 @api_router.get("/audit-logs/entity/{entity_type}/{entity_id}")
-async def get_entity_history(entity_type: str, entity_id: str, current_user: dict = Depends(get_current_user)):
+async def get_entity_history(
+    entity_type: str,
+    entity_id: str,
+    response: Response,
+    limit: int = 100,
+    cursor: str = None,
+    current_user: dict = Depends(get_current_user)
+):
     """Get history for a specific entity"""
-    logs = await db.audit_logs.find(
-        {"user_id": current_user['id'], "entity_type": entity_type, "entity_id": entity_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    return logs
+    await audit_writer.flush()
+    query = {"user_id": current_user['id'], "entity_type": entity_type, "entity_id": entity_id}
+    return await find_audit_logs_page(query, limit, cursor, response)
+
+AUDIT_EXPORT_FIELDS = ["created_at", "user_name", "action", "entity_type", "entity_id", "entity_name", "team_id", "changes"]
+
+def format_audit_export_row(log: dict, export_format: str) -> str:
+    serialize_audit_log(log)
+    if export_format == "ndjson":
+        return json.dumps(log, ensure_ascii=False) + "\n"
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([
+        json.dumps(log[field], ensure_ascii=False) if field == "changes" and log.get(field) else log.get(field, "")
+        for field in AUDIT_EXPORT_FIELDS
+    ])
+    return buffer.getvalue()
+
+async def stream_audit_export(query: dict, export_format: str, compress: bool):
+    """Yield the export in ~64KB pieces while reading the cursor in batches (constant memory)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31: gzip container
+    
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+    
+    pending = []
+    pending_size = 0
+    if export_format == "csv":
+        # BOM so that Excel detects UTF-8
+        pending.append(encode("\ufeff" + ",".join(AUDIT_EXPORT_FIELDS) + "\r\n"))
+    
+    cursor = db.audit_logs.find(query, {"_id": 0}).sort([("created_at", 1), ("id", 1)]).batch_size(AUDIT_EXPORT_BATCH_SIZE)
+    async for log in cursor:
+        chunk = encode(format_audit_export_row(log, export_format))
+        if chunk:
+            pending.append(chunk)
+            pending_size += len(chunk)
+        if pending_size >= 64 * 1024:
+            yield b"".join(pending)
+            pending = []
+            pending_size = 0
+    
+    if compressor:
+        pending.append(compressor.flush())
+    yield b"".join(pending)
+
+def parse_utc_datetime(value: str) -> datetime:
+    """ISO date or date-time; an explicit offset is converted to UTC, no offset means UTC"""
+    parsed = datetime.fromisoformat(value)
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed.astimezone(timezone.utc)
+
+@api_router.get("/audit-logs/export")
+async def export_audit_logs(
+    export_format: str = Query("csv", alias="format"),
+    compress: bool = Query(False, alias="gzip"),
+    date_from: str = None,
+    date_to: str = None,
+    entity_type: str = None,
+    entity_id: str = None,
+    action: str = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream the complete change history (CSV or NDJSON, optionally gzip) for a date range"""
+    if export_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Format invalide (csv ou ndjson)")
+    
+    await audit_writer.flush()
+    query = {"user_id": current_user['id']}
+    if entity_type:
+        query["entity_type"] = entity_type
+    if entity_id:
+        query["entity_id"] = entity_id
+    if action:
+        query["action"] = action
+    
+    period = {}
+    try:
+        if date_from:
+            period["$gte"] = parse_utc_datetime(date_from)
+        if date_to:
+            end = parse_utc_datetime(date_to)
+            # A date is inclusive (the whole day); a date-time is the end instant itself
+            if len(date_to) == 10:
+                period["$lt"] = end + timedelta(days=1)
+            else:
+                period["$lte"] = end
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date invalide (format AAAA-MM-JJ)")
+    if period:
+        query["created_at"] = period
+    
+    extension = export_format + (".gz" if compress else "")
+    if compress:
+        media_type = "application/gzip"
+    else:
+        media_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson"
+    filename = f"historique_{datetime.now().strftime('%Y%m%d')}.{extension}"
+    
+    return StreamingResponse(
+        stream_audit_export(query, export_format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+# ==================== AUDIT LOG STORAGE ====================
+
+async def ensure_audit_log_indexes():
+    """Indexes backing user/entity browsing in (created_at, id) order, plus the optional TTL"""
+    await db.audit_logs.create_index([("user_id", 1), ("created_at", -1), ("id", -1)], name="audit_user_time")
+    await db.audit_logs.create_index(
+        [("user_id", 1), ("entity_type", 1), ("entity_id", 1), ("created_at", -1), ("id", -1)],
+        name="audit_user_entity_time"
+    )
+    await db.audit_logs.create_index(
+        [("user_id", 1), ("entity_type", 1), ("created_at", -1), ("id", -1)],
+        name="audit_user_type_time"
+    )
+    
+    if AUDIT_RETENTION_DAYS and AUDIT_RETENTION_MODE == "ttl":
+        expire_after = AUDIT_RETENTION_DAYS * 86400
+        try:
+            await db.audit_logs.create_index("created_at", name="audit_ttl", expireAfterSeconds=expire_after)
+        except OperationFailure:
+            # Retention changed: update the existing TTL in place
+            await db.command("collMod", "audit_logs", index={"name": "audit_ttl", "expireAfterSeconds": expire_after})
+    else:
+        try:
+            await db.audit_logs.drop_index("audit_ttl")
+        except OperationFailure:
+            pass
+
+async def migrate_audit_log_timestamps():
+    """Convert legacy ISO string created_at values to BSON dates (required for sorting and TTL)"""
+    migrated = 0
+    while True:
+        legacy = await db.audit_logs.find(
+            {"created_at": {"$type": "string"}}, {"_id": 1, "created_at": 1}
+        ).to_list(1000)
+        if not legacy:
+            break
+        await db.audit_logs.bulk_write([
+            UpdateOne(
+                {"_id": log['_id']},
+                {"$set": {"created_at": datetime.fromisoformat(log['created_at'].replace('Z', '+00:00'))}}
+            )
+            for log in legacy
+        ], ordered=False)
+        migrated += len(legacy)
+    if migrated:
+        logger.info(f"Migrated {migrated} audit log timestamp(s) to dates")
+
+def write_audit_archive(archive_path: Path, logs: list):
+    """Append a batch of entries to a gzip JSONL archive file"""
+    with gzip.open(archive_path, "at", encoding="utf-8") as f:
+        for log in logs:
+            log.pop('_id', None)
+            f.write(json.dumps(serialize_audit_log(log), ensure_ascii=False) + "\n")
+
+async def archive_audit_logs():
+    """Background task moving entries older than the retention period to monthly gzip JSONL files"""
+    if not AUDIT_RETENTION_DAYS or AUDIT_RETENTION_MODE != "archive":
+        return
+    
+    cutoff = datetime.now(timezone.utc) - timedelta(days=AUDIT_RETENTION_DAYS)
+    AUDIT_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    
+    while True:
+        oldest = await db.audit_logs.find_one(
+            {"created_at": {"$lt": cutoff}}, {"created_at": 1}, sort=[("created_at", 1)]
+        )
+        if not oldest:
+            break
+        
+        # One partition per calendar month, the current one being cut at the retention limit
+        month_start = oldest['created_at'].replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=timezone.utc)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        month_end = min(next_month, cutoff)
+        period = {"created_at": {"$gte": month_start, "$lt": month_end}}
+        
+        # Written to a temporary file, published only once complete
+        run_stamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        archive_path = AUDIT_ARCHIVE_DIR / f"audit-{month_start.strftime('%Y-%m')}-{run_stamp}.jsonl.gz"
+        temp_path = archive_path.with_suffix(".tmp")
+        
+        archived = 0
+        batch = []
+        async for log in db.audit_logs.find(period).sort("created_at", 1).batch_size(1000):
+            batch.append(log)
+            if len(batch) >= 1000:
+                await asyncio.to_thread(write_audit_archive, temp_path, batch)
+                archived += len(batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(write_audit_archive, temp_path, batch)
+            archived += len(batch)
+        
+        os.replace(temp_path, archive_path)
+        await db.audit_logs.delete_many(period)
+        logger.info(f"Archived {archived} audit log(s) to {archive_path.name}")
+
+async def init_audit_log_storage():
+    await migrate_audit_log_timestamps()
+    await ensure_audit_log_indexes()
+
+# ==================== QUERY MONITORING MIDDLEWARE ====================
+
+# Totals per route since the process started
+route_query_stats = {}
+
+def request_route(scope) -> str:
+    # The router stores the matched endpoint in the scope
+    endpoint = scope.get("endpoint")
+    return f"{scope['method']} {endpoint.__name__}" if endpoint else f"{scope['method']} (sans route)"
+
+def report_request_queries(route: str, stats: RequestQueryStats):
+    """Add a request to its route totals, warning on budget overruns and probable N+1s"""
+    totals = route_query_stats.setdefault(route, {
+        "requests": 0, "commands": 0, "max_commands": 0, "duration_ms": 0.0,
+        "collections": Counter(), "n_plus_one": Counter()
+    })
+    totals["requests"] += 1
+    totals["commands"] += stats.count
+    totals["max_commands"] = max(totals["max_commands"], stats.count)
+    totals["duration_ms"] += stats.duration_ms
+    totals["collections"].update(stats.collections)
+    
+    if QUERY_BUDGET and stats.count > QUERY_BUDGET:
+        logger.warning(
+            f"{route}: {stats.count} Mongo commands (budget {QUERY_BUDGET}) in {stats.duration_ms:.1f} ms, "
+            f"by collection: {dict(stats.collections.most_common())}"
+        )
+    for shape, count in stats.find_one_shapes.items():
+        if count >= QUERY_REPEAT_THRESHOLD:
+            totals["n_plus_one"][shape] += 1
+            logger.warning(f"{route}: probable N+1, {count} identical find_one on {shape}")
+
+class QueryMonitoringMiddleware:
+    """Per-request accounting of Mongo commands, also reported in a Server-Timing header"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestQueryStats()
+        token = request_query_stats.set(stats)
+        
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", f'db;dur={stats.duration_ms:.1f};desc="{stats.count} commands"'
+                )
+            elif message["type"] == "http.response.body" and not message.get("more_body", False) and not stats.closed:
+                # Streamed bodies may still query while they are sent: totals are taken at the end
+                stats.close()
+                report_request_queries(request_route(scope), stats)
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            request_query_stats.reset(token)
+
+@api_router.get("/monitoring/queries", response_model=List[dict])
+async def get_query_stats(current_user: dict = Depends(get_current_user)):
+    """Mongo commands per route since the server started, most expensive first (operators only)"""
+    # Route names and volumes cover every user of the server: not exposed to regular accounts
+    if current_user['email'].lower() not in QUERY_STATS_OPERATORS:
+        raise HTTPException(status_code=403, detail="Accès réservé aux opérateurs")
+    return sorted([
+        {
+            "route": route,
+            "requests": totals["requests"],
+            "commands": totals["commands"],
+            "avg_commands": round(totals["commands"] / totals["requests"], 2),
+            "max_commands": totals["max_commands"],
+            "duration_ms": round(totals["duration_ms"], 1),
+            "avg_duration_ms": round(totals["duration_ms"] / totals["requests"], 2),
+            "collections": dict(totals["collections"]),
+            "n_plus_one": dict(totals["n_plus_one"])
+        }
+        for route, totals in route_query_stats.items()
+    ], key=lambda row: row["commands"], reverse=True)
+
+# ==================== RESPONSE COMPRESSION ====================
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))  # Bytes; smaller bodies are not worth the CPU
+# Preference order when the client accepts several encodings
+COMPRESSION_ENCODINGS = ("zstd", "br", "gzip")
+# Already compressed formats (XLSX and DOCX are ZIP containers)
+COMPRESSION_EXCLUDED_TYPES = (
+    "image/", "video/", "audio/", "font/woff", "application/pdf", "application/zip", "application/gzip",
+    "application/x-gzip", "application/octet-stream", "application/vnd.openxmlformats-officedocument",
+)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding allowed by an Accept-Encoding header (q=0 refuses an encoding)"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in COMPRESSION_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def get_compressor(encoding: str) -> tuple:
+    """(compress, finish) functions of a streaming compressor.
+    
+    compress flushes what it was given so streamed chunks (NDJSON, exports) reach the client at once.
+    """
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        return (lambda data: compressor.compress(data) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                compressor.flush)
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=4)
+        return lambda data: compressor.process(data) + compressor.flush(), compressor.finish
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return lambda data: compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def is_compressible(status_code: int, headers: MutableHeaders) -> bool:
+    content_type = headers.get("content-type", "").lower()
+    return (
+        status_code not in (204, 206, 304)
+        and "content-encoding" not in headers
+        and bool(content_type)
+        and not content_type.startswith(COMPRESSION_EXCLUDED_TYPES)
+    )
+
+class CompressionMiddleware:
+    """Negotiated zstd / brotli / gzip compression of HTTP responses.
+    
+    Single-message bodies are compressed when they reach COMPRESSION_MIN_SIZE; streamed bodies are
+    compressed chunk by chunk as they are sent.
+    """
+    
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+        
+        # The response start is held until the first body chunk tells whether to compress
+        state = {"start": None, "compress": None, "finish": None}
+        
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if state["start"] is None:
+                if state["compress"] and message["type"] == "http.response.body":
+                    more_body = message.get("more_body", False)
+                    data = state["compress"](message.get("body", b""))
+                    if not more_body:
+                        data += state["finish"]()
+                    message = {"type": "http.response.body", "body": data, "more_body": more_body}
+                await send(message)
+                return
+            
+            start, state["start"] = state["start"], None
+            headers = MutableHeaders(scope=start)
+            if message["type"] != "http.response.body" or not is_compressible(start["status"], headers):
+                await send(start)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if not more_body and len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+            
+            compress, finish = get_compressor(encoding)
+            headers["Content-Encoding"] = encoding
+            if more_body:
+                del headers["Content-Length"]
+                state["compress"], state["finish"] = compress, finish
+                data = compress(body)
+            else:
+                data = compress(body) + finish()
+                headers["Content-Length"] = str(len(data))
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                # The encoded representation differs byte for byte from the identity one
+                headers["ETag"] = "W/" + headers["etag"]
+            await send(start)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
+
+if QUERY_MONITORING:
+    app.add_middleware(QueryMonitoringMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -2056,10 +5809,57 @@ async def startup_event():
         id="automated_reminders",
         replace_existing=True
     )
+    # Remove abandoned chunked uploads every hour
+    scheduler.add_job(
+        cleanup_stale_uploads,
+        CronTrigger(minute=30),
+        id="cleanup_stale_uploads",
+        replace_existing=True
+    )
+    # Catch up document renditions (e.g. lost on restart)
+    scheduler.add_job(
+        process_pending_renditions,
+        CronTrigger(minute="*/10"),
+        id="process_pending_renditions",
+        replace_existing=True
+    )
+    # Reconcile documents and uploaded files every night
+    scheduler.add_job(
+        sweep_orphans,
+        CronTrigger(hour=3, minute=0),
+        id="sweep_orphans",
+        replace_existing=True
+    )
+    # Rent-due ledger entries of the day
+    scheduler.add_job(
+        sync_ledgers,
+        CronTrigger(hour=0, minute=30),
+        id="sync_ledgers",
+        replace_existing=True
+    )
+    # Move expired audit logs to monthly archives
+    scheduler.add_job(
+        archive_audit_logs,
+        CronTrigger(day=1, hour=4, minute=0),
+        id="archive_audit_logs",
+        replace_existing=True
+    )
     scheduler.start()
     logger.info("Scheduler started for automated reminders")
+    
+    audit_writer.start()
+    asyncio.create_task(init_audit_log_storage())
+    asyncio.create_task(ensure_receipt_cache_indexes())
+    asyncio.create_task(ensure_forecast_cache_indexes())
+    asyncio.create_task(ensure_calendar_feed_indexes())
+    asyncio.create_task(init_ledger())
+    asyncio.create_task(init_display_fields())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     scheduler.shutdown()
+    # Write queued audit entries before closing the client
+    await audit_writer.stop()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
     client.close()
@@ -0,0 +1,65 @@
+"""
+Shared fixtures for the RentMaestro API test suites
+"""
+import pytest
+import requests
+import os
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+# Suites exercising background jobs import the server module in-process; its client connects lazily
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test_database')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def register_session(name):
+    """Register a unique test user and return a session authenticated as that user"""
+    # No default Content-Type: requests sets it per call (JSON bodies, multipart uploads)
+    session = requests.Session()
+
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    register_response = session.post(
+        f"{BASE_URL}/api/auth/register",
+        json={
+            "email": f"test_{name}_{timestamp}_{uuid.uuid4().hex[:6]}@example.com",
+            "password": "TestPass123!",
+            "name": f"Test {name.title()} {timestamp}"
+        }
+    )
+
+    if register_response.status_code != 200:
+        pytest.skip(f"Failed to register test user: {register_response.text}")
+    token = register_response.json().get('access_token')
+    session.headers.update({'Authorization': f'Bearer {token}'})
+    return {'session': session}
+
+
+@pytest.fixture(scope="module")
+def auth_session(request):
+    """Authenticated session of a user created for the test module"""
+    return register_session(request.module.__name__.rsplit('.', 1)[-1].removeprefix('test_'))
+
+
+@pytest.fixture(scope="module")
+def new_auth_session():
+    """Register an additional user, for tests that need a portfolio of their own"""
+    return register_session
+
+
+@pytest.fixture
+def memory_db(monkeypatch, tmp_path):
+    """In-process server bound to an in-memory database and temporary upload directories"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import server
+    database = mongomock_motor.AsyncMongoMockClient()['test_database']
+    monkeypatch.setattr(server, "db", database)
+    for name in ("UPLOADS_DIR", "RENDITIONS_DIR", "RECEIPTS_DIR"):
+        directory = tmp_path / name.lower()
+        directory.mkdir()
+        monkeypatch.setattr(server, name, directory)
+    return database
@@ -0,0 +1,267 @@
+"""
+Test suite for Analytics features in RentMaestro
+Tests: Portfolio analytics (occupancy, collection rate, days late, yields), occupancy timeline, cash-flow forecast
+"""
+import pytest
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def portfolio(auth_session):
+    """Two properties: one let all of 2023 (paid 4 days late), one let from July 2023"""
+    session = auth_session['session']
+    ids = {}
+    for key, price in (("let", 120000.0), ("half", None)):
+        ids[key] = session.post(f"{BASE_URL}/api/properties", json={
+            "name": f"TEST_Analytics_{key}",
+            "address": "1 rue du Test",
+            "city": "Lille",
+            "postal_code": "59000",
+            "property_type": "apartment",
+            "surface": 30.0,
+            "rooms": 1,
+            "rent_amount": 600.0,
+            "purchase_price": price,
+            "annual_costs": 1200.0
+        }).json()['id']
+
+    for key, start, months in (("let", "2023-01-01", range(1, 13)), ("half", "2023-07-01", range(7, 13))):
+        tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+            "first_name": "TEST",
+            "last_name": f"Analytics{key}",
+            "email": f"analytics_{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "0600000000"
+        }).json()['id']
+        lease_id = session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": ids[key],
+            "tenant_id": tenant_id,
+            "start_date": start,
+            "rent_amount": 600.0,
+            "charges": 0,
+            "deposit": 600.0
+        }).json()['id']
+        rows = [{"lease_id": lease_id, "amount": 600.0, "payment_date": f"2023-{m:02d}-05",
+                 "period_month": m, "period_year": 2023} for m in months]
+        assert len(session.post(f"{BASE_URL}/api/payments/bulk", json=rows).json()['created']) == len(rows)
+    return ids
+
+
+@pytest.fixture(scope="module")
+def bounded_portfolio(new_auth_session):
+    """Own user with two properties: one let during 2020, one from June to December 2020"""
+    session = new_auth_session("analytics_bounded")['session']
+    ids = {}
+    for key, start in (("year", "2020-01-01"), ("half", "2020-06-01")):
+        ids[key] = session.post(f"{BASE_URL}/api/properties", json={
+            "name": f"TEST_Bounded_{key}",
+            "address": "4 rue du Test",
+            "city": "Lille",
+            "postal_code": "59000",
+            "property_type": "apartment",
+            "surface": 30.0,
+            "rooms": 1,
+            "rent_amount": 500.0
+        }).json()['id']
+        tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+            "first_name": "TEST",
+            "last_name": f"Bounded{key}",
+            "email": f"bounded_{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "0600000000"
+        }).json()['id']
+        assert session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": ids[key],
+            "tenant_id": tenant_id,
+            "start_date": start,
+            "end_date": "2020-12-31",
+            "rent_amount": 500.0,
+            "deposit": 500.0
+        }).status_code == 200
+    return {"session": session, **ids}
+
+
+class TestPortfolioAnalytics:
+    """Vectorised portfolio metrics tests"""
+
+    def test_monthly_series(self, auth_session, portfolio):
+        """Occupancy, collection and lateness per month"""
+        session = auth_session['session']
+        response = session.get(f"{BASE_URL}/api/analytics/portfolio?date_from=2023-01&date_to=2023-12")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['months']) == 12
+        assert data['occupancy_rate'][0] == 50.0
+        assert data['occupancy_rate'][11] == 100.0
+        assert data['expected'][0] == 600.0
+        assert data['expected'][11] == 1200.0
+        assert data['collection_rate'] == [100.0] * 12
+        assert data['average_days_late'] == [4.0] * 12
+        assert data['summary']['average_days_late'] == 4.0
+
+    def test_property_yields(self, auth_session, portfolio):
+        """Gross and net yields use purchase price and annual costs"""
+        session = auth_session['session']
+        data = session.get(f"{BASE_URL}/api/analytics/portfolio?date_from=2023-01&date_to=2023-12").json()
+        let = next(p for p in data['properties'] if p['property_id'] == portfolio['let'])
+        assert let['occupancy_rate'] == 100.0
+        assert let['gross_yield'] == 6.0
+        assert let['net_yield'] == 5.0
+        half = next(p for p in data['properties'] if p['property_id'] == portfolio['half'])
+        assert half['gross_yield'] is None
+        assert half['collected'] == 3600.0
+        # Only priced properties count in the portfolio yield
+        assert data['summary']['gross_yield'] == 6.0
+
+    def test_occupancy_before_lease_history(self, bounded_portfolio):
+        """Months before the first lease report no occupancy"""
+        session = bounded_portfolio['session']
+        data = session.get(f"{BASE_URL}/api/analytics/portfolio?date_from=2019-01&date_to=2020-12").json()
+        assert data['occupancy_rate'][:12] == [0.0] * 12
+        assert data['occupancy_rate'][12] == 50.0
+        assert data['occupancy_rate'][23] == 100.0
+        half = next(p for p in data['properties'] if p['property_id'] == bounded_portfolio['half'])
+        assert half['occupancy_rate'] == round(214 / 731 * 100, 2)
+
+    def test_invalid_range(self, auth_session):
+        """Ranges must be ordered and at most 10 years"""
+        session = auth_session['session']
+        assert session.get(f"{BASE_URL}/api/analytics/portfolio?date_from=2023-06&date_to=2023-01").status_code == 400
+        assert session.get(f"{BASE_URL}/api/analytics/portfolio?date_from=2000-01&date_to=2023-01").status_code == 400
+
+
+class TestOccupancyTimeline:
+    """Interval-based occupancy engine tests"""
+
+    def test_intervals_vacancies_and_conflicts(self, auth_session):
+        """Overlapping leases merge into one interval and are reported; gaps become vacancies"""
+        session = auth_session['session']
+        property_id = session.post(f"{BASE_URL}/api/properties", json={
+            "name": "TEST_Timeline",
+            "address": "2 rue du Test",
+            "city": "Lille",
+            "postal_code": "59000",
+            "property_type": "apartment",
+            "surface": 30.0,
+            "rooms": 1,
+            "rent_amount": 600.0
+        }).json()['id']
+        tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+            "first_name": "TEST",
+            "last_name": "Timeline",
+            "email": f"timeline_{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "0600000000"
+        }).json()['id']
+        lease_ids = []
+        for start, end in (("2023-01-01", "2023-02-15"), ("2023-02-10", "2023-02-20"), ("2023-04-01", "2023-06-30")):
+            lease_ids.append(session.post(f"{BASE_URL}/api/leases", json={
+                "property_id": property_id,
+                "tenant_id": tenant_id,
+                "start_date": start,
+                "end_date": end,
+                "rent_amount": 600.0,
+                "deposit": 600.0
+            }).json()['id'])
+
+        response = session.get(
+            f"{BASE_URL}/api/occupancy/timeline?date_from=2023-01&date_to=2023-06&property_id={property_id}"
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['properties']) == 1
+        timeline = data['properties'][0]
+        assert timeline['intervals'] == [
+            {"start": "2023-01-01", "end": "2023-02-20"},
+            {"start": "2023-04-01", "end": "2023-06-30"}
+        ]
+        assert timeline['occupied_days'] == [31, 20, 0, 30, 31, 30]
+        assert timeline['occupancy_rate'][2] == 0.0
+        assert timeline['vacancies'][0] == {"start": "2023-02-21", "end": "2023-03-31", "days": 39, "ongoing": False}
+        assert timeline['vacancies'][1]['start'] == "2023-07-01"
+        assert timeline['vacancies'][1]['ongoing'] is True
+        assert timeline['conflicts'] == [{
+            "lease_id": lease_ids[0],
+            "overlapping_lease_id": lease_ids[1],
+            "start": "2023-02-10",
+            "end": "2023-02-15"
+        }]
+        assert data['conflicts_count'] == 1
+
+    def test_range_beyond_lease_history(self, bounded_portfolio):
+        """Days before the first lease and after the last are vacant for every property"""
+        session = bounded_portfolio['session']
+        response = session.get(f"{BASE_URL}/api/occupancy/timeline?date_from=2019-01&date_to=2021-12")
+        assert response.status_code == 200
+        timelines = {t['property_id']: t for t in response.json()['properties']}
+        year, half = timelines[bounded_portfolio['year']], timelines[bounded_portfolio['half']]
+        assert year['occupied_days'][:12] == [0] * 12
+        assert year['occupied_days'][24:] == [0] * 12
+        assert sum(year['occupied_days']) == 366
+        assert half['occupied_days'][:17] == [0] * 17
+        assert half['occupied_days'][24:] == [0] * 12
+        assert sum(half['occupied_days']) == 214
+
+    def test_invalid_range(self, auth_session):
+        """Ranges must be ordered"""
+        session = auth_session['session']
+        assert session.get(f"{BASE_URL}/api/occupancy/timeline?date_from=2023-06&date_to=2023-01").status_code == 400
+
+
+class TestCashFlowForecast:
+    """Cached cash-flow forecast tests"""
+
+    def test_forecast_cached_and_invalidated(self, auth_session, portfolio):
+        """A second call hits the cache; a new lease invalidates it"""
+        session = auth_session['session']
+        first = session.get(f"{BASE_URL}/api/analytics/forecast?months=24")
+        assert first.status_code == 200
+        data = first.json()
+        assert len(data['months']) == 24
+        assert len(data['expected']) == 24
+        assert data['cached'] is False
+        again = session.get(f"{BASE_URL}/api/analytics/forecast?months=24").json()
+        assert again['cached'] is True
+        assert again['expected'] == data['expected']
+
+        property_id = session.post(f"{BASE_URL}/api/properties", json={
+            "name": "TEST_Forecast",
+            "address": "3 rue du Test",
+            "city": "Lille",
+            "postal_code": "59000",
+            "property_type": "apartment",
+            "surface": 30.0,
+            "rooms": 1,
+            "rent_amount": 800.0
+        }).json()['id']
+        tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+            "first_name": "TEST",
+            "last_name": "Forecast",
+            "email": f"forecast_{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "0600000000"
+        }).json()['id']
+        session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": property_id,
+            "tenant_id": tenant_id,
+            "start_date": "2023-01-01",
+            "rent_amount": 800.0,
+            "deposit": 800.0
+        })
+
+        updated = session.get(f"{BASE_URL}/api/analytics/forecast?months=24").json()
+        assert updated['cached'] is False
+        assert updated['contractual'][0] == data['contractual'][0] + 800.0
+        forecast = next(p for p in updated['properties'] if p['property_id'] == property_id)
+        # Open-ended lease: never re-let
+        assert forecast['relet_date'] is None
+
+    def test_invalid_horizon(self, auth_session):
+        """The horizon is 12 to 36 months"""
+        session = auth_session['session']
+        assert session.get(f"{BASE_URL}/api/analytics/forecast?months=6").status_code == 400
+        assert session.get(f"{BASE_URL}/api/analytics/forecast?months=48").status_code == 400
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,169 @@
+"""
+Test suite for the audit log queue in RentMaestro
+Tests: batching, interval and shutdown flushes, retries after failed writes, read-your-writes
+"""
+import pytest
+import asyncio
+import os
+import uuid
+from types import SimpleNamespace
+from pymongo.errors import AutoReconnect
+
+import server
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+class MemoryAuditLogs:
+    """audit_logs collection recording insert_many batches"""
+
+    def __init__(self, failures=0, delay=0):
+        self.failures = failures
+        self.delay = delay
+        self.batches = []
+        self.entries = []
+
+    def with_options(self, **kwargs):
+        return self
+
+    async def insert_one(self, entry):
+        self.entries.append(entry)
+
+    async def insert_many(self, entries, ordered=True):
+        self.batches.append(len(entries))
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection lost")
+        self.entries.extend(entries)
+
+
+@pytest.fixture
+def audit_logs(monkeypatch):
+    collection = MemoryAuditLogs()
+    monkeypatch.setattr(server, "db", SimpleNamespace(audit_logs=collection))
+    return collection
+
+
+def make_writer(batch_size=100, flush_interval=60.0):
+    return server.AuditLogWriter(batch_size, flush_interval, server.WriteConcern(w=1))
+
+
+def entry(i):
+    return {"id": str(i), "action": "create"}
+
+
+class TestAuditQueue:
+    """AuditLogWriter flushes"""
+
+    def test_flush_at_batch_size(self, audit_logs):
+        """A full batch is written at once, the remainder on shutdown"""
+        async def scenario():
+            writer = make_writer(batch_size=3)
+            writer.start()
+            for i in range(3):
+                await writer.add(entry(i))
+            await asyncio.sleep(0.02)
+            assert audit_logs.batches == [3]
+            for i in range(3, 5):
+                await writer.add(entry(i))
+            await asyncio.sleep(0.02)
+            assert audit_logs.batches == [3]
+            await writer.stop()
+
+        asyncio.run(scenario())
+        assert audit_logs.batches == [3, 2]
+        assert [e['id'] for e in audit_logs.entries] == [str(i) for i in range(5)]
+
+    def test_flush_on_interval(self, audit_logs):
+        """Entries below the batch size are written after the flush interval"""
+        async def scenario():
+            writer = make_writer(flush_interval=0.05)
+            writer.start()
+            await writer.add(entry(1))
+            assert audit_logs.entries == []
+            await asyncio.sleep(0.2)
+            assert [e['id'] for e in audit_logs.entries] == ["1"]
+            await writer.stop()
+
+        asyncio.run(scenario())
+
+    def test_flush_on_shutdown(self, audit_logs):
+        """Stopping waits for the batch in flight and writes what was queued meanwhile"""
+        audit_logs.delay = 0.1
+
+        async def scenario():
+            writer = make_writer(batch_size=2)
+            writer.start()
+            await writer.add(entry(1))
+            await writer.add(entry(2))
+            await asyncio.sleep(0.02)
+            assert audit_logs.batches == [2]
+            await writer.add(entry(3))
+            await writer.stop()
+
+        asyncio.run(scenario())
+        assert sorted(e['id'] for e in audit_logs.entries) == ["1", "2", "3"]
+
+    def test_requeue_after_failed_write(self, audit_logs):
+        """A failed insert_many keeps its entries for the next flush"""
+        audit_logs.failures = 1
+
+        async def scenario():
+            writer = make_writer()
+            writer.start()
+            await writer.add(entry(1))
+            await writer.add(entry(2))
+            await writer.flush()
+            assert audit_logs.entries == []
+            assert [e['id'] for e in writer.pending] == ["1", "2"]
+            await writer.flush()
+            await writer.stop()
+
+        asyncio.run(scenario())
+        assert [e['id'] for e in audit_logs.entries] == ["1", "2"]
+
+    def test_flush_waits_for_batch_in_flight(self, audit_logs):
+        """A read-your-writes flush returns only once the other flush's batch is written"""
+        audit_logs.delay = 0.05
+
+        async def scenario():
+            writer = make_writer()
+            writer.start()
+            await writer.add(entry(1))
+            in_flight = asyncio.create_task(writer.flush())
+            await asyncio.sleep(0)
+            await writer.flush()
+            assert [e['id'] for e in audit_logs.entries] == ["1"]
+            await in_flight
+            await writer.stop()
+
+        asyncio.run(scenario())
+
+
+class TestAuditReadYourWrites:
+    """Queued entries are visible to the requests that read them"""
+
+    def test_audit_logs_include_queued_entries(self, auth_session):
+        """Entries of writes just made are listed without waiting for the flush interval"""
+        session = auth_session['session']
+        tenant_ids = []
+        for i in range(5):
+            response = session.post(f"{BASE_URL}/api/tenants", json={
+                "first_name": "TEST",
+                "last_name": f"Queue{i}",
+                "email": f"queue_{uuid.uuid4().hex[:8]}@example.com",
+                "phone": "0600000000"
+            })
+            assert response.status_code == 200
+            tenant_ids.append(response.json()['id'])
+
+        response = session.get(f"{BASE_URL}/api/audit-logs?entity_type=tenant")
+        assert response.status_code == 200
+        logged = {log['entity_id'] for log in response.json() if log['action'] == "create"}
+        assert set(tenant_ids) <= logged
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
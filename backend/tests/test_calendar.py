@@ -0,0 +1,145 @@
+"""
+Test suite for Calendar features in RentMaestro
+Tests: Multi-month calendar range, iCalendar subscription feed
+"""
+import pytest
+import requests
+import os
+import uuid
+from datetime import datetime
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+def create_lease(session, **fields):
+    property_id = session.post(f"{BASE_URL}/api/properties", json={
+        "name": f"TEST_Calendar_{uuid.uuid4().hex[:8]}",
+        "address": "4 rue du Test",
+        "city": "Nantes",
+        "postal_code": "44000",
+        "property_type": "apartment",
+        "surface": 30.0,
+        "rooms": 1,
+        "rent_amount": 700.0
+    }).json()['id']
+    tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+        "first_name": "TEST",
+        "last_name": "Calendar",
+        "email": f"calendar_{uuid.uuid4().hex[:8]}@example.com",
+        "phone": "0600000000"
+    }).json()['id']
+    lease = {
+        "property_id": property_id,
+        "tenant_id": tenant_id,
+        "start_date": "2025-01-01",
+        "rent_amount": 700.0,
+        "charges": 30.0,
+        "deposit": 700.0,
+        **fields
+    }
+    response = session.post(f"{BASE_URL}/api/leases", json=lease)
+    assert response.status_code == 200
+    return {**lease, "id": response.json()['id']}
+
+
+@pytest.fixture(scope="module")
+def calendar_data(auth_session):
+    """A lease due on the 31st ending in June 2025 (paid in March), and a vacancy from September 2025"""
+    session = auth_session['session']
+    lease = create_lease(session, payment_day=31, end_date="2025-06-30")
+    assert session.post(f"{BASE_URL}/api/payments", json={
+        "lease_id": lease['id'],
+        "amount": 730.0,
+        "payment_date": "2025-03-28",
+        "period_month": 3,
+        "period_year": 2025
+    }).status_code == 200
+    terminated = create_lease(session)
+    assert session.put(
+        f"{BASE_URL}/api/leases/{terminated['id']}/terminate?end_date=2025-09-15"
+    ).status_code == 200
+    return {"lease": lease, "terminated": terminated}
+
+
+class TestCalendarRange:
+    """Batched multi-month calendar tests"""
+
+    def test_year_range(self, auth_session, calendar_data):
+        """Due dates for every month, paid flags, lease end and vacancy events"""
+        session = auth_session['session']
+        response = session.get(f"{BASE_URL}/api/calendar/range?from=2025-01&to=2025-12")
+        assert response.status_code == 200
+        events = response.json()['events']
+        lease_id = calendar_data['lease']['id']
+
+        dues = [e for e in events if e['related_id'] == lease_id and e['type'].startswith('payment')]
+        assert len(dues) == 12
+        # The due day is clamped to the length of the month
+        assert dues[1]['date'] == "2025-02-28"
+        assert [e['is_paid'] for e in dues] == [False, False, True] + [False] * 9
+        assert any(e['type'] == 'lease_end' and e['date'] == "2025-06-30" for e in events)
+        assert any(e['type'] == 'vacancy' and e['date'] == "2025-09-15" for e in events)
+        assert [e['date'] for e in events] == sorted(e['date'] for e in events)
+
+    def test_month_matches_range(self, auth_session, calendar_data):
+        """The single-month endpoint returns the same events as a one-month range"""
+        session = auth_session['session']
+        month = session.get(f"{BASE_URL}/api/calendar/events?month=3&year=2025").json()['events']
+        single = session.get(f"{BASE_URL}/api/calendar/range?from=2025-03&to=2025-03").json()['events']
+        assert month == single
+        assert any(e['type'] == 'payment_done' for e in month)
+
+    def test_range_limited_to_a_year(self, auth_session):
+        """Ranges must be ordered and at most 12 months"""
+        session = auth_session['session']
+        assert session.get(f"{BASE_URL}/api/calendar/range?from=2025-01&to=2026-01").status_code == 400
+        assert session.get(f"{BASE_URL}/api/calendar/range?from=2025-06&to=2025-01").status_code == 400
+
+
+class TestCalendarFeed:
+    """Tokenised, cached ICS feed tests"""
+
+    def test_feed_conditional_requests(self, auth_session, calendar_data):
+        """The feed is public behind its token and answers 304 until the data changes"""
+        session = auth_session['session']
+        url = session.get(f"{BASE_URL}/api/calendar/feed").json()['url']
+        lease = create_lease(session, start_date="2024-01-01")
+
+        response = requests.get(f"{BASE_URL}{url}")
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/calendar')
+        assert response.text.startswith("BEGIN:VCALENDAR\r\n")
+        assert f"UID:payment-{lease['id']}-" in response.text
+        etag = response.headers['etag']
+        last_modified = response.headers['last-modified']
+
+        assert requests.get(f"{BASE_URL}{url}", headers={'If-None-Match': etag}).status_code == 304
+        assert requests.get(f"{BASE_URL}{url}", headers={'If-Modified-Since': last_modified}).status_code == 304
+
+        now = datetime.now()
+        assert session.post(f"{BASE_URL}/api/payments", json={
+            "lease_id": lease['id'],
+            "amount": 730.0,
+            "payment_date": now.strftime('%Y-%m-%d'),
+            "period_month": now.month,
+            "period_year": now.year
+        }).status_code == 200
+        changed = requests.get(f"{BASE_URL}{url}", headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['etag'] != etag
+        assert "Payé" in changed.text
+
+    def test_feed_token_rotation(self, auth_session):
+        """A rotated token invalidates the previous subscription URL"""
+        session = auth_session['session']
+        old_url = session.get(f"{BASE_URL}/api/calendar/feed").json()['url']
+        assert requests.get(f"{BASE_URL}{old_url}").status_code == 200
+        new_url = session.post(f"{BASE_URL}/api/calendar/feed/rotate").json()['url']
+        assert new_url != old_url
+        assert requests.get(f"{BASE_URL}{old_url}").status_code == 404
+        assert requests.get(f"{BASE_URL}{new_url}").status_code == 200
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,183 @@
+"""
+Test suite for cascade deletion and the orphan sweeper in RentMaestro
+Tests: dependents of deleted properties and tenants, files and renditions on disk, orphan sweep
+"""
+import pytest
+import asyncio
+import os
+import io
+import time
+import uuid
+from PIL import Image
+
+import server
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+def create_lease(session):
+    property_id = session.post(f"{BASE_URL}/api/properties", json={
+        "name": f"TEST_Cascade_{uuid.uuid4().hex[:8]}",
+        "address": "5 rue du Test",
+        "city": "Lille",
+        "postal_code": "59000",
+        "property_type": "apartment",
+        "surface": 40.0,
+        "rooms": 2,
+        "rent_amount": 700.0
+    }).json()['id']
+    tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+        "first_name": "TEST",
+        "last_name": "Cascade",
+        "email": f"cascade_{uuid.uuid4().hex[:8]}@example.com",
+        "phone": "0600000000"
+    }).json()['id']
+    response = session.post(f"{BASE_URL}/api/leases", json={
+        "property_id": property_id,
+        "tenant_id": tenant_id,
+        "start_date": "2024-01-01",
+        "rent_amount": 700.0,
+        "deposit": 700.0
+    })
+    assert response.status_code == 200
+    return property_id, tenant_id, response.json()['id']
+
+
+def upload_photo(session, related_type, related_id):
+    image = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 120, 40)).save(image, "PNG")
+    response = session.post(
+        f"{BASE_URL}/api/documents/upload",
+        files={"file": ("photo.png", image.getvalue(), "image/png")},
+        data={"name": "TEST_Photo", "document_type": "photo", "related_type": related_type, "related_id": related_id}
+    )
+    assert response.status_code == 200
+    return response.json()['id']
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return
+        time.sleep(0.2)
+    pytest.fail("Background task did not complete")
+
+
+class TestCascadeDeletion:
+    """Dependents removed in the background after a delete"""
+
+    def test_delete_property(self, auth_session):
+        """Leases, payments, receipts and documents of a deleted property are removed"""
+        session = auth_session['session']
+        property_id, _, lease_id = create_lease(session)
+        payment_id = session.post(f"{BASE_URL}/api/payments", json={
+            "lease_id": lease_id, "amount": 700.0, "payment_date": "2024-01-05", "period_month": 1, "period_year": 2024
+        }).json()['id']
+        assert session.get(f"{BASE_URL}/api/receipts/{payment_id}").status_code == 200
+        photo_id = upload_photo(session, "property", property_id)
+        lease_doc_id = upload_photo(session, "lease", lease_id)
+        wait_until(lambda: session.get(f"{BASE_URL}/api/documents/{photo_id}").json()['rendition_status'] == "ready")
+        thumbnail = session.get(f"{BASE_URL}/api/documents/{photo_id}").json()['rendition_urls']['thumb']['webp']
+        assert session.get(f"{BASE_URL}{thumbnail}").status_code == 200
+
+        assert session.delete(f"{BASE_URL}/api/properties/{property_id}").status_code == 200
+        wait_until(lambda: session.get(f"{BASE_URL}/api/documents/{photo_id}").status_code == 404)
+
+        assert session.get(f"{BASE_URL}/api/leases/{lease_id}").status_code == 404
+        assert all(p['id'] != payment_id for p in session.get(f"{BASE_URL}/api/payments").json())
+        assert session.get(f"{BASE_URL}/api/receipts/{payment_id}").status_code == 404
+        assert session.get(f"{BASE_URL}/api/documents/{lease_doc_id}").status_code == 404
+        assert session.get(f"{BASE_URL}/api/documents/{photo_id}/download").status_code == 404
+        assert session.get(f"{BASE_URL}{thumbnail}").status_code == 404
+
+    def test_delete_tenant(self, auth_session):
+        """Leases and documents of a deleted tenant are removed; the property is freed"""
+        session = auth_session['session']
+        property_id, tenant_id, lease_id = create_lease(session)
+        document_id = upload_photo(session, "tenant", tenant_id)
+
+        assert session.delete(f"{BASE_URL}/api/tenants/{tenant_id}").status_code == 200
+        wait_until(lambda: session.get(f"{BASE_URL}/api/documents/{document_id}").status_code == 404)
+
+        assert session.get(f"{BASE_URL}/api/leases/{lease_id}").status_code == 404
+        assert session.get(f"{BASE_URL}/api/properties/{property_id}").json()['is_occupied'] is False
+
+
+def insert_document(database, directory, user_id, related_type, related_id, renditions=None):
+    document_id = str(uuid.uuid4())
+    filename = f"{uuid.uuid4()}.png"
+    (directory / filename).write_bytes(b"content")
+    asyncio.run(database.documents.insert_one({
+        "id": document_id,
+        "user_id": user_id,
+        "related_type": related_type,
+        "related_id": related_id,
+        "filename": filename,
+        "file_size": 7,
+        "renditions": renditions
+    }))
+    return document_id, filename
+
+
+def age(path, hours):
+    timestamp = time.time() - hours * 3600
+    os.utime(path, (timestamp, timestamp))
+
+
+class TestFilesOnDisk:
+    """Files, renditions and orphans handled by the cascade and the sweeper"""
+
+    def test_cascade_removes_files_and_renditions(self, memory_db):
+        """Document files and renditions are deleted, and cached property lists invalidated"""
+        user_id, property_id = str(uuid.uuid4()), str(uuid.uuid4())
+        rendition = f"{uuid.uuid4()}_thumb.webp"
+        (server.RENDITIONS_DIR / rendition).write_bytes(b"webp")
+        _, filename = insert_document(
+            memory_db, server.UPLOADS_DIR, user_id, "property", property_id, {"thumb": {"webp": rendition}}
+        )
+
+        async def scenario():
+            before = (await server.generation_store.get(user_id)).get("documents", 0)
+            counts = await server.cascade_delete("property", property_id, user_id)
+            after = (await server.generation_store.get(user_id)).get("documents", 0)
+            return counts, after - before
+
+        counts, bumps = asyncio.run(scenario())
+        assert counts["documents"] == 1
+        assert bumps >= 1
+        assert not (server.UPLOADS_DIR / filename).exists()
+        assert not (server.RENDITIONS_DIR / rendition).exists()
+        assert asyncio.run(memory_db.documents.count_documents({})) == 0
+
+    def test_sweep_orphans(self, memory_db):
+        """Orphan documents and unreferenced files are removed; recent files are kept"""
+        user_id, property_id = str(uuid.uuid4()), str(uuid.uuid4())
+        asyncio.run(memory_db.properties.insert_one({"id": property_id, "user_id": user_id}))
+        kept_id, kept_file = insert_document(memory_db, server.UPLOADS_DIR, user_id, "property", property_id)
+        _, orphan_file = insert_document(memory_db, server.UPLOADS_DIR, user_id, "property", str(uuid.uuid4()))
+        old_file, recent_file = server.UPLOADS_DIR / "old.pdf", server.UPLOADS_DIR / "recent.pdf"
+        old_rendition, recent_rendition = (
+            server.RENDITIONS_DIR / f"{uuid.uuid4()}_thumb.webp", server.RENDITIONS_DIR / f"{uuid.uuid4()}_thumb.webp"
+        )
+        for path in (old_file, recent_file, old_rendition, recent_rendition):
+            path.write_bytes(b"stale")
+        for path in (server.UPLOADS_DIR / kept_file, old_file, old_rendition):
+            age(path, 3)
+
+        report = asyncio.run(server.sweep_orphans(min_age_hours=1))
+
+        assert report["orphan_documents"] == 1
+        assert report["orphan_files"] == 1
+        assert report["orphan_renditions"] == 1
+        remaining = asyncio.run(memory_db.documents.distinct("id"))
+        assert remaining == [kept_id]
+        assert (server.UPLOADS_DIR / kept_file).exists()
+        assert not (server.UPLOADS_DIR / orphan_file).exists()
+        assert not old_file.exists() and not old_rendition.exists()
+        assert recent_file.exists() and recent_rendition.exists()
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,103 @@
+"""
+Test suite for response compression in RentMaestro
+Tests: Negotiated zstd/brotli/gzip, size threshold, streamed exports, excluded media types
+"""
+import pytest
+import requests
+import os
+import json
+import gzip
+import brotli
+import zstandard
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def auth_session(auth_session):
+    """Authenticated session with enough properties for a large list"""
+    session = auth_session['session']
+    for i in range(20):
+        session.post(f"{BASE_URL}/api/properties", json={
+            "name": f"TEST_Compression_{i}",
+            "address": f"{i} avenue du Test",
+            "city": "Bordeaux",
+            "postal_code": "33000",
+            "property_type": "apartment",
+            "surface": 40.0,
+            "rooms": 2,
+            "rent_amount": 750.0,
+            "description": "Appartement lumineux proche des commerces et des transports"
+        })
+    return auth_session
+
+
+DECODERS = {
+    "gzip": gzip.decompress,
+    "br": brotli.decompress,
+    "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+
+class TestCompression:
+    """Compression middleware tests"""
+
+    @pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+    def test_large_json_is_compressed(self, auth_session, encoding):
+        """Large lists use the negotiated encoding and decode to the same JSON"""
+        session = auth_session['session']
+        identity = session.get(f"{BASE_URL}/api/properties", headers={'Accept-Encoding': 'identity'})
+        assert 'content-encoding' not in identity.headers
+
+        response = session.get(
+            f"{BASE_URL}/api/properties", headers={'Accept-Encoding': encoding}, stream=True
+        )
+        assert response.status_code == 200
+        assert response.headers['content-encoding'] == encoding
+        assert 'Accept-Encoding' in response.headers['vary']
+        raw = response.raw.read(decode_content=False)
+        assert int(response.headers['content-length']) == len(raw)
+        assert len(raw) < len(identity.content) / 2
+        assert json.loads(DECODERS[encoding](raw)) == identity.json()
+
+    def test_preference_and_refusal(self, auth_session):
+        """zstd is preferred; q=0 refuses an encoding"""
+        session = auth_session['session']
+        response = session.get(f"{BASE_URL}/api/properties", headers={'Accept-Encoding': 'gzip, br, zstd'})
+        assert response.headers['content-encoding'] == 'zstd'
+        response = session.get(f"{BASE_URL}/api/properties", headers={'Accept-Encoding': 'gzip, zstd;q=0, br;q=0'})
+        assert response.headers['content-encoding'] == 'gzip'
+
+    def test_small_response_not_compressed(self, auth_session):
+        """Bodies below the threshold are sent as is"""
+        response = requests.get(f"{BASE_URL}/api/", headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert 'content-encoding' not in response.headers
+
+    def test_streamed_export_compressed(self, auth_session):
+        """Streamed NDJSON is compressed on the fly; gzip files are not compressed twice"""
+        session = auth_session['session']
+        response = session.get(
+            f"{BASE_URL}/api/audit-logs/export?format=ndjson", headers={'Accept-Encoding': 'gzip'}
+        )
+        assert response.status_code == 200
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.text.count("\n") >= 20
+
+        archive = session.get(
+            f"{BASE_URL}/api/audit-logs/export?format=ndjson&gzip=true", headers={'Accept-Encoding': 'gzip'}
+        )
+        assert archive.headers['content-type'] == 'application/gzip'
+        assert 'content-encoding' not in archive.headers
+
+    def test_xlsx_not_compressed(self, auth_session):
+        """Already compressed media types are excluded"""
+        session = auth_session['session']
+        response = session.get(f"{BASE_URL}/api/export/payments/excel", headers={'Accept-Encoding': 'gzip'})
+        assert response.status_code == 200
+        assert 'content-encoding' not in response.headers
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
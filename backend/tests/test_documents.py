@@ -0,0 +1,329 @@
+"""
+Test suite for Documents features in RentMaestro
+Tests: Resumable chunked uploads, ZIP dossier bundles, renditions and their signed URLs
+"""
+import pytest
+import requests
+import os
+import uuid
+import hashlib
+import io
+import zipfile
+import time
+import asyncio
+import hmac
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from PIL import Image
+
+import server
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+def start_upload(session, content, chunk_size=256 * 1024, checksum=None):
+    response = session.post(f"{BASE_URL}/api/documents/uploads", json={
+        "name": f"TEST_EDL_{uuid.uuid4().hex[:8]}",
+        "document_type": "etat_lieux_entree",
+        "related_type": "lease",
+        "related_id": str(uuid.uuid4()),
+        "filename": "edl.pdf",
+        "mime_type": "application/pdf",
+        "total_size": len(content),
+        "chunk_size": chunk_size,
+        "checksum": checksum
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def put_chunk(session, upload, index, content):
+    chunk_size = upload['chunk_size']
+    chunk = content[index * chunk_size:(index + 1) * chunk_size]
+    return session.put(
+        f"{BASE_URL}/api/documents/uploads/{upload['upload_id']}/chunks/{index}",
+        data=chunk,
+        headers={
+            'Content-Type': 'application/octet-stream',
+            'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()
+        }
+    )
+
+
+class TestChunkedUploads:
+    """Resumable upload protocol tests"""
+
+    def test_chunked_upload_resume_and_complete(self, auth_session):
+        """Chunks can be sent out of order, resumed, then assembled"""
+        session = auth_session['session']
+        content = os.urandom(600 * 1024)
+        upload = start_upload(session, content, checksum=hashlib.sha256(content).hexdigest())
+        assert upload['total_chunks'] == 3
+        assert upload['missing_chunks'] == [0, 1, 2]
+
+        assert put_chunk(session, upload, 2, content).status_code == 200
+        assert put_chunk(session, upload, 0, content).status_code == 200
+
+        # Interrupted upload: status reports what is left to send
+        status_response = session.get(f"{BASE_URL}/api/documents/uploads/{upload['upload_id']}")
+        assert status_response.status_code == 200
+        assert status_response.json()['missing_chunks'] == [1]
+
+        incomplete = session.post(f"{BASE_URL}/api/documents/uploads/{upload['upload_id']}/complete")
+        assert incomplete.status_code == 400
+
+        assert put_chunk(session, upload, 1, content).status_code == 200
+        complete = session.post(f"{BASE_URL}/api/documents/uploads/{upload['upload_id']}/complete")
+        assert complete.status_code == 200
+        document_id = complete.json()['id']
+
+        download = session.get(f"{BASE_URL}/api/documents/{document_id}/download")
+        assert download.status_code == 200
+        assert download.content == content
+
+    def test_chunked_upload_bad_checksum(self, auth_session):
+        """A checksum mismatch is rejected at completion"""
+        session = auth_session['session']
+        content = os.urandom(300 * 1024)
+        upload = start_upload(session, content, checksum="0" * 64)
+        for index in range(upload['total_chunks']):
+            assert put_chunk(session, upload, index, content).status_code == 200
+
+        response = session.post(f"{BASE_URL}/api/documents/uploads/{upload['upload_id']}/complete")
+        assert response.status_code == 400
+
+    def test_chunk_wrong_size_rejected(self, auth_session):
+        """A truncated chunk is rejected and stays missing"""
+        session = auth_session['session']
+        content = os.urandom(300 * 1024)
+        upload = start_upload(session, content)
+        response = session.put(
+            f"{BASE_URL}/api/documents/uploads/{upload['upload_id']}/chunks/0",
+            data=content[:1000],
+            headers={'Content-Type': 'application/octet-stream'}
+        )
+        assert response.status_code == 400
+
+        abort = session.delete(f"{BASE_URL}/api/documents/uploads/{upload['upload_id']}")
+        assert abort.status_code == 200
+
+
+class TestDocumentBundle:
+    """Streaming ZIP dossier tests"""
+
+    def test_lease_bundle_contains_dossier_documents(self, auth_session):
+        """The lease bundle includes lease, property and tenant documents"""
+        session = auth_session['session']
+        property_id = session.post(f"{BASE_URL}/api/properties", json={
+            "name": f"TEST_Bundle_{uuid.uuid4().hex[:8]}",
+            "address": "1 rue du Test",
+            "city": "Paris",
+            "postal_code": "75001",
+            "property_type": "apartment",
+            "surface": 40.0,
+            "rooms": 2,
+            "rent_amount": 900.0
+        }).json()['id']
+        tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+            "first_name": "TEST",
+            "last_name": "Bundle",
+            "email": f"bundle_{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "0600000000"
+        }).json()['id']
+        lease_id = session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": property_id,
+            "tenant_id": tenant_id,
+            "start_date": "2024-01-01",
+            "rent_amount": 900.0,
+            "deposit": 900.0
+        }).json()['id']
+
+        contents = {}
+        for related_type, related_id in [("lease", lease_id), ("property", property_id), ("tenant", tenant_id)]:
+            content = os.urandom(50 * 1024)
+            contents[related_type] = content
+            response = requests.post(
+                f"{BASE_URL}/api/documents/upload",
+                headers={'Authorization': session.headers['Authorization']},
+                files={'file': ('doc.pdf', content, 'application/pdf')},
+                data={
+                    'name': f"TEST_{related_type}",
+                    'document_type': 'autre',
+                    'related_type': related_type,
+                    'related_id': related_id
+                }
+            )
+            assert response.status_code == 200
+
+        response = session.get(f"{BASE_URL}/api/documents/bundle?related_type=lease&related_id={lease_id}")
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/zip'
+
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        assert archive.testzip() is None
+        assert archive.read("Bail/TEST_lease.pdf") == contents['lease']
+        assert archive.read("Bien/TEST_property.pdf") == contents['property']
+        assert archive.read("Locataire/TEST_tenant.pdf") == contents['tenant']
+
+    def test_bundle_invalid_related_type(self, auth_session):
+        """Unknown entity types are rejected"""
+        session = auth_session['session']
+        response = session.get(f"{BASE_URL}/api/documents/bundle?related_type=payment&related_id=x")
+        assert response.status_code == 400
+
+
+def upload_file(session, content, filename, mime_type):
+    response = session.post(
+        f"{BASE_URL}/api/documents/upload",
+        files={'file': (filename, content, mime_type)},
+        data={
+            'name': f"TEST_Rendition_{uuid.uuid4().hex[:8]}",
+            'document_type': 'photo',
+            'related_type': 'property',
+            'related_id': str(uuid.uuid4())
+        }
+    )
+    assert response.status_code == 200
+    return response.json()['id']
+
+
+def wait_for_rendition(session, document_id, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        doc = session.get(f"{BASE_URL}/api/documents/{document_id}").json()
+        if doc['rendition_status'] not in (None, "pending", "processing"):
+            return doc
+        time.sleep(0.2)
+    pytest.fail(f"Renditions of document {document_id} were not generated")
+
+
+def png_bytes(width, height):
+    image = io.BytesIO()
+    Image.new("RGB", (width, height), (30, 90, 160)).save(image, "PNG")
+    return image.getvalue()
+
+
+class TestRenditions:
+    """Thumbnails generated after upload, served through signed URLs"""
+
+    def test_image_renditions(self, auth_session):
+        """An image gets thumb and medium renditions in WebP and JPEG, within their size"""
+        session = auth_session['session']
+        doc = wait_for_rendition(session, upload_file(session, png_bytes(1600, 1200), "photo.png", "image/png"))
+        assert doc['rendition_status'] == "ready"
+        assert set(doc['rendition_urls']) == {"thumb", "medium"}
+
+        response = requests.get(f"{BASE_URL}{doc['rendition_urls']['thumb']['webp']}")
+        assert response.status_code == 200
+        assert response.headers['content-type'] == "image/webp"
+        assert max(Image.open(io.BytesIO(response.content)).size) == 320
+        response = requests.get(f"{BASE_URL}{doc['rendition_urls']['medium']['jpeg']}")
+        assert response.status_code == 200
+        assert max(Image.open(io.BytesIO(response.content)).size) == 1280
+
+    def test_unreadable_file_fails(self, auth_session):
+        """A file that cannot be decoded is marked failed and has no preview"""
+        session = auth_session['session']
+        doc = wait_for_rendition(session, upload_file(session, os.urandom(4096), "scan.pdf", "application/pdf"))
+        assert doc['rendition_status'] == "failed"
+        assert doc['rendition_urls'] is None
+
+    def test_tampered_signature_rejected(self, auth_session):
+        """Rendition URLs only work with their own signature and expiry"""
+        session = auth_session['session']
+        doc = wait_for_rendition(session, upload_file(session, png_bytes(64, 64), "photo.png", "image/png"))
+        url = f"{BASE_URL}{doc['rendition_urls']['thumb']['webp']}"
+        assert requests.get(url.replace("sig=", "sig=0")).status_code == 403
+        assert requests.get(url.replace("thumb.webp", "medium.webp")).status_code == 403
+        expires = int(url.split("expires=")[1].split("&")[0])
+        assert requests.get(url.replace(f"expires={expires}", f"expires={expires + 86400}")).status_code == 403
+
+
+def insert_document(database, mime_type, content=None, **fields):
+    document_id = str(uuid.uuid4())
+    filename = f"{document_id}.bin"
+    if content is not None:
+        (server.UPLOADS_DIR / filename).write_bytes(content)
+    asyncio.run(database.documents.insert_one({
+        "id": document_id,
+        "user_id": str(uuid.uuid4()),
+        "filename": filename,
+        "mime_type": mime_type,
+        "rendition_status": "pending",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **fields
+    }))
+    return document_id
+
+
+def rendition_status(database, document_id):
+    return asyncio.run(database.documents.find_one({"id": document_id}))['rendition_status']
+
+
+class TestRenditionJobs:
+    """Rendition task and catch-up job, run in-process"""
+
+    @pytest.fixture
+    def renders(self, memory_db, monkeypatch):
+        """Renders counted, in a thread instead of the process pool"""
+        calls = []
+
+        def render(source_path, dest_dir, base_name, mime_type):
+            calls.append(base_name)
+            time.sleep(0.05)
+            return {"thumb": {"webp": f"{base_name}_thumb.webp"}}
+
+        monkeypatch.setattr(server, "render_image_renditions", render)
+        monkeypatch.setattr(server, "get_process_pool", lambda: None)
+        return calls
+
+    def test_rendered_once(self, memory_db, renders):
+        """The upload's task and the catch-up job do not render the same document twice"""
+        document_id = insert_document(memory_db, "image/png", b"png")
+
+        async def scenario():
+            await asyncio.gather(server.generate_document_renditions(document_id), server.process_pending_renditions())
+
+        asyncio.run(scenario())
+        assert renders == [document_id]
+        assert rendition_status(memory_db, document_id) == "ready"
+
+    def test_interrupted_claim_is_retried(self, memory_db, renders):
+        """A document left processing by a restart is picked up once its claim expired"""
+        claimed_at = datetime.now(timezone.utc) - server.RENDITION_CLAIM_TIMEOUT * 2
+        stale = insert_document(memory_db, "image/png", b"png", rendition_status="processing",
+                                rendition_claimed_at=claimed_at.isoformat())
+        recent = insert_document(memory_db, "image/png", b"png", rendition_status="processing",
+                                 rendition_claimed_at=datetime.now(timezone.utc).isoformat())
+
+        asyncio.run(server.process_pending_renditions())
+        assert renders == [stale]
+        assert rendition_status(memory_db, recent) == "processing"
+
+    def test_settled_statuses(self, memory_db, renders):
+        """Documents without preview are settled as none, missing files as failed"""
+        text = insert_document(memory_db, "text/plain", b"text", rendition_status=None)
+        missing = insert_document(memory_db, "image/png")
+
+        async def scenario():
+            await server.generate_document_renditions(text)
+            await server.process_pending_renditions()
+
+        asyncio.run(scenario())
+        assert renders == []
+        assert rendition_status(memory_db, text) == "none"
+        assert rendition_status(memory_db, missing) == "failed"
+
+    def test_expired_signature(self, memory_db):
+        """A correctly signed URL is refused once expired"""
+        expires = int(datetime.now(timezone.utc).timestamp()) - 60
+        message = f"doc:thumb:webp:{expires}".encode()
+        sig = hmac.new(server.SECRET_KEY.encode(), message, server.hashlib.sha256).hexdigest()[:32]
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(server.get_rendition("doc", "thumb.webp", expires, sig))
+        assert error.value.status_code == 403
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
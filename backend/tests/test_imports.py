@@ -0,0 +1,124 @@
+"""
+Test suite for Portfolio import features in RentMaestro
+Tests: XLSX workbook import with cross-sheet references, CSV import, job progress
+"""
+import pytest
+import os
+import io
+import time
+import uuid
+from datetime import datetime
+from openpyxl import Workbook
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+def wait_for_job(session, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = session.get(f"{BASE_URL}/api/imports/{job_id}").json()
+        if job['status'] in ("completed", "failed"):
+            return job
+        time.sleep(0.2)
+    pytest.fail(f"Import {job_id} did not finish")
+
+
+class TestPortfolioImport:
+    """Streaming CSV/XLSX import tests"""
+
+    def test_xlsx_import_resolves_references(self, auth_session):
+        """Leases reference properties and tenants of the same workbook"""
+        session = auth_session['session']
+        suffix = uuid.uuid4().hex[:6]
+        workbook = Workbook()
+        properties = workbook.active
+        properties.title = "Biens"
+        properties.append(["ref", "name", "address", "city", "postal_code", "property_type", "surface", "rooms", "rent_amount", "charges"])
+        for i in range(20):
+            properties.append([f"P{i}", f"TEST_Import_{suffix}_{i}", f"{i} rue du Test", "Paris", 75001, "apartment", 30 + i, 2, 800, 50])
+        properties.append(["P_BAD", "TEST_Bad", "1 rue", "Paris", 75001, "apartment", "grand", 2, 800, 0])
+
+        tenants = workbook.create_sheet("Locataires")
+        tenants.append(["ref", "first_name", "last_name", "email", "phone"])
+        for i in range(20):
+            tenants.append([f"T{i}", "TEST", f"Import{i}", f"import_{suffix}_{i}@example.com", 600000000 + i])
+
+        leases = workbook.create_sheet("Baux")
+        leases.append(["property_ref", "tenant_ref", "start_date", "rent_amount", "charges", "deposit"])
+        for i in range(20):
+            leases.append([f"P{i}", f"T{i}", datetime(2024, 1, 1), 800, 50, 800])
+        leases.append(["P_UNKNOWN", "T0", datetime(2024, 1, 1), 800, 50, 800])
+
+        content = io.BytesIO()
+        workbook.save(content)
+        response = session.post(
+            f"{BASE_URL}/api/imports",
+            files={'file': ('portefeuille.xlsx', content.getvalue(),
+                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+        )
+        assert response.status_code == 200
+
+        job = wait_for_job(session, response.json()['id'])
+        assert job['status'] == "completed"
+        assert job['counts']['properties'] == {"rows": 21, "created": 20, "errors": 1}
+        assert job['counts']['tenants'] == {"rows": 20, "created": 20, "errors": 0}
+        assert job['counts']['leases'] == {"rows": 21, "created": 20, "errors": 1}
+        assert {(error['sheet'], error['row']) for error in job['errors']} == {("properties", 22), ("leases", 22)}
+
+        imported = [l for l in session.get(f"{BASE_URL}/api/leases").json()
+                    if (l['property_name'] or "").startswith(f"TEST_Import_{suffix}")]
+        assert len(imported) == 20
+        lease = next(l for l in imported if l['property_name'] == f"TEST_Import_{suffix}_3")
+        assert lease['tenant_name'].endswith(" Import3")
+        assert lease['start_date'] == "2024-01-01"
+
+    def test_csv_import_semicolon(self, auth_session):
+        """CSV files use the entity_type form field and any common delimiter"""
+        session = auth_session['session']
+        suffix = uuid.uuid4().hex[:6]
+        lines = ["first_name;last_name;email;phone"]
+        lines += [f"TEST;Csv{i};csv_{suffix}_{i}@example.com;060000000{i}" for i in range(5)]
+        lines.append("TEST;Invalid;not-an-email;0600000000")
+        response = session.post(
+            f"{BASE_URL}/api/imports",
+            files={'file': ('locataires.csv', "\n".join(lines).encode('cp1252'), 'text/csv')},
+            data={'entity_type': 'tenants'}
+        )
+        assert response.status_code == 200
+
+        job = wait_for_job(session, response.json()['id'])
+        assert job['status'] == "completed"
+        assert job['counts']['tenants'] == {"rows": 6, "created": 5, "errors": 1}
+
+    def test_xlsx_without_known_sheets_fails(self, auth_session):
+        """A workbook with no recognised sheet fails and lists the expected sheet names"""
+        session = auth_session['session']
+        workbook = Workbook()
+        workbook.active.title = "Feuil1"
+        workbook.active.append(["name", "address"])
+        workbook.active.append(["TEST_Unknown", "1 rue du Test"])
+        content = io.BytesIO()
+        workbook.save(content)
+        response = session.post(
+            f"{BASE_URL}/api/imports",
+            files={'file': ('classeur.xlsx', content.getvalue(),
+                            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+        )
+        assert response.status_code == 200
+
+        job = wait_for_job(session, response.json()['id'])
+        assert job['status'] == "failed"
+        assert all(name in job['error'] for name in ("biens", "locataires", "baux"))
+
+    def test_import_rejects_unknown_format(self, auth_session):
+        """Only CSV and XLSX files are accepted, CSV needs an entity type"""
+        session = auth_session['session']
+        response = session.post(f"{BASE_URL}/api/imports", files={'file': ('data.json', b'[]', 'application/json')})
+        assert response.status_code == 400
+        response = session.post(f"{BASE_URL}/api/imports", files={'file': ('data.csv', b'a;b', 'text/csv')})
+        assert response.status_code == 400
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
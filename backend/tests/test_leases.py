@@ -0,0 +1,98 @@
+"""
+Test suite for the lease lifecycle in RentMaestro
+Tests: occupancy flags, tenant property and vacancies written with lease creation and termination
+"""
+import pytest
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+def create_property_and_tenant(session):
+    property_id = session.post(f"{BASE_URL}/api/properties", json={
+        "name": f"TEST_Lifecycle_{uuid.uuid4().hex[:8]}",
+        "address": "3 rue du Test",
+        "city": "Nantes",
+        "postal_code": "44000",
+        "property_type": "apartment",
+        "surface": 30.0,
+        "rooms": 1,
+        "rent_amount": 600.0
+    }).json()['id']
+    tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+        "first_name": "TEST",
+        "last_name": "Lifecycle",
+        "email": f"lifecycle_{uuid.uuid4().hex[:8]}@example.com",
+        "phone": "0600000000"
+    }).json()['id']
+    return property_id, tenant_id
+
+
+def active_vacancies(session, property_id):
+    return [v for v in session.get(f"{BASE_URL}/api/vacancies").json()
+            if v['property_id'] == property_id and v['is_active']]
+
+
+class TestLeaseLifecycle:
+    """Writes grouped with lease creation and termination"""
+
+    def test_create_and_terminate_lease(self, auth_session):
+        """Creating a lease occupies the property and ends its vacancy; terminating reverts both"""
+        session = auth_session['session']
+        property_id, tenant_id = create_property_and_tenant(session)
+        assert session.post(f"{BASE_URL}/api/vacancies", json={
+            "property_id": property_id,
+            "start_date": "2023-12-01"
+        }).status_code == 200
+        assert len(active_vacancies(session, property_id)) == 1
+
+        response = session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": property_id,
+            "tenant_id": tenant_id,
+            "start_date": "2024-01-01",
+            "rent_amount": 600.0,
+            "deposit": 600.0
+        })
+        assert response.status_code == 200
+        lease_id = response.json()['id']
+
+        property_doc = session.get(f"{BASE_URL}/api/properties/{property_id}").json()
+        assert property_doc['is_occupied'] is True
+        assert property_doc['current_tenant_id'] == tenant_id
+        assert session.get(f"{BASE_URL}/api/tenants/{tenant_id}").json()['current_property_id'] == property_id
+        assert active_vacancies(session, property_id) == []
+        assert session.get(f"{BASE_URL}/api/leases/{lease_id}").json()['is_active'] is True
+
+        response = session.put(f"{BASE_URL}/api/leases/{lease_id}/terminate?end_date=2024-06-30")
+        assert response.status_code == 200
+
+        lease = session.get(f"{BASE_URL}/api/leases/{lease_id}").json()
+        assert lease['is_active'] is False
+        assert lease['end_date'] == "2024-06-30"
+        property_doc = session.get(f"{BASE_URL}/api/properties/{property_id}").json()
+        assert property_doc['is_occupied'] is False
+        assert property_doc['current_tenant_id'] is None
+        assert session.get(f"{BASE_URL}/api/tenants/{tenant_id}").json()['current_property_id'] is None
+        vacancies = active_vacancies(session, property_id)
+        assert [(v['start_date'], v['reason']) for v in vacancies] == [("2024-06-30", "Fin de bail")]
+
+    def test_create_lease_unknown_tenant(self, auth_session):
+        """Nothing is written when the tenant does not exist"""
+        session = auth_session['session']
+        property_id, _ = create_property_and_tenant(session)
+        response = session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": property_id,
+            "tenant_id": str(uuid.uuid4()),
+            "start_date": "2024-01-01",
+            "rent_amount": 600.0,
+            "deposit": 600.0
+        })
+        assert response.status_code == 404
+        assert session.get(f"{BASE_URL}/api/properties/{property_id}").json()['is_occupied'] is False
+        assert all(l['property_id'] != property_id for l in session.get(f"{BASE_URL}/api/leases").json())
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,71 @@
+"""
+Test suite for Mongo command monitoring in RentMaestro
+Tests: Server-Timing header, per-route query statistics (operators only)
+"""
+import pytest
+import requests
+import os
+import re
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+# One of the server's QUERY_STATS_OPERATORS; statistics tests are skipped without it
+OPERATOR_EMAIL = os.environ.get('TEST_OPERATOR_EMAIL')
+OPERATOR_PASSWORD = os.environ.get('TEST_OPERATOR_PASSWORD', 'TestPass123!')
+
+
+@pytest.fixture(scope="module")
+def operator_session():
+    """Session of the configured operator, registered on first use"""
+    if not OPERATOR_EMAIL:
+        pytest.skip("TEST_OPERATOR_EMAIL not set")
+    credentials = {"email": OPERATOR_EMAIL, "password": OPERATOR_PASSWORD}
+    response = requests.post(f"{BASE_URL}/api/auth/login", json=credentials)
+    if response.status_code != 200:
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={**credentials, "name": "Test Operator"})
+    if response.status_code != 200:
+        pytest.skip(f"Failed to authenticate operator: {response.text}")
+    session = requests.Session()
+    session.headers.update({'Authorization': f"Bearer {response.json()['access_token']}"})
+    return session
+
+
+class TestQueryMonitoring:
+    """Per-request and per-route Mongo command accounting"""
+
+    def test_server_timing_header(self, auth_session):
+        """Each response reports its Mongo commands; list endpoints stay within a few"""
+        session = auth_session['session']
+        for path in ("leases", "payments"):
+            response = session.get(f"{BASE_URL}/api/{path}")
+            assert response.status_code == 200
+            match = re.search(r'db;dur=([\d.]+);desc="(\d+) commands"', response.headers['server-timing'])
+            assert match
+            # User lookup, cache generations and one single-collection read: no query per row
+            assert int(match.group(2)) <= 5
+
+    def test_route_statistics(self, operator_session):
+        """Totals are grouped by route, most expensive first"""
+        operator_session.get(f"{BASE_URL}/api/tenants")
+
+        response = operator_session.get(f"{BASE_URL}/api/monitoring/queries")
+        assert response.status_code == 200
+        stats = response.json()
+        row = next(row for row in stats if row['route'] == "GET get_tenants")
+        assert row['requests'] >= 1
+        assert row['max_commands'] <= row['commands']
+        assert [r['commands'] for r in stats] == sorted((r['commands'] for r in stats), reverse=True)
+
+    def test_route_statistics_require_auth(self):
+        """Statistics are not public"""
+        response = requests.get(f"{BASE_URL}/api/monitoring/queries")
+        assert response.status_code in (401, 403)
+
+    def test_route_statistics_require_operator(self, auth_session):
+        """Regular accounts cannot read server-wide statistics"""
+        response = auth_session['session'].get(f"{BASE_URL}/api/monitoring/queries")
+        assert response.status_code == 403
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
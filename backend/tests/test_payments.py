@@ -0,0 +1,416 @@
+"""
+Test suite for Payments features in RentMaestro
+Tests: bulk payment import, bank reconciliation, arrears ledger, PDF quittances, receipt cache, batch receipt generation,
+denormalised display fields
+"""
+import pytest
+import requests
+import os
+import uuid
+import json
+import io
+import zipfile
+import time
+import re
+import asyncio
+
+import server
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+def create_lease(session, rent_amount=800.0, charges=50.0, start_date="2024-01-01"):
+    property_id = session.post(f"{BASE_URL}/api/properties", json={
+        "name": f"TEST_Property_{uuid.uuid4().hex[:8]}",
+        "address": "12 rue du Test",
+        "city": "Lyon",
+        "postal_code": "69001",
+        "property_type": "apartment",
+        "surface": 35.0,
+        "rooms": 2,
+        "rent_amount": rent_amount,
+        "charges": charges
+    }).json()['id']
+    tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+        "first_name": "TEST",
+        "last_name": f"Tenant{uuid.uuid4().hex[:4]}",
+        "email": f"tenant_{uuid.uuid4().hex[:8]}@example.com",
+        "phone": "0600000000"
+    }).json()['id']
+    lease = {
+        "property_id": property_id,
+        "tenant_id": tenant_id,
+        "start_date": start_date,
+        "rent_amount": rent_amount,
+        "charges": charges,
+        "deposit": rent_amount
+    }
+    response = session.post(f"{BASE_URL}/api/leases", json=lease)
+    assert response.status_code == 200
+    return {**lease, "id": response.json()['id']}
+
+
+def create_payment(session, lease, month, year, amount=None):
+    response = session.post(f"{BASE_URL}/api/payments", json={
+        "lease_id": lease['id'],
+        "amount": amount if amount is not None else lease['rent_amount'] + lease['charges'],
+        "payment_date": f"{year}-{month:02d}-05",
+        "period_month": month,
+        "period_year": year
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestBulkPayments:
+    """Bulk payment ingestion tests"""
+
+    def test_bulk_payments_json_array(self, auth_session):
+        """Valid rows are inserted, invalid ones reported by index"""
+        session = auth_session['session']
+        lease = create_lease(session)
+        rows = [
+            {"lease_id": lease['id'], "amount": 850.0, "payment_date": f"2025-{m:02d}-05",
+             "period_month": m, "period_year": 2025}
+            for m in range(1, 7)
+        ]
+        rows.insert(2, {"lease_id": str(uuid.uuid4()), "amount": 850.0, "payment_date": "2025-01-05",
+                        "period_month": 1, "period_year": 2025})
+        rows.insert(4, {"lease_id": lease['id'], "payment_date": "2025-01-05"})
+
+        response = session.post(f"{BASE_URL}/api/payments/bulk", json=rows)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['created']) == 6
+        assert [error['index'] for error in data['errors']] == [2, 4]
+        assert data['errors'][0]['error'] == "Bail non trouvé"
+
+        payments = session.get(f"{BASE_URL}/api/payments/lease/{lease['id']}").json()
+        assert len(payments) == 6
+
+    def test_bulk_payments_ndjson(self, auth_session):
+        """NDJSON bodies are accepted line by line"""
+        session = auth_session['session']
+        lease = create_lease(session)
+        lines = [
+            json.dumps({"lease_id": lease['id'], "amount": 850.0, "payment_date": "2025-03-05",
+                        "period_month": 3, "period_year": 2025}),
+            "{not json",
+            json.dumps({"lease_id": lease['id'], "amount": 850.0, "payment_date": "2025-04-05",
+                        "period_month": 4, "period_year": 2025}),
+        ]
+        response = session.post(
+            f"{BASE_URL}/api/payments/bulk",
+            data="\n".join(lines) + "\n",
+            headers={'Content-Type': 'application/x-ndjson'}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [created['index'] for created in data['created']] == [0, 2]
+        assert [error['index'] for error in data['errors']] == [1]
+
+    def test_bulk_payments_requires_array(self, auth_session):
+        """A JSON object body is rejected"""
+        session = auth_session['session']
+        response = session.post(f"{BASE_URL}/api/payments/bulk", json={"lease_id": "x"})
+        assert response.status_code == 400
+
+
+def upload_statement(session, filename, content, mime_type):
+    return requests.post(
+        f"{BASE_URL}/api/reconciliation/statements",
+        headers={'Authorization': session.headers['Authorization']},
+        files={'file': (filename, content, mime_type)}
+    )
+
+
+class TestReconciliation:
+    """Bank statement matching tests"""
+
+    def test_csv_statement_proposals_and_confirm(self, auth_session):
+        """A matching credit becomes a proposal, confirmed as a payment in one call"""
+        session = auth_session['session']
+        lease = create_lease(session, rent_amount=917.0, charges=13.0)
+        tenant = session.get(f"{BASE_URL}/api/tenants/{lease['tenant_id']}").json()
+
+        statement = "\n".join([
+            "Compte courant;FR76 0000",
+            "Date;Libellé;Débit;Crédit",
+            f"03/02/2025;VIR SEPA M {tenant['last_name'].upper()} {tenant['first_name']} LOYER FEV;;930,00",
+            "04/02/2025;PRLV EDF;-120,00;",
+            "05/02/2025;VIR INCONNU;;1 234,56",
+        ])
+        response = upload_statement(session, 'releve.csv', statement.encode('cp1252'), 'text/csv')
+        assert response.status_code == 200
+        data = response.json()
+        assert data['credits'] == 2
+        assert data['unmatched_count'] == 1
+        proposal = next(p for p in data['proposals'] if p['lease_id'] == lease['id'])
+        assert (proposal['period_month'], proposal['period_year']) == (2, 2025)
+        assert proposal['amount'] == 930.0
+        assert proposal['payment_date'] == "2025-02-03"
+
+        confirm = session.post(f"{BASE_URL}/api/reconciliation/proposals/confirm", json={"proposal_ids": [proposal['id']]})
+        assert confirm.status_code == 200
+        assert len(confirm.json()['payment_ids']) == 1
+
+        payments = session.get(f"{BASE_URL}/api/payments/lease/{lease['id']}").json()
+        assert [(p['period_month'], p['period_year']) for p in payments] == [(2, 2025)]
+
+        # Paid periods are not proposed again
+        response = upload_statement(session, 'releve.csv', statement.encode('cp1252'), 'text/csv')
+        assert all(p['lease_id'] != lease['id'] for p in response.json()['proposals'])
+
+    def test_camt053_and_ofx_statements(self, auth_session):
+        """CAMT.053 and OFX credits are parsed and matched on amount and date"""
+        session = auth_session['session']
+        lease = create_lease(session, rent_amount=701.0, charges=9.5)
+        tenant = session.get(f"{BASE_URL}/api/tenants/{lease['tenant_id']}").json()
+
+        camt = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="EUR">710.50</Amt><CdtDbtInd>CRDT</CdtDbtInd><BookgDt><Dt>2025-03-02</Dt></BookgDt>
+<NtryDtls><TxDtls><Refs><EndToEndId>E2E-1</EndToEndId></Refs><RltdPties><Dbtr><Nm>{tenant['first_name']} {tenant['last_name']}</Nm></Dbtr></RltdPties>
+<RmtInf><Ustrd>LOYER MARS</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="EUR">710.50</Amt><CdtDbtInd>DBIT</CdtDbtInd><BookgDt><Dt>2025-03-02</Dt></BookgDt></Ntry>
+</Stmt></BkToCstmrStmt></Document>"""
+        response = upload_statement(session, 'releve.xml', camt.encode(), 'application/xml')
+        assert response.status_code == 200
+        proposal = next(p for p in response.json()['proposals'] if p['lease_id'] == lease['id'])
+        assert (proposal['period_month'], proposal['period_year'], proposal['bank_reference']) == (3, 2025, "E2E-1")
+
+        ofx = f"""OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250401<TRNAMT>710.50<FITID>OFX-1<NAME>{tenant['last_name']}<MEMO>LOYER AVRIL</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>"""
+        response = upload_statement(session, 'releve.ofx', ofx.encode(), 'application/x-ofx')
+        assert response.status_code == 200
+        proposal = next(p for p in response.json()['proposals'] if p['lease_id'] == lease['id'])
+        assert (proposal['period_month'], proposal['period_year'], proposal['bank_reference']) == (4, 2025, "OFX-1")
+
+
+class TestLedger:
+    """Arrears ledger tests"""
+
+    def test_balance_as_of_with_partial_and_overpayments(self, auth_session):
+        """Dues and payments give the running balance at any date"""
+        session = auth_session['session']
+        lease = create_lease(session, rent_amount=500.0, charges=20.0, start_date="2025-01-01")
+        create_payment(session, lease, 1, 2025, amount=520.0)
+        february = create_payment(session, lease, 2, 2025, amount=300.0)
+        create_payment(session, lease, 3, 2025, amount=600.0)
+
+        def balance(as_of):
+            response = session.get(f"{BASE_URL}/api/ledger/balances?as_of={as_of}")
+            assert response.status_code == 200
+            return next(b['balance'] for b in response.json()['balances'] if b['lease_id'] == lease['id'])
+
+        # Rent is due on the 1st, paid on the 5th
+        assert balance("2025-01-04") == 520.0
+        assert balance("2025-01-31") == 0
+        assert balance("2025-02-28") == 220.0
+        assert balance("2025-03-31") == 140.0
+
+        ledger = session.get(f"{BASE_URL}/api/ledger/leases/{lease['id']}?date_from=2025-02-01&as_of=2025-03-31").json()
+        assert ledger['opening_balance'] == 0
+        assert [(e['kind'], e['balance']) for e in ledger['entries']] == [
+            ("due", 520.0), ("payment", 220.0), ("due", 740.0), ("payment", 140.0)
+        ]
+
+        # Removing a past payment shifts every later balance
+        assert session.delete(f"{BASE_URL}/api/payments/{february['id']}").status_code == 200
+        assert balance("2025-03-31") == 440.0
+
+    def test_balances_labelled_from_lease(self, auth_session):
+        """Balances carry the lease's property and tenant names, without one query per collection"""
+        session = auth_session['session']
+        lease = create_lease(session, rent_amount=450.0, charges=0.0, start_date="2025-01-01")
+        property_name = session.get(f"{BASE_URL}/api/properties/{lease['property_id']}").json()['name']
+        tenant = session.get(f"{BASE_URL}/api/tenants/{lease['tenant_id']}").json()
+
+        response = session.get(f"{BASE_URL}/api/ledger/balances?as_of=2025-01-31")
+        assert response.status_code == 200
+        row = next(b for b in response.json()['balances'] if b['lease_id'] == lease['id'])
+        assert row['property_name'] == property_name
+        assert row['tenant_name'] == f"{tenant['first_name']} {tenant['last_name']}"
+        # User lookup, ledger aggregation and leases
+        commands = re.search(r'desc="(\d+) commands"', response.headers['server-timing'])
+        assert commands and int(commands.group(1)) <= 3
+
+    def test_arrears_only_filter(self, auth_session):
+        """arrears_only keeps the leases with an amount owed"""
+        session = auth_session['session']
+        lease = create_lease(session, rent_amount=400.0, charges=0.0, start_date="2025-01-01")
+        create_payment(session, lease, 1, 2025, amount=400.0)
+
+        data = session.get(f"{BASE_URL}/api/ledger/balances?as_of=2025-01-31&arrears_only=true").json()
+        assert all(b['balance'] > 0 for b in data['balances'])
+        assert all(b['lease_id'] != lease['id'] for b in data['balances'])
+
+
+class TestReceipts:
+    """Quittance generation tests"""
+
+    def test_receipt_json_and_pdf(self, auth_session):
+        """A receipt is available as JSON and as a PDF document"""
+        session = auth_session['session']
+        lease = create_lease(session)
+        payment = create_payment(session, lease, 3, 2024)
+
+        response = session.get(f"{BASE_URL}/api/receipts/{payment['id']}")
+        assert response.status_code == 200
+        receipt = response.json()['receipt']
+        assert receipt['period'] == "Mars 2024"
+        assert receipt['total_amount'] == 850.0
+
+        pdf = session.get(f"{BASE_URL}/api/receipts/{payment['id']}?format=pdf")
+        assert pdf.status_code == 200
+        assert pdf.headers['content-type'] == 'application/pdf'
+        assert pdf.content.startswith(b"%PDF")
+
+    def test_receipt_etag_and_invalidation(self, auth_session):
+        """Receipts revalidate with a strong ETag that changes with their inputs"""
+        session = auth_session['session']
+        lease = create_lease(session)
+        payment = create_payment(session, lease, 4, 2024)
+
+        for suffix in ("", "?format=pdf"):
+            response = session.get(f"{BASE_URL}/api/receipts/{payment['id']}{suffix}")
+            assert response.status_code == 200
+            etag = response.headers['etag']
+            assert not etag.startswith('W/')
+
+            cached = session.get(f"{BASE_URL}/api/receipts/{payment['id']}{suffix}", headers={'If-None-Match': etag})
+            assert cached.status_code == 304
+
+        tenant = session.get(f"{BASE_URL}/api/tenants/{lease['tenant_id']}").json()
+        tenant['last_name'] = "Renamed"
+        assert session.put(f"{BASE_URL}/api/tenants/{lease['tenant_id']}", json=tenant).status_code == 200
+
+        response = session.get(f"{BASE_URL}/api/receipts/{payment['id']}", headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.json()['receipt']['tenant_name'] == "TEST Renamed"
+
+    def test_receipt_invalidated_while_built(self, memory_db, monkeypatch):
+        """A receipt built from inputs invalidated before it is stored is not cached"""
+        user = {"id": str(uuid.uuid4()), "name": "Bailleur"}
+
+        async def setup():
+            await memory_db.properties.insert_one({"id": "p", "user_id": user['id'], "name": "Studio", "address": "1 rue",
+                                                   "postal_code": "75001", "city": "Paris"})
+            await memory_db.tenants.insert_one({"id": "t", "user_id": user['id'], "first_name": "Camille", "last_name": "Martin"})
+            await memory_db.leases.insert_one({"id": "l", "user_id": user['id'], "property_id": "p", "tenant_id": "t",
+                                               "rent_amount": 600.0, "charges": 0})
+            await memory_db.payments.insert_one({"id": "pay", "user_id": user['id'], "lease_id": "l", "amount": 600.0,
+                                                 "payment_date": "2024-01-05", "period_month": 1, "period_year": 2024,
+                                                 "payment_method": "virement"})
+
+        collection = type(memory_db.receipt_cache)
+        update_one = collection.update_one
+        renamed = []
+
+        async def rename_before_store(self, *args, **kwargs):
+            # The tenant is renamed once the inputs were read, before the receipt is written
+            if self.name == "receipt_cache" and not renamed:
+                renamed.append(True)
+                await update_one(memory_db.tenants, {"id": "t"}, {"$set": {"last_name": "Renamed"}})
+                await server.invalidate_receipts({"user_id": user['id'], "tenant_id": "t"})
+            return await update_one(self, *args, **kwargs)
+
+        async def scenario():
+            await setup()
+            monkeypatch.setattr(collection, "update_one", rename_before_store)
+            served = await server.get_receipt_entry("pay", user)
+            monkeypatch.setattr(collection, "update_one", update_one)
+            return served, await server.get_receipt_entry("pay", user)
+
+        served, next_read = asyncio.run(scenario())
+        assert served['receipt']['tenant_name'] == "Camille Martin"
+        assert next_read['receipt']['tenant_name'] == "Camille Renamed"
+
+    def test_receipts_batch_zip(self, auth_session):
+        """The monthly batch contains one PDF per payment of the period"""
+        session = auth_session['session']
+        payment_ids = [create_payment(session, create_lease(session), 7, 2031)['id'] for _ in range(3)]
+
+        response = session.get(f"{BASE_URL}/api/receipts/batch?month=7&year=2031")
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/zip'
+
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        assert archive.testzip() is None
+        names = archive.namelist()
+        assert len(names) == 3
+        for payment_id in payment_ids:
+            name = next(n for n in names if n.endswith(f"{payment_id[:8]}.pdf"))
+            assert archive.read(name).startswith(b"%PDF")
+
+    def test_receipts_batch_empty_period(self, auth_session):
+        """A period without payments returns 404"""
+        session = auth_session['session']
+        response = session.get(f"{BASE_URL}/api/receipts/batch?month=1&year=1990")
+        assert response.status_code == 404
+
+
+def wait_for_payment(session, payment_id, predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        payment = next(p for p in session.get(f"{BASE_URL}/api/payments").json() if p['id'] == payment_id)
+        if predicate(payment):
+            return payment
+        time.sleep(0.2)
+    pytest.fail(f"Display fields of payment {payment_id} were not updated")
+
+
+class TestDisplayFields:
+    """Property and tenant names stored on leases and payments"""
+
+    def test_names_written_with_lease_and_payment(self, auth_session):
+        """Lists and exports read the names from the lease and payment documents"""
+        session = auth_session['session']
+        lease = create_lease(session)
+        payment = create_payment(session, lease, 5, 2024)
+        tenant = session.get(f"{BASE_URL}/api/tenants/{lease['tenant_id']}").json()
+        property_doc = session.get(f"{BASE_URL}/api/properties/{lease['property_id']}").json()
+
+        lease_row = next(l for l in session.get(f"{BASE_URL}/api/leases").json() if l['id'] == lease['id'])
+        assert lease_row['property_name'] == property_doc['name']
+        assert lease_row['property_address'] == "12 rue du Test"
+        assert lease_row['tenant_name'] == f"TEST {tenant['last_name']}"
+
+        payment_row = next(p for p in session.get(f"{BASE_URL}/api/payments").json() if p['id'] == payment['id'])
+        assert payment_row['property_name'] == property_doc['name']
+        assert payment_row['tenant_name'] == f"TEST {tenant['last_name']}"
+
+        exported = session.get(f"{BASE_URL}/api/export/payments?year=2024").json()['payments']
+        assert {"bien": property_doc['name'], "locataire": f"TEST {tenant['last_name']}"}.items() <= next(
+            row for row in exported if row['bien'] == property_doc['name']
+        ).items()
+
+    def test_rename_propagates(self, auth_session):
+        """Renaming a tenant or a property updates its leases and payments in the background"""
+        session = auth_session['session']
+        lease = create_lease(session)
+        payment = create_payment(session, lease, 6, 2024)
+
+        tenant = session.get(f"{BASE_URL}/api/tenants/{lease['tenant_id']}").json()
+        tenant['first_name'] = "Renamed"
+        assert session.put(f"{BASE_URL}/api/tenants/{lease['tenant_id']}", json=tenant).status_code == 200
+        wait_for_payment(session, payment['id'], lambda p: p['tenant_name'] == f"Renamed {tenant['last_name']}")
+
+        property_doc = session.get(f"{BASE_URL}/api/properties/{lease['property_id']}").json()
+        property_doc.update(name=f"TEST_Renamed_{uuid.uuid4().hex[:8]}", address="1 place du Test")
+        assert session.put(f"{BASE_URL}/api/properties/{lease['property_id']}", json=property_doc).status_code == 200
+        wait_for_payment(session, payment['id'], lambda p: p['property_name'] == property_doc['name'])
+
+        lease_row = next(l for l in session.get(f"{BASE_URL}/api/leases").json() if l['id'] == lease['id'])
+        assert lease_row['property_name'] == property_doc['name']
+        assert lease_row['property_address'] == "1 place du Test"
+        assert lease_row['tenant_name'] == f"Renamed {tenant['last_name']}"
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
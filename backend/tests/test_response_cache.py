@@ -0,0 +1,192 @@
+"""
+Test suite for the response cache in RentMaestro
+Tests: cached dashboard, lists and calendar stay consistent after writes, conditional GET (ETag),
+orjson encoding equivalent to jsonable_encoder
+"""
+import pytest
+import os
+import uuid
+import json
+import asyncio
+import numpy as np
+from datetime import datetime, date, timezone
+from fastapi.encoders import jsonable_encoder
+
+import server
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
+
+
+def create_property(session, name):
+    return session.post(f"{BASE_URL}/api/properties", json={
+        "name": name,
+        "address": "5 rue du Test",
+        "city": "Rennes",
+        "postal_code": "35000",
+        "property_type": "apartment",
+        "surface": 30.0,
+        "rooms": 1,
+        "rent_amount": 650.0
+    }).json()['id']
+
+
+class TestResponseCache:
+    """Write-through invalidation tests"""
+
+    def test_lists_follow_writes(self, auth_session):
+        """Cached lists reflect creations, updates and deletions"""
+        session = auth_session['session']
+        before = session.get(f"{BASE_URL}/api/properties").json()
+        assert session.get(f"{BASE_URL}/api/properties").json() == before
+
+        property_id = create_property(session, "TEST_Cache")
+        properties = session.get(f"{BASE_URL}/api/properties").json()
+        assert len(properties) == len(before) + 1
+
+        tenant = {
+            "first_name": "TEST",
+            "last_name": "Cache",
+            "email": f"cache_{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "0600000000"
+        }
+        tenant_id = session.post(f"{BASE_URL}/api/tenants", json=tenant).json()['id']
+        assert any(t['id'] == tenant_id for t in session.get(f"{BASE_URL}/api/tenants").json())
+        session.put(f"{BASE_URL}/api/tenants/{tenant_id}", json={**tenant, "last_name": "Renamed"})
+        tenants = session.get(f"{BASE_URL}/api/tenants").json()
+        assert next(t for t in tenants if t['id'] == tenant_id)['last_name'] == "Renamed"
+
+        # A lease marks the property occupied: the properties list must follow
+        session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": property_id,
+            "tenant_id": tenant_id,
+            "start_date": "2024-01-01",
+            "rent_amount": 650.0,
+            "deposit": 650.0
+        })
+        properties = session.get(f"{BASE_URL}/api/properties").json()
+        assert next(p for p in properties if p['id'] == property_id)['is_occupied'] is True
+        leases = session.get(f"{BASE_URL}/api/leases").json()
+        assert next(l for l in leases if l['property_id'] == property_id)['tenant_name'] == "TEST Renamed"
+
+        session.delete(f"{BASE_URL}/api/properties/{property_id}")
+        assert all(p['id'] != property_id for p in session.get(f"{BASE_URL}/api/properties").json())
+
+    def test_dashboard_follows_payments(self, auth_session):
+        """The cached dashboard is recomputed after a payment"""
+        session = auth_session['session']
+        property_id = create_property(session, "TEST_Cache_Dashboard")
+        tenant_id = session.post(f"{BASE_URL}/api/tenants", json={
+            "first_name": "TEST",
+            "last_name": "Dashboard",
+            "email": f"cache_{uuid.uuid4().hex[:8]}@example.com",
+            "phone": "0600000000"
+        }).json()['id']
+        lease_id = session.post(f"{BASE_URL}/api/leases", json={
+            "property_id": property_id,
+            "tenant_id": tenant_id,
+            "start_date": "2024-01-01",
+            "rent_amount": 650.0,
+            "deposit": 650.0
+        }).json()['id']
+
+        stats = session.get(f"{BASE_URL}/api/dashboard/stats").json()
+        assert session.get(f"{BASE_URL}/api/dashboard/stats").json() == stats
+        pending = session.get(f"{BASE_URL}/api/reminders/pending").json()
+        assert any(p['lease_id'] == lease_id for p in pending['pending'])
+
+        now = datetime.utcnow()
+        session.post(f"{BASE_URL}/api/payments", json={
+            "lease_id": lease_id,
+            "amount": 650.0,
+            "payment_date": now.strftime('%Y-%m-%d'),
+            "period_month": now.month,
+            "period_year": now.year
+        })
+        updated = session.get(f"{BASE_URL}/api/dashboard/stats").json()
+        assert updated['total_collected'] == stats['total_collected'] + 650.0
+        pending = session.get(f"{BASE_URL}/api/reminders/pending").json()
+        assert all(p['lease_id'] != lease_id for p in pending['pending'])
+
+
+class TestConditionalGet:
+    """ETag / If-None-Match tests on JSON lists"""
+
+    @pytest.mark.parametrize("path", ["properties", "tenants", "leases", "payments", "notifications"])
+    def test_unchanged_list_is_not_modified(self, auth_session, path):
+        """A list fetched again with its ETag is answered with a 304"""
+        session = auth_session['session']
+        response = session.get(f"{BASE_URL}/api/{path}")
+        assert response.status_code == 200
+        etag = response.headers['etag']
+        not_modified = session.get(f"{BASE_URL}/api/{path}", headers={'If-None-Match': etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers['etag'] == etag
+        assert not_modified.content == b""
+
+    def test_write_changes_etag(self, auth_session):
+        """A write to the listed collection invalidates the validator"""
+        session = auth_session['session']
+        etag = session.get(f"{BASE_URL}/api/properties").headers['etag']
+        # Unrelated collections keep their validator
+        tenants_etag = session.get(f"{BASE_URL}/api/tenants").headers['etag']
+        create_property(session, "TEST_Cache_ETag")
+        response = session.get(f"{BASE_URL}/api/properties", headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != etag
+        assert any(p['name'] == "TEST_Cache_ETag" for p in response.json())
+        assert session.get(f"{BASE_URL}/api/tenants", headers={'If-None-Match': tenants_etag}).status_code == 304
+
+
+# Before orjson, numpy values were converted to Python ones before jsonable_encoder
+NUMPY_TO_PYTHON = {np.generic: lambda value: value.item(), np.ndarray: lambda value: value.tolist()}
+
+
+def previous_encoding(value):
+    return json.loads(json.dumps(jsonable_encoder(value, custom_encoder=NUMPY_TO_PYTHON)))
+
+
+class TestJsonEncoding:
+    """encode_json produces the same JSON as the jsonable_encoder path it replaced"""
+
+    def test_value_types(self):
+        """Datetimes, dates, numpy scalars and arrays, Pydantic models and non-string keys"""
+        value = {
+            "created_at": datetime(2024, 3, 1, 9, 30, 15, 123456, tzinfo=timezone.utc),
+            "naive": datetime(2024, 3, 1, 9, 30),
+            "day": date(2024, 3, 1),
+            "count": np.int64(12),
+            "rate": np.float64(0.125),
+            "series": np.array([1.5, 2.0, 3.25]),
+            "days": np.arange(3, dtype=np.int32),
+            "by_year": {2023: 1, 2024: np.int64(2)},
+            "event": server.CalendarEvent(id="e", title="Loyer", date="2024-03-05", type="payment_due", amount=650.0),
+            "revenue_chart": [server.RevenuePoint(month="mars", amount=650.0)],
+            "missing": None
+        }
+        assert json.loads(server.encode_json(value)) == previous_encoding(value)
+
+    def test_endpoint_bodies(self, memory_db):
+        """Lease list (Mongo datetimes) and occupancy timeline (series computed with numpy) encode identically"""
+        user = {"id": str(uuid.uuid4()), "name": "Bailleur"}
+
+        async def scenario():
+            await memory_db.properties.insert_one({"id": "p", "user_id": user['id'], "name": "Studio", "rent_amount": 600.0})
+            await memory_db.leases.insert_one({
+                "id": "l", "user_id": user['id'], "property_id": "p", "tenant_id": "t",
+                "start_date": "2024-01-15", "end_date": "2024-08-31", "rent_amount": 600.0, "charges": 40.0,
+                "deposit": 600.0, "payment_day": 5, "is_active": False, "property_name": "Studio",
+                "created_at": datetime(2024, 1, 10, 8, 0, 0, 250000)
+            })
+            leases = await server.get_leases.__wrapped__(current_user=user)
+            timeline = await server.get_occupancy_timeline.__wrapped__(
+                date_from="2024-01", date_to="2024-12", property_id=None, current_user=user
+            )
+            return leases, timeline
+
+        for value in asyncio.run(scenario()):
+            assert json.loads(server.encode_json(value)) == previous_encoding(value)
+
+
+# Run tests if executed directly
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -6,7 +6,9 @@ import pytest
 import requests
 import os
 import uuid
-from datetime import datetime
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://rentmaestro.preview.emergentagent.com').rstrip('/')
 
@@ -602,6 +604,78 @@ class TestAuditLogs:
             assert 'entity_name' in log
             assert 'created_at' in log
 
+    def test_audit_logs_keyset_pagination(self, auth_session):
+        """Test browsing audit logs page by page with the X-Next-Cursor header"""
+        session = auth_session['session']
+        
+        for i in range(5):
+            session.post(f"{BASE_URL}/api/tenants", json={
+                "first_name": f"TEST_Page{i}",
+                "last_name": uuid.uuid4().hex[:8],
+                "email": f"page_{uuid.uuid4().hex[:8]}@example.com",
+                "phone": "0600000000"
+            })
+        
+        response = session.get(f"{BASE_URL}/api/audit-logs?entity_type=tenant&limit=2")
+        assert response.status_code == 200
+        seen = [log['id'] for log in response.json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        assert len(seen) == 2 and cursor
+        
+        while cursor:
+            response = session.get(f"{BASE_URL}/api/audit-logs?entity_type=tenant&limit=2&cursor={cursor}")
+            assert response.status_code == 200
+            seen += [log['id'] for log in response.json()]
+            cursor = response.headers.get('X-Next-Cursor')
+        
+        # Every entry exactly once, newest first
+        assert len(seen) == len(set(seen))
+        assert len(seen) >= 5
+        
+        invalid = session.get(f"{BASE_URL}/api/audit-logs?cursor=not-a-cursor")
+        assert invalid.status_code == 400
+
+    def test_audit_logs_export(self, auth_session):
+        """Test streaming export of audit logs as CSV and gzipped NDJSON"""
+        session = auth_session['session']
+        session.post(f"{BASE_URL}/api/teams", json={"name": f"TEST_Export_{uuid.uuid4().hex[:8]}"})
+        
+        response = session.get(f"{BASE_URL}/api/audit-logs/export?format=csv&entity_type=team")
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/csv')
+        lines = response.content.decode('utf-8-sig').splitlines()
+        assert lines[0].startswith('created_at,user_name,action,entity_type')
+        assert len(lines) >= 2
+        
+        response = session.get(f"{BASE_URL}/api/audit-logs/export?format=ndjson&gzip=true&entity_type=team")
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+        assert rows and all(row['entity_type'] == 'team' for row in rows)
+        
+        invalid = session.get(f"{BASE_URL}/api/audit-logs/export?format=xml")
+        assert invalid.status_code == 400
+
+    def test_audit_logs_export_date_offsets(self, auth_session):
+        """Date-times with an explicit offset filter on the instant they designate"""
+        session = auth_session['session']
+        team_id = session.post(f"{BASE_URL}/api/teams", json={"name": f"TEST_Offset_{uuid.uuid4().hex[:8]}"}).json()['id']
+
+        def exported(**period):
+            response = session.get(f"{BASE_URL}/api/audit-logs/export", params={
+                "format": "ndjson", "entity_type": "team", "entity_id": team_id, **period
+            })
+            assert response.status_code == 200
+            return [json.loads(line) for line in response.text.splitlines()]
+
+        created_at = datetime.fromisoformat(exported()[0]['created_at'])
+        paris = timezone(timedelta(hours=2))
+        before = (created_at - timedelta(seconds=1)).astimezone(paris).isoformat()
+        after = (created_at + timedelta(seconds=1)).astimezone(paris).isoformat()
+        assert len(exported(date_from=before)) == 1
+        assert exported(date_from=after) == []
+        assert len(exported(date_from=before, date_to=after)) == 1
+        assert exported(date_to=before) == []
+
 
 # Run tests if executed directly
 if __name__ == "__main__":
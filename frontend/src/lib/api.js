@@ -10,6 +10,9 @@ const api = axios.create({
   }
 });
 
+// Absolute URL of a server path (e.g. signed rendition URLs used in <img src>)
+export const mediaUrl = (path) => (path ? `${BACKEND_URL}${path}` : null);
+
 // Add auth token to requests
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('token');
@@ -70,6 +73,7 @@ export const paymentsAPI = {
   getAll: () => api.get('/payments'),
   getByLease: (leaseId) => api.get(`/payments/lease/${leaseId}`),
   create: (data) => api.post('/payments', data),
+  createBulk: (payments) => api.post('/payments/bulk', payments),
   delete: (id) => api.delete(`/payments/${id}`)
 };
 
@@ -94,9 +98,51 @@ export const dashboardAPI = {
   getStats: () => api.get('/dashboard/stats')
 };
 
+// Portfolio import (CSV / XLSX)
+export const importsAPI = {
+  upload: (file, entityType) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    if (entityType) formData.append('entity_type', entityType);
+    return api.post('/imports', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+  },
+  getJob: (jobId) => api.get(`/imports/${jobId}`)
+};
+
+// Bank reconciliation
+export const reconciliationAPI = {
+  uploadStatement: (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post('/reconciliation/statements', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+  },
+  getProposals: (statementId) => api.get(`/reconciliation/statements/${statementId}/proposals`),
+  confirm: (proposalIds) => api.post('/reconciliation/proposals/confirm', { proposal_ids: proposalIds }),
+  reject: (proposalId) => api.delete(`/reconciliation/proposals/${proposalId}`)
+};
+
+// Arrears ledger
+export const ledgerAPI = {
+  getBalances: (asOf, arrearsOnly = false) => api.get('/ledger/balances', { params: { as_of: asOf, arrears_only: arrearsOnly } }),
+  getLease: (leaseId, params = {}) => api.get(`/ledger/leases/${leaseId}`, { params })
+};
+
+// Analytics
+export const analyticsAPI = {
+  getPortfolio: (dateFrom, dateTo) => api.get('/analytics/portfolio', { params: { date_from: dateFrom, date_to: dateTo } }),
+  getForecast: (months = 12) => api.get('/analytics/forecast', { params: { months } })
+};
+
+// Occupancy
+export const occupancyAPI = {
+  getTimeline: (params) => api.get('/occupancy/timeline', { params })
+};
+
 // Receipts
 export const receiptsAPI = {
-  generate: (paymentId) => api.get(`/receipts/${paymentId}`)
+  generate: (paymentId) => api.get(`/receipts/${paymentId}`),
+  downloadPdf: (paymentId) => api.get(`/receipts/${paymentId}?format=pdf`, { responseType: 'blob' }),
+  downloadBatch: (month, year) => api.get(`/receipts/batch?month=${month}&year=${year}`, { responseType: 'blob' })
 };
 
 // Export
@@ -127,12 +173,38 @@ export const documentsAPI = {
     headers: { 'Content-Type': 'multipart/form-data' }
   }),
   download: (id) => api.get(`/documents/${id}/download`, { responseType: 'blob' }),
-  delete: (id) => api.delete(`/documents/${id}`)
+  downloadBundle: (relatedType, relatedId) => api.get(
+    `/documents/bundle?related_type=${relatedType}&related_id=${relatedId}`,
+    { responseType: 'blob' }
+  ),
+  delete: (id) => api.delete(`/documents/${id}`),
+  // Resumable upload for large files: one PUT per chunk, only missing chunks are re-sent
+  uploadChunked: async (file, metadata, onProgress) => {
+    const { data: session } = await api.post('/documents/uploads', {
+      ...metadata,
+      filename: file.name,
+      mime_type: file.type || 'application/octet-stream',
+      total_size: file.size
+    });
+    for (const index of session.missing_chunks) {
+      const chunk = file.slice(index * session.chunk_size, (index + 1) * session.chunk_size);
+      const digest = await crypto.subtle.digest('SHA-256', await chunk.arrayBuffer());
+      const checksum = Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+      await api.put(`/documents/uploads/${session.upload_id}/chunks/${index}`, chunk, {
+        headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum }
+      });
+      if (onProgress) onProgress((index + 1) / session.total_chunks);
+    }
+    return api.post(`/documents/uploads/${session.upload_id}/complete`);
+  }
 };
 
 // Calendar
 export const calendarAPI = {
-  getEvents: (month, year) => api.get(`/calendar/events?month=${month}&year=${year}`)
+  getEvents: (month, year) => api.get(`/calendar/events?month=${month}&year=${year}`),
+  getRange: (from, to) => api.get('/calendar/range', { params: { from, to } }),
+  getFeedUrl: () => api.get('/calendar/feed'),
+  rotateFeed: () => api.post('/calendar/feed/rotate')
 };
 
 // Teams
@@ -151,16 +223,24 @@ export const teamsAPI = {
 
 // Audit Logs
 export const auditAPI = {
-  getAll: (entityType, entityId, limit) => {
+  // Keyset pagination: pass the X-Next-Cursor header of the previous page as cursor
+  getAll: (entityType, entityId, limit, cursor) => {
     let url = '/audit-logs';
     const params = [];
     if (entityType) params.push(`entity_type=${entityType}`);
     if (entityId) params.push(`entity_id=${entityId}`);
     if (limit) params.push(`limit=${limit}`);
+    if (cursor) params.push(`cursor=${encodeURIComponent(cursor)}`);
     if (params.length) url += '?' + params.join('&');
     return api.get(url);
   },
-  getEntityHistory: (entityType, entityId) => api.get(`/audit-logs/entity/${entityType}/${entityId}`)
+  export: (format, params = {}) => api.get('/audit-logs/export', {
+    params: { format, ...params },
+    responseType: 'blob'
+  }),
+  getEntityHistory: (entityType, entityId, cursor) => api.get(
+    `/audit-logs/entity/${entityType}/${entityId}${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`
+  )
 };
 
 export default api;
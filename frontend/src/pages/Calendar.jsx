@@ -4,6 +4,7 @@ import { formatCurrency, MONTHS_FR } from '../lib/utils';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Badge } from '../components/ui/badge';
+import { toast } from 'sonner';
 import { 
   ChevronLeft, 
   ChevronRight,
@@ -12,27 +13,34 @@ import {
   FileText,
   Home,
   CheckCircle,
-  AlertCircle
+  AlertCircle,
+  Link as LinkIcon
 } from 'lucide-react';
 
 const CalendarPage = () => {
   const [currentDate, setCurrentDate] = useState(new Date());
-  const [events, setEvents] = useState([]);
+  const [yearEvents, setYearEvents] = useState({});
   const [loading, setLoading] = useState(true);
   const [selectedDay, setSelectedDay] = useState(null);
 
   const currentMonth = currentDate.getMonth() + 1;
   const currentYear = currentDate.getFullYear();
 
+  // The whole year is loaded at once: month navigation within it needs no request
+  const monthPrefix = `${currentYear}-${String(currentMonth).padStart(2, '0')}`;
+  const events = (yearEvents[currentYear] || []).filter(e => e.date.startsWith(monthPrefix));
+
   useEffect(() => {
-    loadEvents();
-  }, [currentMonth, currentYear]);
+    if (!yearEvents[currentYear]) {
+      loadEvents(currentYear);
+    }
+  }, [currentYear]);
 
-  const loadEvents = async () => {
+  const loadEvents = async (year) => {
     setLoading(true);
     try {
-      const response = await calendarAPI.getEvents(currentMonth, currentYear);
-      setEvents(response.data.events);
+      const response = await calendarAPI.getRange(`${year}-01`, `${year}-12`);
+      setYearEvents(prev => ({ ...prev, [year]: response.data.events }));
     } catch (error) {
       console.error('Failed to load events:', error);
     } finally {
@@ -40,6 +48,16 @@ const CalendarPage = () => {
     }
   };
 
+  const copyFeedUrl = async () => {
+    try {
+      const response = await calendarAPI.getFeedUrl();
+      await navigator.clipboard.writeText(`${process.env.REACT_APP_BACKEND_URL}${response.data.url}`);
+      toast.success('Lien d\'abonnement copié');
+    } catch (error) {
+      toast.error('Impossible de récupérer le lien d\'abonnement');
+    }
+  };
+
   const getDaysInMonth = (year, month) => {
     return new Date(year, month, 0).getDate();
   };
@@ -147,9 +165,15 @@ const CalendarPage = () => {
             Visualisez vos échéances et événements
           </p>
         </div>
-        <Button variant="outline" onClick={goToToday} data-testid="today-btn">
-          Aujourd'hui
-        </Button>
+        <div className="flex gap-2">
+          <Button variant="outline" onClick={copyFeedUrl} data-testid="feed-url-btn">
+            <LinkIcon className="mr-2 h-4 w-4" />
+            S'abonner
+          </Button>
+          <Button variant="outline" onClick={goToToday} data-testid="today-btn">
+            Aujourd'hui
+          </Button>
+        </div>
       </div>
 
       {/* Stats */}
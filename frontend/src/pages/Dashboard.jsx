@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { dashboardAPI } from '../lib/api';
+import { dashboardAPI, analyticsAPI } from '../lib/api';
 import { formatCurrency } from '../lib/utils';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -60,12 +60,27 @@ const StatCard = ({ title, value, subtitle, icon: Icon, trend, color = 'primary'
 
 const Dashboard = () => {
   const [stats, setStats] = useState(null);
+  const [forecast, setForecast] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     loadStats();
+    loadForecast();
   }, []);
 
+  const loadForecast = async () => {
+    try {
+      const response = await analyticsAPI.getForecast(12);
+      setForecast(response.data.months.map((month, i) => ({
+        month,
+        expected: response.data.expected[i],
+        contractual: response.data.contractual[i]
+      })));
+    } catch (error) {
+      console.error('Failed to load forecast:', error);
+    }
+  };
+
   const loadStats = async () => {
     try {
       const response = await dashboardAPI.getStats();
@@ -298,6 +313,42 @@ const Dashboard = () => {
           </Card>
         </div>
       </div>
+
+      {/* Forecast */}
+      {forecast?.length > 0 && (
+        <Card className="border">
+          <CardHeader className="pb-2 sm:pb-4">
+            <CardTitle className="text-base sm:text-lg font-semibold" style={{ fontFamily: 'Manrope, sans-serif' }}>
+              Prévision des encaissements (12 mois)
+            </CardTitle>
+          </CardHeader>
+          <CardContent className="px-2 sm:px-6">
+            <div className="h-[200px] sm:h-[250px]">
+              <ResponsiveContainer width="100%" height="100%">
+                <BarChart data={forecast}>
+                  <CartesianGrid strokeDasharray="3 3" stroke="hsl(var(--border))" />
+                  <XAxis dataKey="month" stroke="hsl(var(--muted-foreground))" fontSize={12} />
+                  <YAxis
+                    stroke="hsl(var(--muted-foreground))"
+                    fontSize={12}
+                    tickFormatter={(value) => `${value}€`}
+                  />
+                  <Tooltip
+                    formatter={(value, name) => [formatCurrency(value), name === 'expected' ? 'Prévu' : 'Loyers des baux']}
+                    contentStyle={{
+                      backgroundColor: 'hsl(var(--card))',
+                      border: '1px solid hsl(var(--border))',
+                      borderRadius: '8px'
+                    }}
+                  />
+                  <Bar dataKey="contractual" fill="hsl(var(--muted-foreground))" opacity={0.3} radius={[4, 4, 0, 0]} />
+                  <Bar dataKey="expected" fill="hsl(var(--primary))" radius={[4, 4, 0, 0]} />
+                </BarChart>
+              </ResponsiveContainer>
+            </div>
+          </CardContent>
+        </Card>
+      )}
     </div>
   );
 };
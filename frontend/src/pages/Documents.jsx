@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { documentsAPI, propertiesAPI, tenantsAPI, leasesAPI } from '../lib/api';
+import { documentsAPI, propertiesAPI, tenantsAPI, leasesAPI, mediaUrl } from '../lib/api';
 import { formatDate } from '../lib/utils';
 import { Card, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -44,6 +44,10 @@ const RELATED_TYPES = [
   { value: 'lease', label: 'Bail', icon: FileSignature }
 ];
 
+// Files above the simple upload limit are sent in resumable chunks
+const MAX_SIMPLE_UPLOAD_SIZE = 10 * 1024 * 1024;
+const MAX_CHUNKED_UPLOAD_SIZE = 500 * 1024 * 1024;
+
 const Documents = () => {
   const [documents, setDocuments] = useState([]);
   const [properties, setProperties] = useState([]);
@@ -102,8 +106,8 @@ const Documents = () => {
   const handleFileChange = (e) => {
     const file = e.target.files[0];
     if (file) {
-      if (file.size > 10 * 1024 * 1024) {
-        toast.error('Fichier trop volumineux (max 10MB)');
+      if (file.size > MAX_CHUNKED_UPLOAD_SIZE) {
+        toast.error('Fichier trop volumineux (max 500MB)');
         return;
       }
       setSelectedFile(file);
@@ -131,7 +135,11 @@ const Documents = () => {
     if (formData.notes) data.append('notes', formData.notes);
 
     try {
-      await documentsAPI.upload(data);
+      if (selectedFile.size > MAX_SIMPLE_UPLOAD_SIZE) {
+        await documentsAPI.uploadChunked(selectedFile, { ...formData, notes: formData.notes || null });
+      } else {
+        await documentsAPI.upload(data);
+      }
       toast.success('Document uploadé avec succès');
       setDialogOpen(false);
       resetForm();
@@ -182,7 +190,7 @@ const Documents = () => {
       case 'lease':
         return leases.map(l => ({ 
           value: l.id, 
-          label: `${l.property?.name} - ${l.tenant?.first_name} ${l.tenant?.last_name}` 
+          label: `${l.property_name} - ${l.tenant_name}` 
         }));
       default:
         return [];
@@ -198,7 +206,7 @@ const Documents = () => {
         return tenant ? `${tenant.first_name} ${tenant.last_name}` : null;
       case 'lease':
         const lease = leases.find(l => l.id === doc.related_id);
-        return lease ? `${lease.property?.name} - ${lease.tenant?.first_name}` : null;
+        return lease ? `${lease.property_name} - ${lease.tenant_name}` : null;
       default:
         return null;
     }
@@ -301,9 +309,18 @@ const Documents = () => {
                   <TableRow key={doc.id} className="table-row-hover" data-testid={`document-row-${doc.id}`}>
                     <TableCell>
                       <div className="flex items-center gap-3">
-                        <div className="p-2 rounded-lg bg-primary/10">
-                          <FileIcon className="h-5 w-5 text-primary" />
-                        </div>
+                        {doc.rendition_urls ? (
+                          <img
+                            src={mediaUrl(doc.rendition_urls.thumb.webp)}
+                            alt={doc.name}
+                            loading="lazy"
+                            className="h-9 w-9 rounded-lg object-cover"
+                          />
+                        ) : (
+                          <div className="p-2 rounded-lg bg-primary/10">
+                            <FileIcon className="h-5 w-5 text-primary" />
+                          </div>
+                        )}
                         <div>
                           <p className="font-medium">{doc.name}</p>
                           {doc.notes && (
@@ -423,7 +440,7 @@ const Documents = () => {
                           Cliquez ou glissez un fichier ici
                         </p>
                         <p className="text-xs text-muted-foreground mt-1">
-                          PDF, DOC, DOCX, JPG, PNG (max 10MB)
+                          PDF, DOC, DOCX, JPG, PNG (max 500MB)
                         </p>
                       </>
                     )}
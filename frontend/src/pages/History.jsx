@@ -19,7 +19,8 @@ import {
   FolderOpen,
   Calendar,
   Users,
-  ArrowRight
+  ArrowRight,
+  Download
 } from 'lucide-react';
 
 const ENTITY_TYPES = [
@@ -44,6 +45,8 @@ const HistoryPage = () => {
   const [loading, setLoading] = useState(true);
   const [filterType, setFilterType] = useState('all');
   const [searchTerm, setSearchTerm] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadLogs();
@@ -55,6 +58,7 @@ const HistoryPage = () => {
       const entityType = filterType === 'all' ? null : filterType;
       const response = await auditAPI.getAll(entityType, null, 100);
       setLogs(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Failed to load logs:', error);
     } finally {
@@ -62,6 +66,37 @@ const HistoryPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const entityType = filterType === 'all' ? null : filterType;
+      const response = await auditAPI.getAll(entityType, null, 100, nextCursor);
+      setLogs(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Failed to load logs:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const handleExport = async () => {
+    try {
+      const params = filterType === 'all' ? {} : { entity_type: filterType };
+      const response = await auditAPI.export('csv', params);
+      const url = window.URL.createObjectURL(new Blob([response.data]));
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `historique_${new Date().toISOString().slice(0, 10)}.csv`);
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Failed to export logs:', error);
+    }
+  };
+
   const getEntityIcon = (type) => {
     const entityType = ENTITY_TYPES.find(e => e.value === type);
     return entityType?.icon || History;
@@ -125,6 +160,10 @@ const HistoryPage = () => {
             Suivez toutes les modifications de vos données
           </p>
         </div>
+        <Button variant="outline" onClick={handleExport} data-testid="export-history-btn">
+          <Download className="mr-2 h-4 w-4" />
+          Exporter (CSV)
+        </Button>
       </div>
 
       {/* Filters */}
@@ -214,6 +253,13 @@ const HistoryPage = () => {
               </Card>
             );
           })}
+          {nextCursor && (
+            <div className="flex justify-center">
+              <Button variant="outline" onClick={loadMore} disabled={loadingMore} data-testid="load-more-history">
+                {loadingMore ? 'Chargement...' : 'Charger plus'}
+              </Button>
+            </div>
+          )}
         </div>
       ) : (
         <Card className="border">
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { leasesAPI, propertiesAPI, tenantsAPI } from '../lib/api';
+import { leasesAPI, propertiesAPI, tenantsAPI, documentsAPI } from '../lib/api';
 import { formatCurrency, formatDate } from '../lib/utils';
 import { Card, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -20,7 +20,8 @@ import {
   Calendar,
   Euro,
   XCircle,
-  Search
+  Search,
+  FolderDown
 } from 'lucide-react';
 
 const Leases = () => {
@@ -130,13 +131,28 @@ const Leases = () => {
     }
   };
 
+  const handleDownloadBundle = async (lease) => {
+    try {
+      const response = await documentsAPI.downloadBundle('lease', lease.id);
+      const url = window.URL.createObjectURL(new Blob([response.data]));
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', `dossier_${lease.property_name || lease.id}.zip`);
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+    } catch (error) {
+      toast.error(error.response?.status === 404 ? 'Aucun document pour ce bail' : 'Erreur lors du téléchargement');
+    }
+  };
+
   const availableProperties = properties.filter(p => !p.is_occupied);
   const availableTenants = tenants.filter(t => !t.current_property_id);
 
   const filteredLeases = leases.filter(l => 
-    l.property?.name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    l.tenant?.first_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    l.tenant?.last_name?.toLowerCase().includes(searchTerm.toLowerCase())
+    l.property_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
+    l.tenant_name?.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
   if (loading) {
@@ -218,15 +234,15 @@ const Leases = () => {
                     <div className="flex items-center gap-2">
                       <Building2 className="h-4 w-4 text-muted-foreground" />
                       <div>
-                        <p className="font-medium">{lease.property?.name}</p>
-                        <p className="text-xs text-muted-foreground">{lease.property?.address}</p>
+                        <p className="font-medium">{lease.property_name}</p>
+                        <p className="text-xs text-muted-foreground">{lease.property_address}</p>
                       </div>
                     </div>
                   </TableCell>
                   <TableCell>
                     <div className="flex items-center gap-2">
                       <User className="h-4 w-4 text-muted-foreground" />
-                      <span>{lease.tenant?.first_name} {lease.tenant?.last_name}</span>
+                      <span>{lease.tenant_name}</span>
                     </div>
                   </TableCell>
                   <TableCell>
@@ -253,6 +269,15 @@ const Leases = () => {
                     </Badge>
                   </TableCell>
                   <TableCell className="text-right">
+                    <Button 
+                      variant="ghost" 
+                      size="sm"
+                      onClick={() => handleDownloadBundle(lease)}
+                      data-testid={`download-bundle-${lease.id}`}
+                    >
+                      <FolderDown className="mr-1 h-4 w-4" />
+                      Dossier
+                    </Button>
                     {lease.is_active && (
                       <Button 
                         variant="ghost" 
@@ -460,7 +485,7 @@ const Leases = () => {
             <AlertDialogTitle>Résilier ce bail ?</AlertDialogTitle>
             <AlertDialogDescription className="space-y-4">
               <p>
-                Vous êtes sur le point de résilier le bail de {leaseToTerminate?.tenant?.first_name} {leaseToTerminate?.tenant?.last_name} pour le bien "{leaseToTerminate?.property?.name}".
+                Vous êtes sur le point de résilier le bail de {leaseToTerminate?.tenant_name} pour le bien "{leaseToTerminate?.property_name}".
               </p>
               <div className="space-y-2">
                 <Label htmlFor="terminate_date">Date de fin du bail *</Label>
@@ -214,6 +214,38 @@ const Payments = () => {
     printWindow.print();
   };
 
+  const downloadBlob = (data, filename) => {
+    const url = window.URL.createObjectURL(new Blob([data]));
+    const link = document.createElement('a');
+    link.href = url;
+    link.setAttribute('download', filename);
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+    window.URL.revokeObjectURL(url);
+  };
+
+  const handleDownloadReceiptPdf = async () => {
+    try {
+      const response = await receiptsAPI.downloadPdf(receiptData.id);
+      downloadBlob(response.data, `quittance_${receiptData.period.replace(' ', '_')}.pdf`);
+    } catch (error) {
+      toast.error('Erreur lors de la génération du PDF');
+    }
+  };
+
+  const handleDownloadMonthReceipts = async () => {
+    const now = new Date();
+    const month = now.getMonth() + 1;
+    const year = now.getFullYear();
+    try {
+      const response = await receiptsAPI.downloadBatch(month, year);
+      downloadBlob(response.data, `quittances_${year}_${String(month).padStart(2, '0')}.zip`);
+    } catch (error) {
+      toast.error(error.response?.status === 404 ? 'Aucun paiement ce mois-ci' : 'Erreur lors de la génération des quittances');
+    }
+  };
+
   const handleExportExcel = async () => {
     setExporting(true);
     try {
@@ -265,9 +297,8 @@ const Payments = () => {
   };
 
   const filteredPayments = payments.filter(p => 
-    p.property?.name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    p.tenant?.first_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    p.tenant?.last_name?.toLowerCase().includes(searchTerm.toLowerCase())
+    p.property_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
+    p.tenant_name?.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
   if (loading) {
@@ -329,6 +360,14 @@ const Payments = () => {
               )}
               Excel
             </Button>
+            <Button 
+              variant="outline"
+              onClick={handleDownloadMonthReceipts}
+              data-testid="download-month-receipts-btn"
+            >
+              <Download className="mr-2 h-4 w-4" />
+              Quittances du mois
+            </Button>
           </div>
           <Button 
             onClick={() => setDialogOpen(true)} 
@@ -375,13 +414,13 @@ const Payments = () => {
                   <TableCell>
                     <div className="flex items-center gap-2">
                       <Building2 className="h-4 w-4 text-muted-foreground" />
-                      <span>{payment.property?.name}</span>
+                      <span>{payment.property_name}</span>
                     </div>
                   </TableCell>
                   <TableCell>
                     <div className="flex items-center gap-2">
                       <User className="h-4 w-4 text-muted-foreground" />
-                      <span>{payment.tenant?.first_name} {payment.tenant?.last_name}</span>
+                      <span>{payment.tenant_name}</span>
                     </div>
                   </TableCell>
                   <TableCell>
@@ -483,7 +522,7 @@ const Payments = () => {
                   <SelectContent>
                     {leases.map((lease) => (
                       <SelectItem key={lease.id} value={lease.id}>
-                        {lease.property?.name} - {lease.tenant?.first_name} {lease.tenant?.last_name}
+                        {lease.property_name} - {lease.tenant_name}
                       </SelectItem>
                     ))}
                   </SelectContent>
@@ -662,9 +701,12 @@ const Payments = () => {
             <Button variant="outline" onClick={() => setReceiptDialogOpen(false)}>
               Fermer
             </Button>
-            <Button onClick={handlePrintReceipt} data-testid="print-receipt-btn">
+            <Button variant="outline" onClick={handlePrintReceipt} data-testid="print-receipt-btn">
+              Imprimer
+            </Button>
+            <Button onClick={handleDownloadReceiptPdf} data-testid="download-receipt-pdf-btn">
               <Download className="mr-2 h-4 w-4" />
-              Imprimer / PDF
+              PDF
             </Button>
           </DialogFooter>
         </DialogContent>
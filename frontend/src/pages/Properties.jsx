@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { propertiesAPI } from '../lib/api';
+import { propertiesAPI, mediaUrl } from '../lib/api';
 import { formatCurrency, PROPERTY_TYPES } from '../lib/utils';
 import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -42,6 +42,8 @@ const Properties = () => {
     rooms: '',
     rent_amount: '',
     charges: '0',
+    purchase_price: '',
+    annual_costs: '',
     description: '',
     image_url: ''
   });
@@ -72,6 +74,8 @@ const Properties = () => {
       rooms: '',
       rent_amount: '',
       charges: '0',
+      purchase_price: '',
+      annual_costs: '',
       description: '',
       image_url: ''
     });
@@ -91,6 +95,8 @@ const Properties = () => {
         rooms: property.rooms.toString(),
         rent_amount: property.rent_amount.toString(),
         charges: property.charges.toString(),
+        purchase_price: property.purchase_price?.toString() || '',
+        annual_costs: property.annual_costs?.toString() || '',
         description: property.description || '',
         image_url: property.image_url || ''
       });
@@ -108,7 +114,9 @@ const Properties = () => {
       surface: parseFloat(formData.surface),
       rooms: parseInt(formData.rooms),
       rent_amount: parseFloat(formData.rent_amount),
-      charges: parseFloat(formData.charges || 0)
+      charges: parseFloat(formData.charges || 0),
+      purchase_price: formData.purchase_price ? parseFloat(formData.purchase_price) : null,
+      annual_costs: formData.annual_costs ? parseFloat(formData.annual_costs) : null
     };
 
     try {
@@ -201,7 +209,17 @@ const Properties = () => {
             >
               {/* Property Image */}
               <div className="h-40 bg-muted relative overflow-hidden">
-                {property.image_url ? (
+                {property.image_renditions ? (
+                  <picture>
+                    <source srcSet={mediaUrl(property.image_renditions.thumb.webp)} type="image/webp" />
+                    <img 
+                      src={mediaUrl(property.image_renditions.thumb.jpeg)} 
+                      alt={property.name}
+                      loading="lazy"
+                      className="w-full h-full object-cover"
+                    />
+                  </picture>
+                ) : property.image_url ? (
                   <img 
                     src={property.image_url} 
                     alt={property.name}
@@ -444,6 +462,33 @@ const Properties = () => {
                 </div>
               </div>
 
+              <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
+                <div className="space-y-2">
+                  <Label htmlFor="purchase_price">Prix d'achat (€)</Label>
+                  <Input
+                    id="purchase_price"
+                    type="number"
+                    step="0.01"
+                    value={formData.purchase_price}
+                    onChange={(e) => setFormData({ ...formData, purchase_price: e.target.value })}
+                    placeholder="180000"
+                    data-testid="property-purchase-price-input"
+                  />
+                </div>
+                <div className="space-y-2">
+                  <Label htmlFor="annual_costs">Frais annuels (€)</Label>
+                  <Input
+                    id="annual_costs"
+                    type="number"
+                    step="0.01"
+                    value={formData.annual_costs}
+                    onChange={(e) => setFormData({ ...formData, annual_costs: e.target.value })}
+                    placeholder="Taxe foncière, assurance..."
+                    data-testid="property-annual-costs-input"
+                  />
+                </div>
+              </div>
+
               <div className="space-y-2">
                 <Label htmlFor="image_url">URL de l'image</Label>
                 <Input